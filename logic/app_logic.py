@@ -1,27 +1,96 @@
 # logic/app_logic.py
 # Import các thư viện và module cần thiết
-from flask import Flask, request, jsonify# Thư viện Flask để tạo server API
+from flask import Flask, request, jsonify, Response  # Thư viện Flask để tạo server API
 from flask_cors import CORS              # Thư viện để xử lý Cross-Origin Resource Sharing (cho phép frontend gọi)
 import database                          # Module tự định nghĩa (giả định) để tương tác với cơ sở dữ liệu
-from osrm_client import OSRMClient       # Module client để giao tiếp với OSRM API
+from osrm_client import OSRMClient, PROFILE_FALLBACK_SPEED_KMH  # Module client để giao tiếp với OSRM API
 from gtsp_solver import GTSPGraspSolver  # Module chứa thuật toán giải GTSP (GRASP)
+from time_dependent import TimeDependentDurations, parse_clock, format_clock  # Chi phí theo khung giờ
+import vrp_split                         # Chia lộ trình cho nhiều ngày / nhiều xe
+from preprocess import collapse_coordinates, co_located_points, expand_matrix, prune_dominated  # Gộp tọa độ, bỏ điểm bị trội
+import polyline                          # Mã hóa geometry thành chuỗi polyline (gọn hơn GeoJSON)
 import time                              # Thư viện time để đo lường thời gian thực thi
+import os                                # Đọc cấu hình từ biến môi trường (OSRM_BASE_URL, ...)
+import gzip                              # Nén sẵn (1 lần) response /get_clusters
+import hashlib                           # ETag theo nội dung cho /get_clusters
 
 # Khởi tạo ứng dụng Flask
 app = Flask(__name__)
 
-<<<<<<< HEAD
-# Cấu hình CORS: Cho phép các yêu cầu từ frontend (chạy ở localhost:8080)
-# truy cập đến các API của server này (chạy ở localhost:5001).
-=======
 # Cấu hình CORS: Cho phép các yêu cầu từ frontend (chạy ở mọi nơi)
 # truy cập đến các API của server này (chạy ở mọi nơi).
->>>>>>> 5b64062fdf1062d87e0a6be251679e475c0025bb
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Khởi tạo OSRM client, trỏ đến dịch vụ OSRM công cộng
+# Khởi tạo OSRM client, mặc định trỏ đến dịch vụ OSRM công cộng
 # OSRM (Open Source Routing Machine) dùng để tính toán ma trận khoảng cách/thời gian và lấy lộ trình chi tiết.
-osrm = OSRMClient(base_url="http://router.project-osrm.org")
+# Có thể đổi sang OSRM nội bộ (hoặc osrm_stub.py khi load test) bằng biến môi trường OSRM_BASE_URL.
+# OSRM_BASE_URL có thể chứa nhiều server, cách nhau bởi dấu phẩy (failover / hedged request).
+# OSRM_PROFILE_URLS="walking=http://localhost:5002;cycling=http://localhost:5003": OSRM riêng theo profile.
+# OSRM_MODE=record|replay + OSRM_CASSETTE=<file.json>: ghi lại / phát lại response OSRM (chạy offline).
+# OSRM_SINGLEFLIGHT_DIR=<thư mục>: gộp các lời gọi OSRM giống nhau đang chạy đồng thời giữa các worker
+# (file khóa + file kết quả trên máy cục bộ); không đặt -> chỉ gộp giữa các thread của worker.
+def _parse_profile_urls(value):
+    """Chuyển "walking=http://a,http://b;cycling=http://c" thành {'walking': [...], 'cycling': [...]}."""
+    result = {}
+    for item in filter(None, (value or "").split(";")):
+        profile, urls = item.split("=", 1)
+        result[profile.strip()] = urls.split(",")
+    return result
+
+
+osrm = OSRMClient(
+    base_url=os.environ.get("OSRM_BASE_URL", "http://router.project-osrm.org").split(","),
+    pool_maxsize=int(os.environ.get("OSRM_POOL_MAXSIZE", "10")),
+    mode=os.environ.get("OSRM_MODE", "live"),
+    cassette_path=os.environ.get("OSRM_CASSETTE"),
+    route_timeout=float(os.environ.get("OSRM_ROUTE_TIMEOUT", "10")),
+    table_timeout=float(os.environ.get("OSRM_TABLE_TIMEOUT", "30")),
+    connect_timeout=float(os.environ.get("OSRM_CONNECT_TIMEOUT", "3.05")),
+    retries=int(os.environ.get("OSRM_RETRIES", "2")),
+    backoff_base=float(os.environ.get("OSRM_BACKOFF_BASE", "0.2")),
+    hedge_delay=float(os.environ["OSRM_HEDGE_DELAY"]) if os.environ.get("OSRM_HEDGE_DELAY") else None,
+    breaker_threshold=int(os.environ.get("OSRM_BREAKER_THRESHOLD", "5")),
+    breaker_reset_timeout=float(os.environ.get("OSRM_BREAKER_RESET", "30")),
+    profile_base_urls=_parse_profile_urls(os.environ.get("OSRM_PROFILE_URLS")),
+    matrix_cache_size=int(os.environ.get("OSRM_MATRIX_CACHE_SIZE", "128")),
+    singleflight_dir=os.environ.get("OSRM_SINGLEFLIGHT_DIR") or None
+)
+
+# Các phương tiện di chuyển (profile OSRM) mà API chấp nhận
+SUPPORTED_PROFILES = tuple(PROFILE_FALLBACK_SPEED_KMH.keys())
+
+# Số vòng lặp GRASP theo kích thước bài toán: ITERATIONS_PER_CLUSTER vòng mỗi cụm, trong khoảng [MIN, MAX].
+# (GRASP phản ứng + Path Relinking hội tụ nhanh: bài toán vài cụm không cần tới 100 vòng lặp.)
+GRASP_MIN_ITERATIONS = int(os.environ.get("GRASP_MIN_ITERATIONS", "30"))
+GRASP_MAX_ITERATIONS = int(os.environ.get("GRASP_MAX_ITERATIONS", "100"))
+GRASP_ITERATIONS_PER_CLUSTER = 5
+# (Tùy chọn) Dừng GRASP sớm khi lời giải cách cận dưới không quá tỉ lệ này (xem lower_bound.py), ví dụ 0.01.
+# Mặc định để trống = luôn chạy đủ số vòng lặp (dừng sớm đánh đổi chất lượng lời giải lấy thời gian).
+SOLVER_TARGET_GAP = os.environ.get("SOLVER_TARGET_GAP", "")
+SOLVER_TARGET_GAP = float(SOLVER_TARGET_GAP) if SOLVER_TARGET_GAP else None
+
+
+def grasp_iterations(n_clusters):
+    """Số vòng lặp GRASP cho bài toán có n_clusters cụm (gồm cả START/END)."""
+    return max(GRASP_MIN_ITERATIONS, min(GRASP_MAX_ITERATIONS, GRASP_ITERATIONS_PER_CLUSTER * n_clusters))
+
+# --- Dữ liệu dùng chung (chỉ đọc), được tính MỘT LẦN khi import module ---
+# Khi chạy bằng gunicorn với preload_app=True, các đối tượng này được tạo ở tiến trình master
+# và được chia sẻ cho mọi worker theo cơ chế copy-on-write (không phải tính lại ở mỗi worker/request).
+
+# Thông tin tóm tắt các cụm (trả về cho /get_clusters)
+CLUSTERS_INFO = database.get_all_clusters_info()
+# Response /get_clusters được serialize, nén gzip và băm (ETag) sẵn MỘT LẦN: mỗi lần tải trang chỉ còn
+# so ETag (304 Not Modified, không có body) hoặc gửi bytes có sẵn.
+CLUSTERS_JSON = app.json.dumps(CLUSTERS_INFO).encode('utf-8')
+CLUSTERS_GZIP = gzip.compress(CLUSTERS_JSON, compresslevel=9, mtime=0)
+CLUSTERS_ETAG = hashlib.sha256(CLUSTERS_JSON).hexdigest()[:20]
+# Trình duyệt dùng bản đã lưu trong CLUSTERS_MAX_AGE giây, sau đó hỏi lại bằng If-None-Match
+CLUSTERS_MAX_AGE = int(os.environ.get("CLUSTERS_MAX_AGE", "300"))
+
+# Map tra cứu (Tên -> Tọa độ) từ CSDL (ALL_LANDMARKS).
+# Nếu điểm Start/End là một địa danh có sẵn, ta dùng tọa độ CSDL, không cần gọi API geocode.
+LANDMARKS_BY_NAME = {info["name"]: info["coord"] for info in database.ALL_LANDMARKS.values()}
 
 
 @app.route('/get_clusters', methods=['GET'])
@@ -30,18 +99,164 @@ def get_clusters():
     API Endpoint [GET] /get_clusters
     Mục đích: Lấy thông tin tóm tắt của tất cả các cụm (clusters) từ CSDL.
     Frontend sẽ gọi API này để hiển thị danh sách các cụm cho người dùng chọn.
+
+    Có ETag (băm nội dung) + Cache-Control: request có If-None-Match trùng ETag -> 304 (không có body).
+    Trình duyệt chấp nhận gzip -> gửi bản nén sẵn (ETag riêng cho bản nén).
     """
     try:
-        # Gọi hàm từ module database để lấy dữ liệu
-        clusters_info = database.get_all_clusters_info()
-        # Trả về dữ liệu dưới dạng JSON
-        return jsonify(clusters_info)
+        # Dữ liệu đã được serialize / nén sẵn khi khởi động (CLUSTERS_JSON, CLUSTERS_GZIP)
+        if request.accept_encodings['gzip']:
+            response = Response(CLUSTERS_GZIP, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+            response.set_etag(f"{CLUSTERS_ETAG}-gzip")
+        else:
+            response = Response(CLUSTERS_JSON, mimetype='application/json')
+            response.set_etag(CLUSTERS_ETAG)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.cache_control.public = True
+        response.cache_control.max_age = CLUSTERS_MAX_AGE
+        return response.make_conditional(request)  # If-None-Match trùng ETag -> 304
     except Exception as e:
         # Xử lý nếu có lỗi xảy ra
         print(f"Lỗi /get_clusters: {e}")
         return jsonify({"error": str(e)}), 500  # Trả về lỗi 500 (Internal Server Error)
 
 
+@app.route('/osrm_stats', methods=['GET'])
+def osrm_stats():
+    """
+    API Endpoint [GET] /osrm_stats
+    Mục đích: Quan sát (monitoring) OSRM client của worker hiện tại:
+    số request, retry, hedge, lỗi, fallback và trạng thái circuit breaker từng backend.
+    (Mỗi worker gunicorn có bộ đếm riêng.)
+    """
+    stats = osrm.get_stats()
+    stats["pid"] = os.getpid()
+    return jsonify(stats)
+
+
+# Độ chính xác khi mã hóa polyline (5 chữ số thập phân ~ 1 m, giống định dạng 'polyline' của OSRM)
+GEOMETRY_PRECISION = 5
+
+
+def encode_geometry(geometry):
+    """GeoJSON LineString -> chuỗi polyline (Google Encoded Polyline, thứ tự lat,lon), frontend giải mã trong Web Worker."""
+    return polyline.encode(geometry["coordinates"], precision=GEOMETRY_PRECISION, geojson=True)
+
+
+def build_route_details(tour_indices, all_points_info, start_address, end_address,
+                        matrix_data, profile, schedule=None, time_windows=None, co_located=None):
+    """
+    Hậu xử lý 1 lộ trình (dạng indices): gọi OSRM 'route' cho từng chặng để lấy geometry và
+    chỉ đường chi tiết, kèm lịch trình (nếu có schedule) và giờ mở cửa (nếu có time_windows).
+    co_located: (Tùy chọn) { index: [id địa điểm cùng vị trí đã bị gộp vào index] } (xem preprocess.py).
+
+    Trả về dict: tour, geometries, total_distance_km, total_duration_min, time_window_violations.
+    """
+    # Tạo map tra cứu ngược: index -> tọa độ, và index -> tên/ID
+    index_to_coord = {i: coord for i, (_, coord) in enumerate(all_points_info)}
+    index_to_name_id = {i: name_id for i, (name_id, _) in enumerate(all_points_info)}
+
+    time_window_violations = []  # Các địa điểm đến trễ (không kịp tham quan trước giờ đóng cửa)
+
+    route_geometries = []  # Mảng chứa các đoạn geometry (dạng polyline)
+    tour_details = []  # Mảng chứa thông tin chi tiết của từng chặng
+    total_distance_osrm = 0  # Tổng khoảng cách (tính lại dựa trên API 'route' cho chính xác)
+    total_duration_osrm = 0  # Tổng thời gian (tính lại dựa trên API 'route')
+
+    # Duyệt qua lộ trình tối ưu (từng cặp điểm)
+    for i in range(len(tour_indices) - 1):
+        idx_from = tour_indices[i]  # Index điểm đi
+        idx_to = tour_indices[i + 1]  # Index điểm đến
+
+        # Lấy tọa độ tương ứng
+        coord_from = index_to_coord[idx_from]
+        coord_to = index_to_coord[idx_to]
+
+        # Lấy tên/ID và tra cứu tên thật
+        name_id_from = index_to_name_id[idx_from]
+        if name_id_from in database.ALL_LANDMARKS:
+            name_from = database.ALL_LANDMARKS[name_id_from]["name"]
+        else:
+            # Xử lý trường hợp đặc biệt cho START/END
+            name_from = start_address if name_id_from == "START_POINT" else end_address
+
+        name_id_to = index_to_name_id[idx_to]
+        if name_id_to in database.ALL_LANDMARKS:
+            name_to = database.ALL_LANDMARKS[name_id_to]["name"]
+        else:
+            name_to = start_address if name_id_to == "START_POINT" else end_address
+
+        # Gọi OSRM 'route' API để lấy thông tin chi tiết chặng này
+        route_info = osrm.get_route_info(coord_from, coord_to, profile=profile)
+
+        # Xử lý kết quả route
+        if route_info:
+            # Nếu OSRM 'route' thành công
+            route_geometries.append(route_info['geometry'])  # Thêm geometry (để vẽ)
+            total_distance_osrm += route_info['distance']  # Cộng dồn khoảng cách
+            total_duration_osrm += route_info['duration']  # Cộng dồn thời gian
+            tour_details.append({
+                "from": name_from,
+                "to": name_to,
+                "distance_km": route_info['distance'],
+                "duration_min": route_info['duration'],
+                "steps": route_info['steps']  # Thêm mảng 'steps' (chỉ đường)
+            })
+        else:
+            # Fallback: Nếu OSRM 'route' thất bại (ví dụ: API lỗi, không tìm thấy đường)
+            # Ta sử dụng tạm dữ liệu từ ma trận 'table' (ít chính xác hơn 'route')
+            dist = matrix_data['distances'][idx_from][idx_to]
+            dur = matrix_data['durations'][idx_from][idx_to]
+            total_distance_osrm += dist
+            total_duration_osrm += dur
+            tour_details.append({
+                "from": name_from,
+                "to": name_to,
+                "distance_km": dist,
+                "duration_min": dur,
+                "steps": []  # Không có steps chi tiết
+            })
+            # Tạo một geometry đơn giản (đường thẳng)
+            # OSRM dùng [lon, lat] cho GeoJSON, trong khi code này dùng [lat, lon]
+            # Cần chuyển đổi (coord[1] là lon, coord[0] là lat)
+            route_geometries.append({
+                "type": "LineString",
+                "coordinates": [[coord_from[1], coord_from[0]], [coord_to[1], coord_to[0]]]
+            })
+
+        # Các địa điểm cùng vị trí với điểm đến (đã gộp khi tiền xử lý): đến đây là tham quan được luôn
+        if co_located and idx_to in co_located:
+            tour_details[-1]["co_located"] = [database.ALL_LANDMARKS[landmark_id]["name"]
+                                              for landmark_id in co_located[idx_to]]
+
+        # Giờ khởi hành / giờ đến dự kiến của chặng (theo ma trận 'table' và khung giờ)
+        if schedule:
+            leg = tour_details[-1]
+            stop = schedule[i + 1]
+            leg["depart_time"] = format_clock(schedule[i]["depart"])
+            leg["arrive_time"] = format_clock(stop["arrive"])
+            if time_windows is not None and name_id_to in database.ALL_LANDMARKS:
+                # Thời gian chờ mở cửa và tham quan tại điểm đến của chặng
+                visit = database.get_visit_info(name_id_to)
+                leg["wait_min"] = stop["start"] - stop["arrive"]
+                leg["visit_min"] = stop["depart"] - stop["start"]
+                leg["opening_hours"] = f"{visit['open']} - {visit['close']}" if visit["open"] else None
+                window = time_windows.get(idx_to)
+                if window and stop["depart"] > window[1] + 1e-9:
+                    leg["late_min"] = stop["depart"] - window[1]
+                    time_window_violations.append(name_to)
+
+
+    return {
+        "tour": tour_details,
+        "geometries": route_geometries,
+        "total_distance_km": total_distance_osrm,
+        "total_duration_min": total_duration_osrm,
+        "time_window_violations": time_window_violations,
+    }
+
+
 @app.route('/solve_gtsp', methods=['POST'])
 def solve_gtsp_api():
     """
@@ -60,20 +275,52 @@ def solve_gtsp_api():
         end_address = data.get('end_address')               # Địa chỉ kết thúc (dạng text) # type: ignore
         selected_cluster_ids = data.get('cluster_ids', [])  # Danh sách ID các cụm đã chọn # type: ignore
         optimize_for = data.get('optimize_for', 'distance') # Tiêu chí tối ưu ('distance' hoặc 'duration') # type: ignore
+        profile = data.get('profile', 'driving')            # Phương tiện: driving, motorbike, cycling, walking # type: ignore
+        compare_profiles = data.get('compare_profiles', []) # (Tùy chọn) Các phương tiện cần so sánh # type: ignore
+        departure_clock = data.get('departure_time')        # (Tùy chọn) Giờ xuất phát "HH:MM" # type: ignore
+        respect_opening_hours = bool(data.get('respect_opening_hours', False))  # (Tùy chọn) Tính giờ mở cửa & thời gian tham quan # type: ignore
+        num_routes = data.get('num_routes', 1)              # (Tùy chọn) Số ngày / số xe # type: ignore
+        max_route_duration = data.get('max_route_duration_min')  # (Tùy chọn) Thời lượng tối đa mỗi ngày/xe (phút) # type: ignore
+        split_by = data.get('split_by', 'day')              # (Tùy chọn) Chia theo 'day' (ngày) hoặc 'vehicle' (xe) # type: ignore
+        geometry_format = data.get('geometry_format', 'geojson')  # (Tùy chọn) 'geojson' hoặc 'polyline' (chuỗi mã hóa) # type: ignore
 
         # Kiểm tra tính hợp lệ của đầu vào
         if not all([start_address, end_address, selected_cluster_ids]):
             return jsonify({"error": "Thiếu thông tin: start_address, end_address hoặc cluster_ids"}), 400
 
-        print(f"BLL: Start='{start_address}', End='{end_address}', Clusters={len(selected_cluster_ids)}")
+        if not isinstance(compare_profiles, list):
+            return jsonify({"error": "compare_profiles phải là một danh sách"}), 400
+        unknown_profiles = [p for p in [profile, *compare_profiles] if p not in SUPPORTED_PROFILES]
+        if unknown_profiles:
+            return jsonify({"error": f"Phương tiện không hỗ trợ: {unknown_profiles}. "
+                                     f"Chọn một trong: {list(SUPPORTED_PROFILES)}"}), 400
+
+        if not isinstance(num_routes, int) or isinstance(num_routes, bool) or num_routes < 1:
+            return jsonify({"error": "num_routes phải là số nguyên >= 1"}), 400
+        if max_route_duration is not None and (
+                isinstance(max_route_duration, bool) or not isinstance(max_route_duration, (int, float))
+                or max_route_duration <= 0):
+            return jsonify({"error": "max_route_duration_min phải là số phút > 0"}), 400
+        if split_by not in ("day", "vehicle"):
+            return jsonify({"error": "split_by phải là 'day' hoặc 'vehicle'"}), 400
+        if geometry_format not in ("geojson", "polyline"):
+            return jsonify({"error": "geometry_format phải là 'geojson' hoặc 'polyline'"}), 400
+
+        departure_time = None
+        if departure_clock:
+            try:
+                departure_time = parse_clock(departure_clock)
+            except (ValueError, AttributeError):
+                return jsonify({"error": f"departure_time không hợp lệ (định dạng HH:MM): '{departure_clock}'"}), 400
+
+        print(f"BLL: Start='{start_address}', End='{end_address}', Clusters={len(selected_cluster_ids)}, Profile={profile}")
 
         # 2. Geocoding (Chuyển đổi địa chỉ text sang tọa độ [lat, lon])
         start_coord = None
         end_coord = None
 
-        # Tối ưu: Tạo một map tra cứu (Tên -> Tọa độ) từ CSDL (ALL_LANDMARKS)
-        # Nếu điểm Start/End là một địa danh có sẵn, ta dùng tọa độ CSDL, không cần gọi API geocode.
-        landmarks_by_name = {info["name"]: info["coord"] for info in database.ALL_LANDMARKS.values()}
+        # Tối ưu: Dùng map tra cứu (Tên -> Tọa độ) đã tính sẵn (LANDMARKS_BY_NAME)
+        landmarks_by_name = LANDMARKS_BY_NAME
 
         # 2a. Xử lý điểm Bắt đầu (Start)
         if start_address in landmarks_by_name:
@@ -120,12 +367,25 @@ def solve_gtsp_api():
 
         print(f"BLL: Tổng số điểm con cần tính toán ma trận: {len(all_coords_list)}")
 
+        # 4b. Gộp các tọa độ trùng / gần trùng: OSRM chỉ tính ma trận trên các tọa độ đại diện
+        osrm_coords, node_of = collapse_coordinates(all_coords_list)
+        if len(osrm_coords) < len(all_coords_list):
+            print(f"BLL: Gộp tọa độ trùng/gần trùng: {len(all_coords_list)} điểm -> {len(osrm_coords)} tọa độ OSRM")
+
         # 5. Gọi OSRM 'table' API
         # Lấy ma trận chi phí (khoảng cách và thời gian) giữa TẤT CẢ các cặp điểm trong `all_coords_list`.
         # Ví dụ: nếu có 50 điểm, OSRM sẽ trả về ma trận 50x50.
+        # Nếu cần so sánh nhiều phương tiện, ma trận của mọi profile được lấy SONG SONG trong 1 lần fan-out.
         print("BLL: Đang gọi OSRM API (table) để lấy ma trận chi phí...")
         start_time = time.time()
-        matrix_data = osrm.get_distance_matrix(all_coords_list)
+        profile_matrices = osrm.get_distance_matrices(osrm_coords, [profile, *compare_profiles])
+        if len(osrm_coords) < len(all_coords_list):
+            # Trải ma trận ra lại theo index của từng điểm (các điểm đã gộp dùng chung hàng/cột)
+            profile_matrices = {
+                name: {key: expand_matrix(matrix[key], node_of) for key in ('distances', 'durations')}
+                for name, matrix in profile_matrices.items() if matrix
+            }
+        matrix_data = profile_matrices.get(profile)
         if not matrix_data:
             return jsonify({"error": "Không thể lấy ma trận chi phí từ OSRM"}), 500
         print(f"BLL: Lấy ma trận chi phí xong. Thời gian: {time.time() - start_time:.2f}s")
@@ -145,22 +405,70 @@ def solve_gtsp_api():
         solver_clusters["START_CLUSTER"] = [start_index]
         solver_clusters["END_CLUSTER"] = [end_index]
 
+        # 6b. (Tùy chọn) Ma trận thời gian theo khung giờ (giờ cao điểm TP.HCM)
+        # Khi có giờ xuất phát, mỗi chặng được tính theo giờ khởi hành của chặng đó.
+        td_durations = None
+        if departure_time is not None:
+            td_durations = TimeDependentDurations.from_base_matrix(matrix_data['durations'])
+
+        # 6c. (Tùy chọn) Thời gian tham quan & giờ mở cửa của từng địa điểm (dạng index)
+        service_times = None
+        time_windows = None
+        if respect_opening_hours:
+            service_times = {}
+            time_windows = {}
+            for landmark_id, index in point_name_to_index.items():
+                if landmark_id not in database.ALL_LANDMARKS:
+                    continue  # START/END không có thời gian tham quan
+                visit = database.get_visit_info(landmark_id)
+                service_times[index] = visit["visit_min"]
+                if visit["open"] and visit["close"]:
+                    time_windows[index] = (parse_clock(visit["open"]), parse_clock(visit["close"]))
+
+        # 6d. Bỏ các điểm bị trội trong cụm (ít ứng viên hơn cho Solver); lộ trình vẫn dùng index gốc
+        solver_clusters, pruned = prune_dominated(
+            solver_clusters,
+            matrix_data['durations'] if optimize_for == 'time' else matrix_data['distances'],
+            matrix_data['durations'],
+            scheduled=departure_time is not None or respect_opening_hours,
+            service_times=service_times,
+            time_windows=time_windows
+        )
+        # Điểm bị bỏ có CÙNG vị trí với điểm giữ lại (ví dụ Chợ Tân Định / Nhà thờ Tân Định): báo kèm chặng
+        co_located = co_located_points(pruned, node_of, [point_id for point_id, _ in all_points_info])
+        if pruned:
+            print(f"BLL: Bỏ {len(pruned)} điểm bị trội trong cụm: "
+                  f"{[all_points_info[index][0] for index in pruned]}")
+
         # 7. Khởi chạy GTSP Solver
         print("BLL: Đang chạy GTSP Solver...")
         start_time = time.time()
-        # Khởi tạo đối tượng Solver với các tham số
-        solver = GTSPGraspSolver(
+        # Các tham số của Solver (dùng lại khi giải từng ngày/xe ở chế độ nhiều lộ trình)
+        solver_kwargs = dict(
             distance_matrix=matrix_data['distances'],  # Ma trận khoảng cách từ OSRM
             duration_matrix=matrix_data['durations'],  # Ma trận thời gian từ OSRM
             clusters=solver_clusters,                  # Định nghĩa các cụm (dạng index)
             start_index=start_index,                   # Index điểm bắt đầu
             end_index=end_index,                       # Index điểm kết thúc
-            optimize_for=optimize_for                  # Tiêu chí tối ưu
+            optimize_for=optimize_for,                 # Tiêu chí tối ưu
+            td_durations=td_durations,                 # Ma trận theo khung giờ (hoặc None)
+            departure_time=departure_time if departure_time is not None else 8 * 60,
+            service_times=service_times,               # Thời gian tham quan (hoặc None)
+            time_windows=time_windows                  # Giờ mở cửa (hoặc None)
         )
+        # Khởi tạo đối tượng Solver với các tham số
+        solver = GTSPGraspSolver(**solver_kwargs)
 
-        # Chạy thuật toán giải (ví dụ: 100 vòng lặp GRASP)
+        # Chạy thuật toán giải (GRASP phản ứng + Path Relinking, số vòng lặp theo số cụm)
         # Kết quả là 1 danh sách các *indices* của lộ trình tối ưu và tổng chi phí.
-        optimal_tour_indices, best_cost = solver.solve(max_iterations=100)
+        max_iterations = grasp_iterations(len(solver_clusters))
+        optimal_tour_indices, best_cost = solver.solve(max_iterations=max_iterations, target_gap=SOLVER_TARGET_GAP)
+        solver_stats = solver.stats  # Thống kê GRASP (trước khi chia lộ trình) để giám sát
+        solver_stats["preprocessing"] = {
+            "points": len(all_coords_list),      # Số điểm (START, END và các địa điểm)
+            "osrm_points": len(osrm_coords),     # Số tọa độ gửi cho OSRM sau khi gộp
+            "pruned_points": len(pruned),        # Số điểm bị trội đã bỏ khỏi cụm
+        }
 
         if not optimal_tour_indices:
             return jsonify({"error": "Solver không tìm thấy lộ trình."}), 500
@@ -168,81 +476,55 @@ def solve_gtsp_api():
         print(f"BLL: Solver hoàn thành. Lộ trình (indices): {optimal_tour_indices}")
         print(f"BLL: Thời gian chạy Solver: {time.time() - start_time:.2f}s")
 
+        # 7b. (Tùy chọn) Chia lộ trình cho nhiều ngày / nhiều xe (route-first, cluster-second)
+        multi_route = num_routes > 1 or max_route_duration is not None
+        if multi_route:
+            try:
+                routes = vrp_split.solve_multi_route(
+                    solver, optimal_tour_indices, num_routes, max_route_duration,
+                    solver_kwargs=solver_kwargs, max_iterations=max_iterations,
+                    target_gap=SOLVER_TARGET_GAP
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            print(f"BLL: Đã chia thành {len(routes)} lộ trình: {[tour for tour, _ in routes]}")
+        else:
+            routes = [(optimal_tour_indices, best_cost)]
+
         # 8. Xử lý kết quả (Hậu xử lý)
         # Solver chỉ trả về thứ tự các *điểm* (indices), ví dụ: [0, 5, 12, 8, 1].
         # Ta cần gọi OSRM 'route' API cho TỪNG CHẶNG (0->5, 5->12, 12->8, 8->1)
         # để lấy đường đi chi tiết (geometry) vẽ lên bản đồ và thông tin chỉ đường (steps).
         print("BLL: Đang gọi OSRM API (route) để lấy geometry chi tiết...")
 
-        # Tạo map tra cứu ngược: index -> tọa độ, và index -> tên/ID
-        index_to_coord = {i: coord for i, (_, coord) in enumerate(all_points_info)}
-        index_to_name_id = {i: name_id for i, (name_id, _) in enumerate(all_points_info)}
-
-        route_geometries = []  # Mảng chứa các đoạn geometry (dạng polyline)
-        tour_details = []  # Mảng chứa thông tin chi tiết của từng chặng
-        total_distance_osrm = 0  # Tổng khoảng cách (tính lại dựa trên API 'route' cho chính xác)
-        total_duration_osrm = 0  # Tổng thời gian (tính lại dựa trên API 'route')
-
-        # Duyệt qua lộ trình tối ưu (từng cặp điểm)
-        for i in range(len(optimal_tour_indices) - 1):
-            idx_from = optimal_tour_indices[i]  # Index điểm đi
-            idx_to = optimal_tour_indices[i + 1]  # Index điểm đến
-
-            # Lấy tọa độ tương ứng
-            coord_from = index_to_coord[idx_from]
-            coord_to = index_to_coord[idx_to]
-
-            # Lấy tên/ID và tra cứu tên thật
-            name_id_from = index_to_name_id[idx_from]
-            if name_id_from in database.ALL_LANDMARKS:
-                name_from = database.ALL_LANDMARKS[name_id_from]["name"]
-            else:
-                # Xử lý trường hợp đặc biệt cho START/END
-                name_from = start_address if name_id_from == "START_POINT" else end_address
-
-            name_id_to = index_to_name_id[idx_to]
-            if name_id_to in database.ALL_LANDMARKS:
-                name_to = database.ALL_LANDMARKS[name_id_to]["name"]
-            else:
-                name_to = start_address if name_id_to == "START_POINT" else end_address
-
-            # Gọi OSRM 'route' API để lấy thông tin chi tiết chặng này
-            route_info = osrm.get_route_info(coord_from, coord_to)
-
-            # Xử lý kết quả route
-            if route_info:
-                # Nếu OSRM 'route' thành công
-                route_geometries.append(route_info['geometry'])  # Thêm geometry (để vẽ)
-                total_distance_osrm += route_info['distance']  # Cộng dồn khoảng cách
-                total_duration_osrm += route_info['duration']  # Cộng dồn thời gian
-                tour_details.append({
-                    "from": name_from,
-                    "to": name_to,
-                    "distance_km": route_info['distance'],
-                    "duration_min": route_info['duration'],
-                    "steps": route_info['steps']  # Thêm mảng 'steps' (chỉ đường)
-                })
-            else:
-                # Fallback: Nếu OSRM 'route' thất bại (ví dụ: API lỗi, không tìm thấy đường)
-                # Ta sử dụng tạm dữ liệu từ ma trận 'table' (ít chính xác hơn 'route')
-                dist = matrix_data['distances'][idx_from][idx_to]
-                dur = matrix_data['durations'][idx_from][idx_to]
-                total_distance_osrm += dist
-                total_duration_osrm += dur
-                tour_details.append({
-                    "from": name_from,
-                    "to": name_to,
-                    "distance_km": dist,
-                    "duration_min": dur,
-                    "steps": []  # Không có steps chi tiết
-                })
-                # Tạo một geometry đơn giản (đường thẳng)
-                # OSRM dùng [lon, lat] cho GeoJSON, trong khi code này dùng [lat, lon]
-                # Cần chuyển đổi (coord[1] là lon, coord[0] là lat)
-                route_geometries.append({
-                    "type": "LineString",
-                    "coordinates": [[coord_from[1], coord_from[0]], [coord_to[1], coord_to[0]]]
-                })
+        route_results = []
+        for route_index, (route_tour, route_cost) in enumerate(routes):
+            # Lịch trình dự kiến tại từng điểm (khi người dùng nhập giờ xuất phát hoặc bật giờ mở cửa)
+            schedule = None
+            if departure_time is not None or respect_opening_hours:
+                schedule = solver.tour_schedule(route_tour)
+            details = build_route_details(route_tour, all_points_info, start_address, end_address,
+                                          matrix_data, profile, schedule, time_windows, co_located)
+            details["total_cost"] = route_cost  # Chi phí (từ solver, dựa trên ma trận 'table')
+            details["finish_time"] = format_clock(schedule[-1]["arrive"]) if schedule else None  # Giờ đến điểm cuối
+            details["label"] = f"{'Ngày' if split_by == 'day' else 'Xe'} {route_index + 1}"
+            if geometry_format == "polyline":
+                # Lộ trình dài: chuỗi polyline nhỏ hơn GeoJSON nhiều lần (ít byte để tải và JSON.parse trên trình duyệt)
+                details["geometries"] = [encode_geometry(g) for g in details["geometries"]]
+            if multi_route:
+                for leg in details["tour"]:
+                    leg["route_index"] = route_index
+                    leg["route_label"] = details["label"]
+            route_results.append(details)
+
+        # 8b. (Tùy chọn) So sánh phương tiện: tính chi phí của CÙNG lộ trình theo ma trận của từng profile
+        profile_comparison = {}
+        legs = [leg for route_tour, _ in routes for leg in zip(route_tour, route_tour[1:])]
+        for other_profile, other_matrix in profile_matrices.items():
+            profile_comparison[other_profile] = {
+                "distance_km": sum(other_matrix['distances'][a][b] for a, b in legs),
+                "duration_min": sum(other_matrix['durations'][a][b] for a, b in legs)
+            }
 
         print("BLL: Hoàn tất. Trả kết quả về cho Presentation Layer.")
 
@@ -250,11 +532,24 @@ def solve_gtsp_api():
         return jsonify({
             "status": "success",
             "optimize_for": optimize_for,  # Tiêu chí đã dùng
-            "total_cost": best_cost,  # Chi phí (từ solver, dựa trên ma trận 'table')
-            "total_distance_km": total_distance_osrm,  # Tổng khoảng cách (từ API 'route')
-            "total_duration_min": total_duration_osrm,  # Tổng thời gian (từ API 'route')
-            "tour": tour_details,  # Mảng thông tin chi tiết các chặng
-            "geometries": route_geometries  # Mảng các geometry (để vẽ map)
+            "profile": profile,  # Phương tiện đã dùng
+            "departure_time": format_clock(departure_time) if departure_time is not None else None,
+            "respect_opening_hours": respect_opening_hours,  # Có tính giờ mở cửa & thời gian tham quan không
+            "finish_time": None if multi_route else route_results[0]["finish_time"],  # Giờ đến điểm cuối
+            # Địa điểm không kịp tham quan trước giờ đóng cửa
+            "time_window_violations": [name for r in route_results for name in r["time_window_violations"]],
+            "profile_comparison": profile_comparison if compare_profiles else None,
+            "total_cost": sum(r["total_cost"] for r in route_results),  # Chi phí (từ solver, dựa trên ma trận 'table')
+            "total_distance_km": sum(r["total_distance_km"] for r in route_results),  # Tổng khoảng cách (từ API 'route')
+            "total_duration_min": sum(r["total_duration_min"] for r in route_results),  # Tổng thời gian (từ API 'route')
+            "tour": [leg for r in route_results for leg in r["tour"]],  # Mảng thông tin chi tiết các chặng
+            "geometries": [g for r in route_results for g in r["geometries"]],  # Mảng các geometry (để vẽ map)
+            "geometry_format": geometry_format,  # 'geojson' (LineString) hoặc 'polyline' (chuỗi mã hóa)
+            # Chế độ nhiều ngày/xe: từng lộ trình riêng (cùng cấu trúc như trên), None nếu chỉ có 1 lộ trình
+            "split_by": split_by if multi_route else None,
+            "routes": route_results if multi_route else None,
+            # Thống kê Solver: xác suất/chi phí trung bình từng alpha, Path Relinking, vòng lặp tìm ra lời giải tốt nhất
+            "solver_stats": solver_stats
         })
 
     except Exception as e:
@@ -267,12 +562,7 @@ def solve_gtsp_api():
 
 # Điểm khởi chạy của ứng dụng (khi chạy file python app_logic.py)
 if __name__ == '__main__':
-<<<<<<< HEAD
-    NEW_PORT = 8081
-    print(f"--- Lớp Trình diễn (UI) đang chạy tại: http://localhost:{NEW_PORT} ---")
-    app.run(debug=True, port=NEW_PORT)
-=======
     print("--- Lớp Logic nghiệp vụ (BLL) đang chạy tại: http://localhost:5001 ---")
-    # Chạy server Flask ở chế độ debug (tự khởi động lại khi có thay đổi) trên port 5001
-    app.run(debug=True, port=5001)
->>>>>>> 5b64062fdf1062d87e0a6be251679e475c0025bb
+    # Chạy server Flask (chế độ phát triển) trên port 5001.
+    # Debug/reloader chỉ bật khi FLASK_DEBUG=1; production dùng wsgi.py + gunicorn.conf.py.
+    app.run(debug=os.environ.get("FLASK_DEBUG", "1") == "1", port=5001)
@@ -0,0 +1,95 @@
+# logic/benchmark_kernels.py
+#
+# Benchmark kernel biên dịch (solver_kernels.py, Numba) so với Pha Cải tiến bằng Python thuần.
+#
+# Với mỗi kích thước bài toán:
+#   1. Kiểm tra kết quả GIỐNG HỆT: solve() với cùng seed, một lần dùng kernel và một lần dùng Python,
+#      phải cho cùng tour và cùng chi phí (so sánh ==, không dung sai).
+#   2. Đo thời gian Local Search (2-opt, Or-opt, đổi chỗ cụm, nội cụm) trên cùng các tour xuất phát, và thời gian solve().
+#
+# Chạy (chỉ cần CPU):
+#   python logic/benchmark_kernels.py
+#   python logic/benchmark_kernels.py --sizes 100:20 500:60 --iterations 20
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+from array import array
+
+import solver_kernels
+from benchmark_memory import make_instance
+from gtsp_solver import GTSPGraspSolver
+
+
+def local_search(solver, tours):
+    """Chạy 2-opt, Or-opt, đổi chỗ cụm, nội cụm trên bản sao của từng tour; trả về (thời gian, các tour kết quả)."""
+    results = []
+    start = time.perf_counter()
+    for tour in tours:
+        tour = solver.local_search_2opt(array('i', tour))
+        tour = solver.local_search_or_opt(tour)
+        tour = solver.local_search_cluster_swap(tour)
+        tour = solver.local_search_intra_cluster(tour)
+        results.append(list(tour))
+    return time.perf_counter() - start, results
+
+
+def timed_solve(solver, iterations, seed):
+    """solve() với seed cố định (ẩn log của Solver); trả về (thời gian, tour, chi phí)."""
+    random.seed(seed)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tour, cost = solver.solve(max_iterations=iterations)
+    return time.perf_counter() - start, tour, cost
+
+
+def run(sizes, constructions, iterations, seed):
+    if not solver_kernels.ENABLED:
+        print("Không có Numba (hoặc SOLVER_KERNELS=0): không có kernel để so sánh.")
+        return False
+
+    identical = True
+    print(f"{'điểm/cụm':>10} | {'Local Search: Python':>21} {'kernel':>9} {'x':>6} | "
+          f"{'solve(): Python':>16} {'kernel':>9} {'x':>6} | giống hệt")
+    for n_nodes, n_clusters in sizes:
+        distances, durations, clusters = make_instance(n_nodes, n_clusters, seed)
+        solver = GTSPGraspSolver(distances, durations, clusters, 0, 1, optimize_for='distance')
+        kernel_cost = solver._kernel_cost
+
+        random.seed(seed)
+        tours = [list(solver.construction_phase()) for _ in range(constructions)]
+
+        local_search(solver, tours[:1])  # Lần gọi đầu tiên của kernel (nạp từ cache) không tính giờ
+
+        # Cùng Solver, tắt kernel -> vòng lặp Python
+        solver._kernel_cost = None
+        py_ls_time, py_ls_tours = local_search(solver, tours)
+        py_time, py_tour, py_cost = timed_solve(solver, iterations, seed)
+        solver._kernel_cost = kernel_cost
+        k_ls_time, k_ls_tours = local_search(solver, tours)
+        k_time, k_tour, k_cost = timed_solve(solver, iterations, seed)
+
+        same = py_ls_tours == k_ls_tours and py_tour == k_tour and py_cost == k_cost
+        identical = identical and same
+        print(f"{n_nodes:>5}/{n_clusters:<4} | {py_ls_time * 1000:>18.1f} ms {k_ls_time * 1000:>6.1f} ms "
+              f"{py_ls_time / k_ls_time:>5.1f}x | {py_time:>14.2f} s {k_time:>7.2f} s {py_time / k_time:>5.1f}x | "
+              f"{'có' if same else 'KHÔNG'}")
+    return identical
+
+
+def parse_size(value):
+    n_nodes, n_clusters = value.split(":")
+    return int(n_nodes), int(n_clusters)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark kernel Numba của GTSPGraspSolver")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(50, 10), (200, 30), (1000, 100)],
+                        help="Các kích thước dạng số_điểm:số_cụm")
+    parser.add_argument("--constructions", type=int, default=10, help="Số tour xuất phát cho Local Search")
+    parser.add_argument("--iterations", type=int, default=10, help="Số vòng lặp GRASP của solve()")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.sizes, args.constructions, args.iterations, args.seed) else 1)
@@ -0,0 +1,166 @@
+# logic/benchmark_memory.py
+#
+# Benchmark bộ nhớ của GTSPGraspSolver trên bài toán lớn (mặc định 1000 điểm, 100 cụm).
+#
+# Đo 3 thứ:
+#   1. Bộ nhớ của trạng thái Solver (không tính ma trận đầu vào): map điểm -> cụm, danh sách cụm,
+#      mảng giờ mở cửa, các bộ đệm...
+#   2. "GC churn" của Pha Xây dựng: bộ nhớ đỉnh và số lần bộ thu gom rác (thế hệ 0) phải chạy
+#      khi gọi construction_phase() nhiều lần. Cách cũ tạo một tuple ứng viên (cost, index, cluster_id)
+#      cho MỖI điểm ở MỖI bước (~50.000 tuple mỗi lần xây dựng với 1000 điểm); cách mới ghi vào
+#      các bộ đệm array cấp phát sẵn.
+#   3. So sánh với cách biểu diễn cũ (dict index -> cluster_id, list tuple ứng viên) được tái hiện
+#      trong legacy_construction() bên dưới.
+#
+# Chạy:
+#   python logic/benchmark_memory.py
+#   python logic/benchmark_memory.py --nodes 2000 --clusters 200 --constructions 50
+import argparse
+import gc
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+from gtsp_solver import GTSPGraspSolver
+
+
+def make_instance(n_nodes, n_clusters, seed):
+    """
+    Tạo bài toán ngẫu nhiên quanh TP.HCM: ma trận khoảng cách (km) / thời gian (phút) dạng list 2D
+    giống OSRMClient trả về; điểm 0 = START, điểm 1 = END, các điểm còn lại chia đều vào n_clusters cụm.
+    """
+    rng = random.Random(seed)
+    coords = [(10.75 + rng.random() * 0.15, 106.60 + rng.random() * 0.20) for _ in range(n_nodes)]
+    distances = []
+    for lat1, lon1 in coords:
+        row = []
+        for lat2, lon2 in coords:
+            dx = (lon2 - lon1) * 111.32 * math.cos(math.radians(lat1))
+            dy = (lat2 - lat1) * 110.57
+            row.append(math.hypot(dx, dy) * 1.3)
+        distances.append(row)
+    durations = [[d / 30 * 60 for d in row] for row in distances]  # 30 km/h
+
+    members = list(range(2, n_nodes))
+    rng.shuffle(members)
+    clusters = {f"cluster_{c}": members[c::n_clusters] for c in range(n_clusters)}
+    clusters["START_CLUSTER"] = [0]
+    clusters["END_CLUSTER"] = [1]
+    return distances, durations, clusters
+
+
+def legacy_construction(distance_matrix, clusters, index_to_cluster, start_index, end_index, alpha=0.4):
+    """Pha Xây dựng theo cách biểu diễn cũ (chỉ dùng để so sánh): dict + list tuple ứng viên."""
+    tour = [start_index]
+    unvisited_clusters = set(clusters.keys())
+    unvisited_clusters.discard(index_to_cluster[start_index])
+    end_cluster_id = index_to_cluster[end_index]
+    while len(tour) < len(clusters):
+        current_index = tour[-1]
+        target_clusters = unvisited_clusters
+        if len(unvisited_clusters) == 1 and end_cluster_id in unvisited_clusters:
+            target_clusters = {end_cluster_id}
+        candidates = []
+        for cluster_id in target_clusters:
+            for next_index in clusters[cluster_id]:
+                candidates.append((distance_matrix[current_index][next_index], next_index, cluster_id))
+        min_cost = min(candidates, key=lambda x: x[0])[0]
+        max_cost = max(candidates, key=lambda x: x[0])[0]
+        threshold = min_cost + alpha * (max_cost - min_cost)
+        rcl = [c for c in candidates if c[0] <= threshold + 1e-9]
+        _, chosen_index, chosen_cluster = random.choice(rcl)
+        tour.append(chosen_index)
+        unvisited_clusters.remove(chosen_cluster)
+    if tour[-1] != end_index:
+        if end_index in tour:
+            tour.remove(end_index)
+        tour.append(end_index)
+    return tour
+
+
+def measure(label, func, repeat):
+    """
+    Chạy func() 'repeat' lần; in thời gian, bộ nhớ đỉnh và số lần GC thế hệ 0.
+    Thời gian đo ở lần chạy riêng KHÔNG bật tracemalloc (tracemalloc làm chậm mọi lần cấp phát).
+    """
+    gc.collect()
+    collections_before = gc.get_stats()[0]["collections"]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    collections = gc.get_stats()[0]["collections"] - collections_before
+
+    gc.collect()
+    tracemalloc.start()
+    for _ in range(repeat):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {elapsed / repeat * 1000:8.1f} ms/lần   "
+          f"bộ nhớ đỉnh {peak / 1024:9.1f} KiB   GC gen0: {collections}")
+
+
+def run(n_nodes, n_clusters, constructions, seed):
+    print(f"Tạo bài toán {n_nodes} điểm, {n_clusters} cụm (seed={seed})...")
+    distances, durations, clusters = make_instance(n_nodes, n_clusters, seed)
+    random.seed(seed)
+
+    # 1. Bộ nhớ trạng thái Solver (ma trận đầu vào đã được tạo trước, không tính vào đây)
+    gc.collect()
+    tracemalloc.start()
+    solver = GTSPGraspSolver(distances, durations, clusters, 0, 1, optimize_for='distance')
+    solver_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    index_to_cluster = {}
+    for cluster_id, indices in clusters.items():
+        for index in indices:
+            index_to_cluster[index] = cluster_id
+    legacy_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def kib(*objects):
+        return sum(sys.getsizeof(obj) for obj in objects) / 1024
+
+    print("\n1. Trạng thái Solver (không tính ma trận):")
+    print(f"  GTSPGraspSolver (array + __slots__)   : {solver_bytes / 1024:9.1f} KiB, gồm:")
+    print(f"    node_cluster + cluster_members       : "
+          f"{kib(solver.node_cluster, solver.cluster_members, *solver.cluster_members):9.1f} KiB")
+    print(f"    thời gian tham quan / giờ mở cửa     : "
+          f"{kib(solver.service_times, solver.earliest_start, solver.latest_start):9.1f} KiB")
+    print(f"    bộ đệm Pha Xây dựng (cấp phát 1 lần) : "
+          f"{kib(solver._tour_buffer, solver._cand_cost, solver._cand_node, solver._late_cost, solver._late_node, solver._rcl, solver._unvisited):9.1f} KiB")
+    if solver._np_mask is not None:
+        np_bytes = sum(m.nbytes for m in (solver._np_cost, solver._np_distance, solver._np_duration)
+                       if m is not None)
+        print(f"    ma trận NumPy (Xây dựng vector hóa)  : {np_bytes / 1024:9.1f} KiB")
+    print(f"  Dict index -> cluster_id (cách cũ)    : {legacy_bytes / 1024:9.1f} KiB")
+
+    # 2 + 3. Pha Xây dựng: cách mới vs cách cũ
+    print(f"\n2. Pha Xây dựng x {constructions} lần:")
+    measure("construction_phase (mới)", solver.construction_phase, constructions)
+    if solver._np_mask is not None:
+        # Cùng Solver nhưng tắt NumPy -> vòng lặp Python trên các bộ đệm array
+        np_mask, solver._np_mask = solver._np_mask, None
+        measure("construction_phase (Python)", solver.construction_phase, constructions)
+        solver._np_mask = np_mask
+    measure("legacy_construction (cũ)",
+            lambda: legacy_construction(distances, clusters, index_to_cluster, 0, 1), constructions)
+
+    # 4. Một lần solve() đầy đủ (Xây dựng + Local Search) để tham khảo
+    print("\n3. solve() (3 vòng lặp GRASP, chạy 2 lần: đo thời gian + đo bộ nhớ):")
+    measure("solve(max_iterations=3)", lambda: solver.solve(max_iterations=3), 1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark bộ nhớ GTSPGraspSolver")
+    parser.add_argument("--nodes", type=int, default=1000, help="Số điểm (gồm START/END)")
+    parser.add_argument("--clusters", type=int, default=100, help="Số cụm (không gồm START/END)")
+    parser.add_argument("--constructions", type=int, default=20, help="Số lần chạy Pha Xây dựng")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.nodes, args.clusters, args.constructions, args.seed)
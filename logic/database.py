@@ -150,6 +150,56 @@ CLUSTERS = {
 }
 
 
+# 3. Thời gian tham quan & giờ mở cửa
+# Dùng khi người dùng bật "Tính giờ mở cửa": solver cộng thời gian tham quan vào lịch trình,
+# chờ nếu đến trước giờ mở cửa, và tránh đến nơi khi không còn đủ thời gian tham quan trước giờ đóng cửa.
+# Cấu trúc:
+# "id_duy_nhat": {"visit_min": số phút tham quan, "open": "HH:MM", "close": "HH:MM"}
+# Địa điểm không có trong danh sách: tham quan DEFAULT_VISIT_MINUTES phút, mở cửa cả ngày.
+# Địa điểm không có "open"/"close": mở cửa cả ngày (ví dụ: phố đi bộ, công viên).
+DEFAULT_VISIT_MINUTES = 30
+
+VISIT_INFO = {
+    # --- Bảo tàng / di tích (đóng cửa buổi chiều) ---
+    "dinh_doc_lap":         {"visit_min": 60,  "open": "08:00", "close": "16:30"},
+    "bao_tang_ctct":        {"visit_min": 90,  "open": "07:30", "close": "17:30"},
+    "bao_tang_ls_vn":       {"visit_min": 60,  "open": "08:00", "close": "17:00"},
+    "bao_tang_my_thuat":    {"visit_min": 60,  "open": "08:00", "close": "17:00"},
+    "bao_tang_tphcm":       {"visit_min": 60,  "open": "07:30", "close": "17:00"},
+    "bao_tang_phu_nu":      {"visit_min": 45,  "open": "08:00", "close": "17:00"},
+    "bao_tang_fito":        {"visit_min": 45,  "open": "08:30", "close": "17:00"},
+    "bao_tang_ao_dai":      {"visit_min": 60,  "open": "08:30", "close": "17:00"},
+    "dia_dao_cu_chi":       {"visit_min": 150, "open": "07:00", "close": "17:00"},
+    "nha_tho_duc_ba":       {"visit_min": 20,  "open": "08:00", "close": "17:00"},
+    "buu_dien_thanh_pho":   {"visit_min": 30,  "open": "07:00", "close": "19:00"},
+    # --- Khu vui chơi ---
+    "thao_cam_vien":        {"visit_min": 120, "open": "07:00", "close": "18:30"},
+    "cv_nuoc_dam_sen":      {"visit_min": 180, "open": "08:30", "close": "18:00"},
+    "kdl_suoi_tien":        {"visit_min": 180, "open": "08:00", "close": "17:00"},
+    "landmark_81":          {"visit_min": 60,  "open": "09:00", "close": "22:00"},
+    "bitexco_skydeck":      {"visit_min": 45,  "open": "09:30", "close": "21:30"},
+    "mua_roi_nuoc_rong_vang": {"visit_min": 60, "open": "17:00", "close": "20:00"},  # Chỉ diễn buổi tối
+    "pho_tay_bui_vien":     {"visit_min": 60,  "open": "18:00", "close": "23:59"},
+    # --- Chợ / trung tâm thương mại ---
+    "cho_ben_thanh":        {"visit_min": 60,  "open": "06:00", "close": "18:00"},
+    "cho_binh_tay":         {"visit_min": 60,  "open": "06:00", "close": "17:00"},
+    "cho_tan_dinh":         {"visit_min": 45,  "open": "06:00", "close": "18:00"},
+    "cho_an_dong":          {"visit_min": 45,  "open": "07:00", "close": "18:00"},
+    "saigon_centre":        {"visit_min": 60,  "open": "09:30", "close": "22:00"},
+    "crescent_mall":        {"visit_min": 60,  "open": "10:00", "close": "22:00"},
+    "sc_vivocity":          {"visit_min": 60,  "open": "10:00", "close": "22:00"},
+    # --- Chùa / đền ---
+    "chua_ngoc_hoang":      {"visit_min": 30,  "open": "07:00", "close": "17:30"},
+    "chua_vinh_nghiem":     {"visit_min": 30,  "open": "07:00", "close": "17:00"},
+    "chua_ba_thien_hau":    {"visit_min": 30,  "open": "06:00", "close": "16:30"},
+    # --- Điểm dạo chơi ngoài trời (mở cả ngày) ---
+    "pho_nguyen_hue":       {"visit_min": 30},
+    "ho_con_rua":           {"visit_min": 20},
+    "cau_anh_sao_q7":       {"visit_min": 20},
+    "cau_mong":             {"visit_min": 15},
+}
+
+
 # --- Các hàm truy xuất dữ liệu ---
 # Các hàm này cung cấp một giao diện (interface) sạch
 # để lớp BLL (app_logic.py) tương tác với dữ liệu mà không cần biết cấu trúc bên trong.
@@ -243,4 +293,20 @@ def get_cluster_definitions_for_solver(points_map: dict, cluster_ids: list[str])
             if indices:
                 # Gán danh sách index này cho cluster_id tương ứng
                 solver_clusters[cluster_id] = indices
-    return solver_clusters  # Trả về định nghĩa cụm (dạng index) cho solver
\ No newline at end of file
+    return solver_clusters  # Trả về định nghĩa cụm (dạng index) cho solver
+
+
+def get_visit_info(landmark_id: str) -> dict:
+    """
+    Lấy thời gian tham quan và giờ mở cửa của một địa điểm.
+
+    Trả về:
+    Dict {"visit_min": số phút, "open": "HH:MM" hoặc None, "close": "HH:MM" hoặc None}
+    (None = mở cửa cả ngày)
+    """
+    info = VISIT_INFO.get(landmark_id, {})
+    return {
+        "visit_min": info.get("visit_min", DEFAULT_VISIT_MINUTES),
+        "open": info.get("open"),
+        "close": info.get("close"),
+    }
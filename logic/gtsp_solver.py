@@ -1,5 +1,43 @@
 # logic/gtsp_solver.py
 import random  # Thư viện để thực hiện các lựa chọn ngẫu nhiên
+from array import array  # Mảng kiểu số gọn (không chứa đối tượng Python)
+
+import solver_kernels  # (Tùy chọn) Kernel Numba cho Pha Cải tiến
+from lower_bound import gtsp_lower_bound  # Cận dưới -> gap của lời giải, dừng sớm
+
+try:
+    import numpy as np  # (Tùy chọn) Vector hóa Pha Xây dựng cho bài toán lớn
+except ImportError:
+    np = None
+
+
+def _python_matrix(matrix):
+    """Ma trận dạng mảng (có __array__: MatrixRows, ndarray) -> list 2D các float Python; list 2D giữ nguyên."""
+    if np is not None and hasattr(matrix, '__array__'):
+        return np.asarray(matrix).tolist()
+    return matrix
+
+
+class TourSchedule:
+    """
+    Lịch trình của một tour (dùng nội bộ trong Solver): giờ đến / bắt đầu tham quan / rời đi
+    tại từng vị trí, cùng các mảng slack để đánh giá nước đi trong O(1).
+    """
+
+    __slots__ = ("arrive", "start", "depart", "lateness", "distance", "cost",
+                 "up", "down", "latest", "shift_p", "shift_q")
+
+    def __init__(self, arrive, start, depart, lateness, distance):
+        self.arrive = arrive        # Giờ đến vị trí k
+        self.start = start          # Giờ bắt đầu tham quan (= max(giờ đến, giờ mở cửa))
+        self.depart = depart        # Giờ rời đi (= start + thời gian tham quan)
+        self.lateness = lateness    # Tổng số phút trễ giờ mở cửa tại các vị trí 0..k
+        self.distance = distance    # Tổng quãng đường từ START đến vị trí k
+        self.cost = 0.0
+        # Slack cho chế độ time-dependent (a) và giờ mở cửa (b) - xem GTSPGraspSolver._schedule
+        self.up = self.down = None
+        self.latest = self.shift_p = self.shift_q = None
+
 
 class GTSPGraspSolver:
     """
@@ -14,8 +52,45 @@ class GTSPGraspSolver:
     *thứ tự các cụm* và *điểm đại diện* cho mỗi cụm để tối ưu hóa chi phí.
     """
 
+    # Mức phạt cho mỗi phút trễ giờ mở cửa (đơn vị: chi phí của optimize_for)
+    LATENESS_PENALTY = 1000.0
+
+    # Số điểm tối thiểu để Pha Xây dựng dùng NumPy (bài toán nhỏ: vòng lặp Python nhanh hơn,
+    # vì mỗi phép toán NumPy tốn vài micro giây chi phí cố định)
+    VECTORIZE_MIN_NODES = 100
+
+    # GRASP phản ứng (Reactive GRASP - Prais & Ribeiro, 2000): alpha được chọn ngẫu nhiên từ tập giá trị
+    # dưới đây theo xác suất p_i; sau mỗi REACTIVE_BLOCK vòng lặp, p_i tỉ lệ với (best / trung bình_i)^DELTA
+    # -> alpha cho ra lời giải tốt hơn được chọn nhiều hơn.
+    REACTIVE_ALPHAS = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+    REACTIVE_BLOCK = 10
+    REACTIVE_DELTA = 10
+    # Số lời giải ưu tú (elite) giữ lại cho Path Relinking
+    ELITE_SIZE = 5
+    # Cận dưới 'subset_dp' (<= 10 cụm) chính là chi phí tối ưu: chỉ dừng sớm khi đã đạt đúng tối ưu
+    # (sai số làm tròn), không dừng ở lời giải cách tối ưu target_gap
+    EXACT_GAP = 1e-9
+    # Độ dài tối đa của đoạn được di chuyển trong Or-opt
+    OR_OPT_MAX_SEGMENT = 3
+
+    # __slots__: không tạo __dict__ cho mỗi đối tượng Solver (gọn hơn, truy cập thuộc tính nhanh hơn)
+    __slots__ = (
+        "distance_matrix", "duration_matrix", "optimize_for", "cost_matrix", "clusters",
+        "cluster_ids", "cluster_members", "node_cluster",
+        "start_index", "end_index", "n_nodes", "n_clusters",
+        "td_durations", "departure_time", "time_dependent",
+        "service_times", "earliest_start", "latest_start", "has_visit_constraints",
+        "scheduled", "use_td", "_travel_time",
+        "_tour_buffer", "_cand_cost", "_cand_node", "_late_cost", "_late_node", "_rcl", "_unvisited",
+        "_np_cost", "_np_distance", "_np_duration", "_np_earliest", "_np_latest",
+        "_np_members", "_np_in_cluster", "_np_mask", "_np_node_cluster", "_np_member_rank",
+        "_kernel_cost", "_kernel_member_start", "_kernel_members", "stats",
+    )
+
     def __init__(self, distance_matrix, duration_matrix, clusters,
-                 start_index, end_index, optimize_for='distance'):
+                 start_index, end_index, optimize_for='distance',
+                 td_durations=None, departure_time=8 * 60,
+                 service_times=None, time_windows=None):
         """
         Hàm khởi tạo (Constructor) của lớp Solver.
         
@@ -28,29 +103,146 @@ class GTSPGraspSolver:
         - start_index: Index của điểm bắt đầu (ví dụ: 0).
         - end_index: Index của điểm kết thúc (ví dụ: 1).
         - optimize_for: Tiêu chí tối ưu ('distance' hoặc 'time').
+        - td_durations: (Tùy chọn) TimeDependentDurations - thời gian di chuyển theo khung giờ.
+          Chỉ dùng khi optimize_for='time': mỗi chặng được tính theo GIỜ KHỞI HÀNH của chặng đó.
+        - departure_time: Giờ xuất phát tại điểm START (phút kể từ 00:00, mặc định 8:00).
+        - service_times: (Tùy chọn) Dict {index: số phút tham quan tại điểm đó}.
+        - time_windows: (Tùy chọn) Dict {index: (giờ mở cửa, giờ đóng cửa)} tính bằng phút kể từ 00:00.
+          Đến trước giờ mở cửa thì phải chờ; phải tham quan XONG trước giờ đóng cửa.
+          Khi có service_times/time_windows, chi phí 'time' = thời điểm đến END - giờ xuất phát
+          (bao gồm cả thời gian tham quan và chờ mở cửa).
         """
         
         self.distance_matrix = distance_matrix
         self.duration_matrix = duration_matrix
         self.optimize_for = optimize_for
+        # Ma trận ứng với tiêu chí tối ưu (tránh rẽ nhánh theo optimize_for trong vòng lặp nóng)
+        self.cost_matrix = duration_matrix if optimize_for == 'time' else distance_matrix
         
         # clusters là dict: {"cluster_id": [index1, index2], ...}
         # Đã bao gồm cả cụm Start và End
         self.clusters = clusters
         
-        # Tạo map tra cứu ngược: từ index (của điểm con) về cluster_id
-        # Giúp nhanh chóng biết một điểm (index) thuộc cụm nào.
-        # Vd: { index1: "cluster_id_1", index2: "cluster_id_1", index3: "cluster_id_2", ... }
-        self.index_to_cluster = {}
-        for cluster_id, indices in clusters.items():
-            for index in indices:
-                self.index_to_cluster[index] = cluster_id
+        # Biểu diễn gọn bên trong Solver: mỗi cụm được đánh số nguyên 0..n_clusters-1
+        # - cluster_ids[c]      : cluster_id gốc của cụm số c
+        # - cluster_members[c]  : array('i') các index thuộc cụm c
+        # - node_cluster[index] : số hiệu cụm của điểm index (-1 nếu không thuộc cụm nào)
+        # array('i') dùng 4 byte/phần tử, không tạo đối tượng Python cho từng phần tử (khác dict/list).
+        self.cluster_ids = list(clusters.keys())
+        self.cluster_members = [array('i', clusters[cluster_id]) for cluster_id in self.cluster_ids]
+        self.node_cluster = array('i', [-1]) * len(distance_matrix)
+        for c, members in enumerate(self.cluster_members):
+            for index in members:
+                self.node_cluster[index] = c
         
         self.start_index = start_index
         self.end_index = end_index
         self.n_nodes = len(distance_matrix)  # Tổng số điểm con (nodes) trong ma trận
         self.n_clusters = len(clusters)      # Tổng số cụm cần thăm (gồm cả Start/End)
 
+        # Chế độ phụ thuộc thời gian (time-dependent): chi phí tour = thời điểm đến END - giờ xuất phát
+        self.td_durations = td_durations
+        self.departure_time = departure_time
+        self.time_dependent = td_durations is not None and optimize_for == 'time'
+
+        # Thời gian tham quan & giờ mở cửa (mảng theo index để tra cứu nhanh trong vòng lặp)
+        # latest_start[i] = giờ đóng cửa - thời gian tham quan = giờ BẮT ĐẦU tham quan muộn nhất
+        inf = float('inf')
+        self.service_times = array('d', [0.0]) * self.n_nodes
+        self.earliest_start = array('d', [-inf]) * self.n_nodes
+        self.latest_start = array('d', [inf]) * self.n_nodes
+        for index, minutes in (service_times or {}).items():
+            self.service_times[index] = minutes
+        for index, (opening, closing) in (time_windows or {}).items():
+            self.earliest_start[index] = opening
+            self.latest_start[index] = closing - self.service_times[index]
+        self.has_visit_constraints = bool(service_times or time_windows)
+
+        # Chế độ có lịch trình: phải mô phỏng giờ giấc dọc theo tour để tính chi phí
+        self.scheduled = self.time_dependent or self.has_visit_constraints
+        # Giờ giấc tính theo ma trận khung giờ nếu có, ngược lại theo ma trận tĩnh
+        self.use_td = td_durations is not None and self.scheduled
+        self._travel_time = td_durations.travel_time if self.use_td else self._static_travel_time
+
+        # Bộ đệm (buffer) cấp phát MỘT LẦN, dùng lại cho mọi vòng lặp GRASP (không tạo list/tuple
+        # ứng viên mới ở mỗi bước -> giảm áp lực lên bộ thu gom rác khi nhiều request chạy song song).
+        # Vì vậy một đối tượng Solver KHÔNG được dùng đồng thời từ nhiều thread.
+        self._tour_buffer = array('i', [0]) * self.n_clusters     # Tour của Pha Xây dựng
+        self._cand_cost = array('d', [0.0]) * self.n_nodes        # Chi phí của ứng viên
+        self._cand_node = array('i', [0]) * self.n_nodes          # Index của ứng viên
+        self._late_cost = array('d', [0.0]) * self.n_nodes        # Ứng viên trễ giờ mở cửa
+        self._late_node = array('i', [0]) * self.n_nodes
+        self._rcl = array('i', [0]) * self.n_nodes                # Vị trí các ứng viên thuộc RCL
+        self._unvisited = array('i', range(self.n_clusters))     # Các cụm chưa thăm (hoán vị)
+
+        # Pha Xây dựng vector hóa (NumPy): mỗi bước lấy 1 hàng của ma trận, lọc bằng mặt nạ (mask)
+        # các điểm thuộc cụm chưa thăm, rồi tính min/max/RCL trên cả mảng thay vì từng điểm.
+        self._np_mask = None
+        if np is not None and self.n_nodes >= self.VECTORIZE_MIN_NODES:
+            self._init_vectorized()
+
+        # Pha Cải tiến ở chế độ tĩnh chạy bằng kernel biên dịch (Numba) nếu có - xem solver_kernels.py
+        self._kernel_cost = None
+        if solver_kernels.ENABLED and not self.scheduled:
+            self._init_kernels()
+
+        # Chế độ có lịch trình chạy bằng vòng lặp Python (truy cập matrix[i][j] rất nhiều lần): ma trận dạng
+        # mảng (MatrixRows - xem osrm_table.py) được đổi sang list 2D các float Python, truy cập nhanh gấp ~2 lần.
+        # (Pha Xây dựng vector hóa ở trên đã lấy mảng gốc, không copy.)
+        if self.scheduled:
+            self.distance_matrix = _python_matrix(distance_matrix)
+            self.duration_matrix = _python_matrix(duration_matrix)
+            self.cost_matrix = self.duration_matrix if optimize_for == 'time' else self.distance_matrix
+
+        # Thống kê của lần solve() gần nhất (xác suất alpha, Path Relinking, ...) - xem solve()
+        self.stats = None
+
+    def _init_vectorized(self):
+        """Tạo các mảng NumPy cho Pha Xây dựng vector hóa (ma trận đã là ndarray thì không copy)."""
+        as_matrix = lambda matrix: np.asarray(matrix, dtype=np.float64)
+        self._np_cost = self._np_distance = self._np_duration = None
+        self._np_earliest = self._np_latest = None
+        if not self.scheduled:
+            self._np_cost = as_matrix(self.cost_matrix)
+        else:
+            if self.optimize_for != 'time':
+                self._np_distance = as_matrix(self.distance_matrix)
+            if not self.use_td:  # Theo khung giờ: TimeDependentDurations.travel_times
+                self._np_duration = as_matrix(self.duration_matrix)
+            self._np_earliest = np.frombuffer(self.earliest_start, dtype=np.float64)
+            self._np_latest = np.frombuffer(self.latest_start, dtype=np.float64)
+        self._np_members = [np.frombuffer(members, dtype=np.int32) for members in self.cluster_members]
+        self._np_node_cluster = np.frombuffer(self.node_cluster, dtype=np.int32)
+        # Điểm thuộc một cụm nào đó (điểm không thuộc cụm nào không bao giờ là ứng viên)
+        self._np_in_cluster = self._np_node_cluster >= 0
+        # Vị trí của mỗi điểm trong cụm của nó: sắp RCL theo đúng thứ tự duyệt của construction_phase
+        self._np_member_rank = np.zeros(self.n_nodes, dtype=np.int64)
+        for members in self._np_members:
+            self._np_member_rank[members] = np.arange(members.size)
+        self._np_mask = np.empty(self.n_nodes, dtype=bool)
+
+    def _init_kernels(self):
+        """Tạo ma trận chi phí float64 và danh sách điểm của các cụm dạng CSR cho solver_kernels."""
+        self._kernel_cost = self._np_cost if self._np_mask is not None else \
+            np.asarray(self.cost_matrix, dtype=np.float64)
+        members = array('i')
+        member_start = array('i', [0])
+        for cluster_members in self.cluster_members:
+            members.extend(cluster_members)
+            member_start.append(len(members))
+        self._kernel_members = np.frombuffer(members, dtype=np.int32)
+        self._kernel_member_start = np.frombuffer(member_start, dtype=np.int32)
+
+    def _kernel_tour(self, tour):
+        """Tour dạng array('i') và mảng NumPy trỏ vào CÙNG vùng nhớ (kernel sửa trực tiếp tour)."""
+        if not isinstance(tour, array):
+            tour = array('i', tour)
+        return tour, np.frombuffer(tour, dtype=np.int32)
+
+    def cluster_id_of(self, index):
+        """cluster_id gốc của điểm index."""
+        return self.cluster_ids[self.node_cluster[index]]
+
     def get_cost(self, i, j):
         """
         Hàm tiện ích: Lấy chi phí (cost) di chuyển từ điểm i đến điểm j
@@ -67,6 +259,11 @@ class GTSPGraspSolver:
 
     def calculate_total_cost(self, tour):
         """Tính tổng chi phí của một lộ trình (tour)"""
+        if self.scheduled:
+            # Chế độ có lịch trình: tổng thời gian hành trình (đến END - xuất phát) hoặc quãng đường,
+            # cộng mức phạt nếu trễ giờ mở cửa
+            return self._schedule(tour).cost
+
         # tour là một danh sách các index, ví dụ: [0, 5, 12, 8, 1]
         total = 0
         for i in range(len(tour) - 1):
@@ -84,82 +281,243 @@ class GTSPGraspSolver:
           + alpha = 0: Thuật toán tham lam thuần túy (luôn chọn cái tốt nhất).
           + alpha = 1: Thuật toán ngẫu nhiên thuần túy (chọn bất kỳ).
           + 0 < alpha < 1: Tham lam có ngẫu nhiên (GRASP).
+
+        LƯU Ý: tour trả về là bộ đệm array('i') DÙNG LẠI của Solver - lần gọi sau sẽ ghi đè,
+        hãy copy (array('i', tour) hoặc list(tour)) nếu cần giữ lại.
         """
+        if self._np_mask is not None:
+            return self._vectorized_construction_phase(alpha)
+
+        inf = float('inf')
+        node_cluster = self.node_cluster
+        cluster_members = self.cluster_members
+        cost_matrix = self.cost_matrix
+        travel_time = self._travel_time
+        earliest_start, latest_start = self.earliest_start, self.latest_start
+        cand_cost, cand_node = self._cand_cost, self._cand_node
+        late_cost, late_node = self._late_cost, self._late_node
+        rcl = self._rcl
+        unvisited = self._unvisited
+        scheduled = self.scheduled
+        by_time = self.optimize_for == 'time'
+
         # Bắt đầu lộ trình với điểm start_index
-        tour = [self.start_index]
+        tour = self._tour_buffer
+        tour[0] = self.start_index
+        length = 1
+        # Thời điểm rời điểm hiện tại (chỉ dùng ở chế độ có lịch trình)
+        current_time = self.departure_time
         
-        # Xác định cụm hiện tại (cụm START)
-        current_cluster = self.index_to_cluster[self.start_index]
-        
-        # Tạo một tập (set) chứa các cụm CHƯA được thăm
-        unvisited_clusters = set(self.clusters.keys())
-        unvisited_clusters.discard(current_cluster)  # Loại bỏ cụm START
+        # Các cụm CHƯA được thăm: unvisited[0:n_unvisited] (xóa phần tử bằng cách hoán đổi về cuối, O(1))
+        # Đặt lại thứ tự ban đầu: thứ tự ứng viên không phụ thuộc các lần gọi trước (cùng seed -> cùng tour)
+        n_unvisited = self.n_clusters
+        for c in range(n_unvisited):
+            unvisited[c] = c
+        position = unvisited.index(node_cluster[self.start_index])  # Loại bỏ cụm START
+        n_unvisited -= 1
+        unvisited[position], unvisited[n_unvisited] = unvisited[n_unvisited], unvisited[position]
         
         # Lặp cho đến khi lộ trình đi qua đủ số cụm (self.n_clusters)
-        while len(tour) < self.n_clusters:
-            current_index = tour[-1]  # Điểm cuối cùng vừa thêm vào tour
-            
-            # Tìm các ứng viên (candidates) cho bước đi tiếp theo
-            # candidate = (chi phí, điểm_đến, cụm_đến)
-            candidates = []
-            
-            # Chỉ tìm điểm đến ở các cụm CHƯA THĂM
-            target_clusters = unvisited_clusters
+        while length < self.n_clusters:
+            current_index = tour[length - 1]  # Điểm cuối cùng vừa thêm vào tour
+            cost_row = cost_matrix[current_index]
+            distance_row = self.distance_matrix[current_index]
             
-            # --- Xử lý logic đặc biệt cho điểm KẾT THÚC (END) ---
-            # Nếu chỉ còn 1 cụm chưa thăm, VÀ cụm đó là cụm END
-            # -> Bắt buộc bước tiếp theo phải đi đến cụm END.
-            end_cluster_id = self.index_to_cluster[self.end_index]
-            if len(unvisited_clusters) == 1 and end_cluster_id in unvisited_clusters:
-                 target_clusters = {end_cluster_id}  # Chỉ đi đến cụm END
-
-            # Duyệt qua các cụm mục tiêu (chưa thăm)
-            for cluster_id in target_clusters:
-                # Duyệt qua TẤT CẢ các điểm con (nodes) trong cụm đó
-                for next_index in self.clusters[cluster_id]:
-                    cost = self.get_cost(current_index, next_index)
-                    if cost != float('inf'):  # Nếu có đường đi
-                        candidates.append((cost, next_index, cluster_id))
-            
-            if not candidates:
+            # Tìm các ứng viên (candidates) cho bước đi tiếp theo, ghi vào bộ đệm:
+            # cand_node[k], cand_cost[k] với k < n_cand; min/max được cập nhật ngay khi duyệt
+            # (Khi chỉ còn cụm END chưa thăm, vòng lặp chỉ duyệt cụm END -> bắt buộc đi đến END.)
+            n_cand = n_late = 0
+            min_cost = min_late = inf
+            max_cost = max_late = -inf
+
+            # Duyệt qua các cụm mục tiêu (chưa thăm) và TẤT CẢ các điểm con (nodes) trong cụm đó
+            if not scheduled:
+                for u in range(n_unvisited):
+                    for next_index in cluster_members[unvisited[u]]:
+                        cost = cost_row[next_index]
+                        if cost != inf:  # Nếu có đường đi
+                            cand_cost[n_cand] = cost
+                            cand_node[n_cand] = next_index
+                            n_cand += 1
+                            if cost < min_cost:
+                                min_cost = cost
+                            if cost > max_cost:
+                                max_cost = cost
+            else:
+                for u in range(n_unvisited):
+                    for next_index in cluster_members[unvisited[u]]:
+                        # Giờ bắt đầu tham quan = max(giờ đến, giờ mở cửa)
+                        arrival = current_time + travel_time(current_index, next_index, current_time)
+                        start = max(arrival, earliest_start[next_index])
+                        cost = start - current_time if by_time else distance_row[next_index]
+                        if cost == inf:
+                            continue
+                        if start > latest_start[next_index]:
+                            # Ứng viên trễ giờ mở cửa: chỉ dùng khi không còn ứng viên nào khả thi
+                            late_cost[n_late] = cost
+                            late_node[n_late] = next_index
+                            n_late += 1
+                            if cost < min_late:
+                                min_late = cost
+                            if cost > max_late:
+                                max_late = cost
+                        else:
+                            cand_cost[n_cand] = cost
+                            cand_node[n_cand] = next_index
+                            n_cand += 1
+                            if cost < min_cost:
+                                min_cost = cost
+                            if cost > max_cost:
+                                max_cost = cost
+
+            if n_cand > 0:
+                costs, nodes, n_choices = cand_cost, cand_node, n_cand
+            else:
+                # Không còn điểm nào kịp giờ -> chấp nhận trễ (bị phạt)
+                costs, nodes, n_choices = late_cost, late_node, n_late
+                min_cost, max_cost = min_late, max_late
+
+            if n_choices == 0:
                 # Trường hợp bị kẹt (không tìm thấy đường đi)
                 # (ví dụ: ma trận chi phí bị lỗi hoặc điểm bị cô lập)
-                # Cố gắng thêm điểm cuối (nếu chưa có) và thoát
-                if self.end_index not in tour:
-                    tour.append(self.end_index)
-                return tour  # Trả về lộ trình lỗi
-
-            # Tìm chi phí min/max từ các ứng viên
-            min_cost = min(candidates, key=lambda x: x[0])[0]
-            max_cost = max(candidates, key=lambda x: x[0])[0]
-            
+                return self._stuck_tour(tour, length)  # Trả về lộ trình lỗi
+
             # Tạo Danh sách Ứng viên Hạn chế (RCL - Restricted Candidate List)
             # RCL bao gồm các ứng viên "đủ tốt"
             # Ngưỡng (threshold) = min_cost + alpha * (max_cost - min_cost)
-            threshold = min_cost + alpha * (max_cost - min_cost)
-            
             # Thêm 1e-9 để xử lý sai số dấu phẩy động
-            rcl = [c for c in candidates if c[0] <= threshold + 1e-9]
-            
-            if not rcl:
-                rcl = candidates  # Fallback (nếu rcl rỗng, dùng tất cả ứng viên)
+            threshold = min_cost + alpha * (max_cost - min_cost) + 1e-9
+            n_rcl = 0
+            for k in range(n_choices):
+                if costs[k] <= threshold:
+                    rcl[n_rcl] = k
+                    n_rcl += 1
             
-            # Chọn NGẪU NHIÊN một ứng viên từ RCL
-            chosen_cost, chosen_index, chosen_cluster = random.choice(rcl)
+            # Chọn NGẪU NHIÊN một ứng viên từ RCL (RCL luôn chứa ứng viên có chi phí min_cost)
+            chosen_index = nodes[rcl[random.randrange(n_rcl)]]
+            chosen_cluster = node_cluster[chosen_index]
             
             # Thêm điểm được chọn vào lộ trình
-            tour.append(chosen_index)
+            tour[length] = chosen_index
+            length += 1
+            if scheduled:
+                arrival = current_time + travel_time(current_index, chosen_index, current_time)
+                current_time = (max(arrival, earliest_start[chosen_index])
+                                + self.service_times[chosen_index])
             # Đánh dấu cụm tương ứng là "đã thăm"
-            unvisited_clusters.remove(chosen_cluster)
+            position = unvisited.index(chosen_cluster)
+            n_unvisited -= 1
+            unvisited[position], unvisited[n_unvisited] = unvisited[n_unvisited], unvisited[position]
         
+        return self._close_tour(tour)
+
+    def _vectorized_construction_phase(self, alpha):
+        """
+        Pha Xây dựng như construction_phase() nhưng dùng NumPy: mỗi bước xử lý cả hàng ma trận
+        của điểm hiện tại. Cùng ngưỡng RCL (min + alpha * (max - min) + 1e-9), cùng quy tắc ưu tiên
+        ứng viên kịp giờ mở cửa, chọn ngẫu nhiên đều trong RCL.
+        RCL được sắp theo thứ tự duyệt của construction_phase (vị trí cụm trong danh sách cụm chưa thăm,
+        rồi vị trí điểm trong cụm) -> cùng seed cho cùng tour với cả hai cách (mọi alpha).
+        """
+        inf = float('inf')
+        node_cluster = self.node_cluster
+        np_members = self._np_members
+        scheduled = self.scheduled
+        by_time = self.optimize_for == 'time'
+        mask = self._np_mask
+        np_cost, np_distance, np_duration = self._np_cost, self._np_distance, self._np_duration
+        td = self.td_durations if self.use_td else None
+        np_earliest, np_latest = self._np_earliest, self._np_latest
+
+        tour = self._tour_buffer
+        tour[0] = self.start_index
+        length = 1
+        current_time = self.departure_time
+
+        # mask[i] = True nếu điểm i thuộc một cụm CHƯA thăm
+        mask[:] = self._np_in_cluster
+        mask[np_members[node_cluster[self.start_index]]] = False
+        # Danh sách cụm chưa thăm giống construction_phase (xóa bằng hoán đổi về cuối);
+        # cluster_position[c] = vị trí của cụm c trong danh sách -> thứ tự ứng viên trong RCL
+        unvisited = self._unvisited
+        n_unvisited = self.n_clusters
+        for c in range(n_unvisited):
+            unvisited[c] = c
+        cluster_position = np.arange(n_unvisited)
+
+        def remove_cluster(c, n_unvisited):
+            position = cluster_position[c]
+            last = unvisited[n_unvisited - 1]
+            unvisited[position], unvisited[n_unvisited - 1] = last, c
+            cluster_position[last], cluster_position[c] = position, n_unvisited - 1
+            return n_unvisited - 1
+
+        n_unvisited = remove_cluster(node_cluster[self.start_index], n_unvisited)
+
+        while length < self.n_clusters:
+            current_index = tour[length - 1]
+            nodes = np.flatnonzero(mask)  # Các ứng viên (điểm thuộc cụm chưa thăm)
+
+            if not scheduled:
+                costs = np_cost[current_index, nodes]
+                reachable = costs != inf  # Bỏ các điểm không có đường đi
+                if not reachable.all():
+                    nodes, costs = nodes[reachable], costs[reachable]
+            else:
+                # Giờ bắt đầu tham quan = max(giờ đến, giờ mở cửa); mọi ứng viên cùng giờ khởi hành
+                if td is not None:
+                    travel = td.travel_times(current_index, nodes, current_time)
+                else:
+                    travel = np_duration[current_index, nodes]
+                starts = np.maximum(current_time + travel, np_earliest[nodes])
+                costs = starts - current_time if by_time else np_distance[current_index, nodes]
+                reachable = costs != inf
+                on_time = reachable & (starts <= np_latest[nodes])
+                # Ứng viên trễ giờ mở cửa chỉ dùng khi không còn ứng viên nào khả thi
+                keep = on_time if on_time.any() else reachable
+                nodes, costs = nodes[keep], costs[keep]
+
+            if nodes.size == 0:
+                return self._stuck_tour(tour, length)
+
+            # RCL: các ứng viên có chi phí <= min_cost + alpha * (max_cost - min_cost)
+            min_cost = costs.min()
+            threshold = min_cost + alpha * (costs.max() - min_cost) + 1e-9
+            rcl = nodes[costs <= threshold]
+            if rcl.size > 1:
+                rank = cluster_position[self._np_node_cluster[rcl]] * self.n_nodes + self._np_member_rank[rcl]
+                rcl = rcl[np.argsort(rank)]
+            chosen_index = int(rcl[random.randrange(rcl.size)])
+
+            tour[length] = chosen_index
+            length += 1
+            if scheduled:
+                arrival = current_time + self._travel_time(current_index, chosen_index, current_time)
+                current_time = (max(arrival, self.earliest_start[chosen_index])
+                                + self.service_times[chosen_index])
+            # Đánh dấu cụm tương ứng là "đã thăm"
+            mask[np_members[node_cluster[chosen_index]]] = False
+            n_unvisited = remove_cluster(node_cluster[chosen_index], n_unvisited)
+
+        return self._close_tour(tour)
+
+    def _stuck_tour(self, tour, length):
+        """Pha Xây dựng bị kẹt: trả về phần tour đã có, thêm điểm END (nếu chưa có)."""
+        stuck_tour = tour[:length]
+        if self.end_index not in stuck_tour:
+            stuck_tour.append(self.end_index)
+        return stuck_tour
+
+    def _close_tour(self, tour):
+        """Kết thúc Pha Xây dựng: đưa điểm END về cuối tour."""
         # Đảm bảo điểm kết thúc (end_index) LUÔN là điểm cuối cùng
-        # (Vì vòng lặp trên có thể chọn điểm END ở giữa)
+        # (Vì vòng lặp xây dựng có thể chọn điểm END ở giữa)
         if tour[-1] != self.end_index:
-            if self.end_index in tour:
-                tour.remove(self.end_index)  # Xóa nếu nó nằm ở giữa
-            # Thêm điểm END vào cuối cùng
-            # (Nếu điểm cuối cùng *đã là* end_index, không làm gì cả)
-            tour.append(self.end_index)
+            if self.end_index not in tour:
+                return tour + array('i', [self.end_index])  # Thêm điểm END vào cuối cùng
+            position = tour.index(self.end_index)  # Xóa END ở giữa: dời các điểm sau nó lên 1 vị trí
+            tour[position:-1] = tour[position + 1:]
+            tour[-1] = self.end_index  # rồi đặt END vào cuối cùng
             
         return tour  # Trả về lộ trình đã xây dựng
 
@@ -169,51 +527,150 @@ class GTSPGraspSolver:
         Mục đích: Tối ưu hóa THỨ TỰ của các điểm/cụm trong lộ trình.
         Nó thử đảo ngược một đoạn của lộ trình để xem chi phí có giảm không.
 
-        Ví dụ: Lộ trình A -> B -> C -> D
-        Thử: A -> C -> B -> D (đảo đoạn B-C)
-        Nếu cost(A->C) + cost(B->D) < cost(A->B) + cost(C->D) thì chấp nhận.
+        Ví dụ: Lộ trình A -> B -> ... -> C -> D
+        Thử: A -> C -> ... -> B -> D (đảo đoạn B..C)
+
+        Ma trận OSRM BẤT ĐỐI XỨNG (đường một chiều): đảo đoạn B..C làm đổi chi phí của MỌI cạnh
+        bên trong đoạn (X->Y thành Y->X), không chỉ 2 cạnh biên. Chênh lệch được tính chính xác trong O(1)
+        bằng tổng tiền tố (prefix sum) của chi phí các cạnh theo chiều xuôi và chiều ngược:
+          forward[k]  = cost(t0->t1) + ... + cost(t[k-1]->t[k])
+          backward[k] = cost(t1->t0) + ... + cost(t[k]->t[k-1])
+          đoạn [i, j] sau khi đảo có chi phí bên trong = backward[j] - backward[i]
 
         LƯU Ý: Chúng ta giữ cố định điểm đầu (index 0) và điểm cuối (index -1).
         """
-        best_tour = tour
-        best_cost = self.calculate_total_cost(tour)
+        if self.scheduled:
+            return self._scheduled_local_search_2opt(tour)
+        if self._kernel_cost is not None:
+            tour, tour_view = self._kernel_tour(tour)
+            solver_kernels.two_opt(tour_view, self._kernel_cost)
+            return tour
+
+        cost = self.cost_matrix
         n = len(tour)
+        forward = array('d', [0.0]) * n
+        backward = array('d', [0.0]) * n
         improved = True  # Cờ (flag) kiểm tra xem còn cải thiện được không
         
         while improved:
             improved = False
+            # Tổng tiền tố của tour hiện tại (tính lại sau mỗi lần đảo, O(n))
+            for k in range(1, n):
+                forward[k] = forward[k - 1] + cost[tour[k - 1]][tour[k]]
+                backward[k] = backward[k - 1] + cost[tour[k]][tour[k - 1]]
             # i từ 1 (sau điểm START)
             for i in range(1, n - 2):
                 # j từ i+1 (sau i)
                 for j in range(i + 1, n - 1):  # (trước điểm END)
                     
                     # Lấy 4 điểm liên quan đến 2 cạnh (i-1 -> i) và (j -> j+1)
-                    p_i_minus_1 = tour[i-1] # (A)
-                    p_i = tour[i]           # (B)
-                    p_j = tour[j]           # (C)
-                    p_j_plus_1 = tour[j+1]  # (D)
-
-                    # Chi phí của 2 cạnh cũ: (A->B) và (C->D)
-                    cost_before = self.get_cost(p_i_minus_1, p_i) + self.get_cost(p_j, p_j_plus_1)
-                    # Chi phí của 2 cạnh mới (nếu đảo): (A->C) và (B->D)
-                    cost_after = self.get_cost(p_i_minus_1, p_j) + self.get_cost(p_i, p_j_plus_1)
-                    
-                    # Chênh lệch chi phí
-                    cost_delta = cost_after - cost_before
+                    a = tour[i - 1]  # (A)
+                    b = tour[i]      # (B)
+                    c = tour[j]      # (C)
+                    d = tour[j + 1]  # (D)
+
+                    # Chi phí cũ: (A->B), (C->D) và đoạn B..C theo chiều xuôi
+                    cost_before = cost[a][b] + cost[c][d] + (forward[j] - forward[i])
+                    # Chi phí mới: (A->C), (B->D) và đoạn C..B (đi ngược từng cạnh)
+                    cost_after = cost[a][c] + cost[b][d] + (backward[j] - backward[i])
 
                     # Nếu chi phí giảm (nhỏ hơn 0, dùng -1e-9 để tránh sai số)
-                    if cost_delta < -1e-9:  # Cải thiện
-                        # Đảo ngược đoạn [i, j]
-                        tour = tour[:i] + tour[i:j+1][::-1] + tour[j+1:]
-                        
-                        best_tour = tour
-                        best_cost += cost_delta
+                    if cost_after - cost_before < -1e-9:  # Cải thiện
+                        # Đảo ngược đoạn [i, j] ngay trên tour (không tạo tour mới)
+                        tour[i:j+1] = tour[i:j+1][::-1]
                         improved = True  # Đánh dấu là đã cải thiện
                         break  # Thoát vòng lặp j
                 if improved:
                     break  # Thoát vòng lặp i (bắt đầu lại từ đầu với tour mới)
         
-        return best_tour  # Trả về lộ trình tốt nhất sau 2-opt
+        return tour  # Trả về lộ trình tốt nhất sau 2-opt
+
+    def local_search_or_opt(self, tour):
+        """
+        Pha Cải tiến (Local Search) - Or-opt: chuyển một đoạn 1..OR_OPT_MAX_SEGMENT cụm liên tiếp
+        sang vị trí khác trong tour, GIỮ NGUYÊN chiều của đoạn (nên đúng với ma trận bất đối xứng:
+        các cạnh bên trong đoạn không đổi).
+
+        Ví dụ: A -> [S1 -> S2] -> B -> ... -> X -> Y
+        Thử:   A -> B -> ... -> X -> [S1 -> S2] -> Y
+        Chênh lệch (O(1)) = cost(A->B) + cost(X->S1) + cost(S2->Y) - cost(A->S1) - cost(S2->B) - cost(X->Y)
+        """
+        if self.scheduled:
+            return self._scheduled_local_search_or_opt(tour)
+        if self._kernel_cost is not None:
+            tour, tour_view = self._kernel_tour(tour)
+            solver_kernels.or_opt(tour_view, self._kernel_cost, self.OR_OPT_MAX_SEGMENT)
+            return tour
+
+        cost = self.cost_matrix
+        n = len(tour)
+        improved = True
+
+        while improved:
+            improved = False
+            for length in range(1, self.OR_OPT_MAX_SEGMENT + 1):
+                # Đoạn tour[i..e] (không chứa START/END)
+                for i in range(1, n - length):
+                    e = i + length - 1
+                    a, first, last, b = tour[i - 1], tour[i], tour[e], tour[e + 1]
+                    # Chi phí tiết kiệm được khi gỡ đoạn ra (nối thẳng A -> B)
+                    removed = cost[a][first] + cost[last][b] - cost[a][b]
+                    # Chèn đoạn vào giữa tour[p] và tour[p+1] (ngoài đoạn và không phải chỗ cũ)
+                    for p in range(0, n - 1):
+                        if i - 1 <= p <= e:
+                            continue
+                        x, y = tour[p], tour[p + 1]
+                        if cost[x][first] + cost[last][y] - cost[x][y] - removed < -1e-9:  # Cải thiện
+                            segment = tour[i:e + 1]
+                            if p < i:
+                                tour[p + 1:e + 1] = segment + tour[p + 1:i]
+                            else:
+                                tour[i:p + 1] = tour[e + 1:p + 1] + segment
+                            improved = True
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+        return tour
+
+    def local_search_cluster_swap(self, tour):
+        """
+        Pha Cải tiến (Local Search) - Đổi chỗ 2 cụm: ... A -> X -> B ... C -> Y -> D ...
+        thành ... A -> Y -> B ... C -> X -> D ... Chỉ 4 cạnh (3 cạnh nếu X, Y kề nhau) thay đổi,
+        chiều các cạnh khác giữ nguyên -> chênh lệch chính xác O(1) với ma trận bất đối xứng.
+        """
+        if self.scheduled:
+            return self._scheduled_local_search_cluster_swap(tour)
+        if self._kernel_cost is not None:
+            tour, tour_view = self._kernel_tour(tour)
+            solver_kernels.cluster_swap(tour_view, self._kernel_cost)
+            return tour
+
+        cost = self.cost_matrix
+        n = len(tour)
+        improved = True
+
+        while improved:
+            improved = False
+            for i in range(1, n - 2):
+                a, x, b = tour[i - 1], tour[i], tour[i + 1]
+                for j in range(i + 1, n - 1):
+                    c, y, d = tour[j - 1], tour[j], tour[j + 1]
+                    if j == i + 1:
+                        # A -> X -> Y -> D  thành  A -> Y -> X -> D
+                        cost_before = cost[a][x] + cost[x][y] + cost[y][d]
+                        cost_after = cost[a][y] + cost[y][x] + cost[x][d]
+                    else:
+                        cost_before = cost[a][x] + cost[x][b] + cost[c][y] + cost[y][d]
+                        cost_after = cost[a][y] + cost[y][b] + cost[c][x] + cost[x][d]
+                    if cost_after - cost_before < -1e-9:  # Cải thiện
+                        tour[i], tour[j] = y, x
+                        improved = True
+                        break
+                if improved:
+                    break
+        return tour
 
     def local_search_intra_cluster(self, tour):
         """
@@ -227,6 +684,15 @@ class GTSPGraspSolver:
         Thử: ... -> A -> B2 -> C -> ... (B2 cũng thuộc Cluster_B)
         Nếu cost(A->B2) + cost(B2->C) < cost(A->B1) + cost(B1->C) thì chấp nhận.
         """
+        if self.scheduled:
+            return self._scheduled_local_search_intra_cluster(tour)
+        if self._kernel_cost is not None:
+            tour, tour_view = self._kernel_tour(tour)
+            solver_kernels.intra_cluster(tour_view, self._kernel_cost,
+                                         np.frombuffer(self.node_cluster, dtype=np.int32),
+                                         self._kernel_member_start, self._kernel_members)
+            return tour
+
         n = len(tour)
         improved = True
         
@@ -236,7 +702,7 @@ class GTSPGraspSolver:
             # Bỏ qua điểm đầu (index 0) và cuối (index n-1)
             for i in range(1, n - 1):
                 current_index = tour[i]  # Điểm đang xét (ví dụ: B1)
-                current_cluster_id = self.index_to_cluster.get(current_index)
+                cluster_members = self.cluster_members[self.node_cluster[current_index]]
                 
                 # Lấy 2 điểm lân cận
                 prev_index = tour[i-1]  # (A)
@@ -248,7 +714,7 @@ class GTSPGraspSolver:
                 best_new_index = current_index  # Tạm thời, điểm tốt nhất vẫn là điểm hiện tại
                 
                 # Thử TẤT CẢ các điểm khác (candidate) trong cùng cụm
-                for candidate_index in self.clusters[current_cluster_id]:
+                for candidate_index in cluster_members:
                     if candidate_index == current_index:
                         continue  # Bỏ qua chính nó
                     
@@ -269,7 +735,409 @@ class GTSPGraspSolver:
         
         return tour  # Trả về lộ trình tốt nhất sau khi tối ưu nội cụm
 
-    def solve(self, max_iterations=50, progress_callback=None):
+    # ------------------------------------------------------------------
+    # Chế độ có lịch trình (time-dependent / thời gian tham quan / giờ mở cửa)
+    # ------------------------------------------------------------------
+    # Khi chi phí phụ thuộc GIỜ (khung giờ cao điểm) hoặc có ràng buộc giờ mở cửa, thay đổi 1 chặng
+    # làm lệch giờ của MỌI điểm phía sau, nên không thể chỉ cộng/trừ vài cạnh như chế độ tĩnh.
+    # Để tránh mô phỏng lại cả tour cho mỗi nước đi (move), ta lưu "lịch trình" (TourSchedule)
+    # của tour hiện tại và đánh giá phần ĐUÔI tour (không đổi thứ tự) trong O(1):
+    #
+    # (a) Chỉ time-dependent (không có giờ mở cửa): với depart[k] là thời điểm rời điểm k,
+    #       up[k]   = min_{m >= k} (kết thúc khung giờ chứa depart[m] - arrive[m+1])
+    #       down[k] = min_{m >= k} (depart[m] - bắt đầu khung giờ chứa depart[m])
+    #     Nếu thời điểm đến vị trí k lệch một lượng delta với -down[k] <= delta < up[k], MỌI chặng
+    #     sau k vẫn nằm gọn trong khung giờ của nó -> thời gian đi không đổi, thời điểm đến END = arrive[-1] + delta.
+    #     Chặng đi qua ranh giới khung giờ (xem time_dependent.py) đổi thời gian đi với mọi delta -> slack = 0.
+    #
+    # (b) Ma trận tĩnh + giờ mở cửa (time windows), theo Savelsbergh:
+    #     - Slack ngược (backward): latest[k] = giờ BẮT ĐẦU tham quan muộn nhất tại điểm k sao cho
+    #       mọi điểm phía sau vẫn kịp giờ:  latest[k] = min(L_k, latest[k+1] - service_k - t(k, k+1)).
+    #       -> Nước đi khả thi <=> max(giờ đến mới, E_k) <= latest[k]               (O(1))
+    #     - Slack xuôi (forward): độ lệch giờ đến tại k lan tới END theo hàm f_k(delta) = max(delta - P_k, Q_k)
+    #       (thời gian chờ mở cửa "hấp thụ" bớt độ trễ; đến sớm hơn thì phải chờ thêm):
+    #         P_k = wait_k + P_{k+1},   Q_k = max(E_k - start_k - P_{k+1}, Q_{k+1})
+    #       -> Giờ đến END mới = arrive[-1] + f_k(delta)                               (O(1))
+    #
+    # (c) Cả hai cùng lúc: mô phỏng lại phần đuôi (vẫn đúng, chỉ chậm hơn).
+    #
+    # Tour vi phạm giờ mở cửa không bị loại hẳn mà bị phạt LATENESS_PENALTY cho mỗi phút trễ, để
+    # solver vẫn trả về lộ trình "ít vi phạm nhất" khi không có lộ trình nào khả thi. Khi tour hiện tại
+    # ĐÃ khả thi, mọi nước đi làm nó vi phạm bị loại ngay (feasibility pruning) mà không cần đánh giá tiếp.
+
+    def tour_schedule(self, tour):
+        """
+        Lịch trình dự kiến của tour, bắt đầu từ departure_time (phút kể từ 00:00).
+        Trả về list, mỗi phần tử ứng với 1 điểm của tour:
+        {"arrive": giờ đến, "start": giờ bắt đầu tham quan (sau khi chờ mở cửa), "depart": giờ rời đi}.
+        Dùng ma trận theo khung giờ nếu có, ngược lại dùng ma trận thời gian tĩnh.
+        """
+        schedule = self._schedule(tour, travel_time=self.td_durations.travel_time
+                                  if self.td_durations is not None else None)
+        return [
+            {"arrive": schedule.arrive[k], "start": schedule.start[k], "depart": schedule.depart[k]}
+            for k in range(len(tour))
+        ]
+
+    def travel_time(self, i, j, t):
+        """Thời gian di chuyển i -> j khi khởi hành lúc t (theo khung giờ nếu solver đang dùng)."""
+        return self._travel_time(i, j, t)
+
+    def _static_travel_time(self, i, j, t):
+        """Thời gian di chuyển i -> j theo ma trận tĩnh (bỏ qua giờ khởi hành t)."""
+        return self.duration_matrix[i][j]
+
+    def _schedule(self, tour, travel_time=None):
+        """Mô phỏng tour một lần và tính các mảng slack cho đánh giá O(1) - xem giải thích ở trên."""
+        travel = travel_time or self._travel_time
+        dm = self.distance_matrix
+        service, earliest, latest = self.service_times, self.earliest_start, self.latest_start
+        n = len(tour)
+        arrive = [0.0] * n
+        start = [0.0] * n
+        depart = [0.0] * n
+        lateness = [0.0] * n   # lateness[k]: tổng số phút trễ giờ mở cửa tại các vị trí 0..k
+        distance = [0.0] * n   # distance[k]: tổng quãng đường từ START đến vị trí k
+
+        t = self.departure_time
+        late = dist = 0.0
+        for k, node in enumerate(tour):
+            if k > 0:
+                prev = tour[k - 1]
+                t = depart[k - 1] + travel(prev, node, depart[k - 1])
+                dist += dm[prev][node]
+            arrive[k] = t
+            s = t if t >= earliest[node] else earliest[node]   # Đến sớm -> chờ mở cửa
+            if s > latest[node]:
+                late += s - latest[node]
+            start[k] = s
+            depart[k] = s + service[node]
+            lateness[k] = late
+            distance[k] = dist
+
+        schedule = TourSchedule(arrive, start, depart, lateness, distance)
+        base = arrive[-1] - self.departure_time if self.optimize_for == 'time' else distance[-1]
+        schedule.cost = base + self.LATENESS_PENALTY * late
+
+        inf = float('inf')
+        if self.use_td and not self.has_visit_constraints:
+            # (a) Slack theo khung giờ. Điểm cuối (END) không khởi hành chặng nào -> không ràng buộc.
+            td = self.td_durations
+            up = [inf] * n
+            down = [inf] * n
+            for k in range(n - 2, -1, -1):
+                slice_start, slice_end = td.slice_bounds(depart[k])
+                if arrive[k + 1] <= slice_end:
+                    up[k] = min(up[k + 1], slice_end - arrive[k + 1])
+                    down[k] = min(down[k + 1], depart[k] - slice_start)
+                else:
+                    up[k] = down[k] = 0.0
+            schedule.up, schedule.down = up, down
+        elif not self.use_td and self.has_visit_constraints:
+            # (b) Slack ngược (latest) và hàm lan truyền độ lệch (P, Q)
+            durations = self.duration_matrix
+            latest_pos = [inf] * n
+            shift_p = [0.0] * n
+            shift_q = [-inf] * n
+            latest_pos[n - 1] = latest[tour[n - 1]]
+            for k in range(n - 2, -1, -1):
+                node = tour[k]
+                latest_pos[k] = min(latest[node],
+                                    latest_pos[k + 1] - service[node] - durations[node][tour[k + 1]])
+                shift_p[k] = (start[k] - arrive[k]) + shift_p[k + 1]
+                shift_q[k] = max(earliest[node] - start[k] - shift_p[k + 1], shift_q[k + 1])
+            schedule.latest, schedule.shift_p, schedule.shift_q = latest_pos, shift_p, shift_q
+        return schedule
+
+    def _finish(self, tour, schedule, position, arrival):
+        """
+        Thời điểm đến END và tổng số phút trễ của phần đuôi tour[position:] khi phần đuôi GIỮ NGUYÊN
+        thứ tự nhưng thời điểm đến tour[position] là 'arrival' (thay vì schedule.arrive[position]).
+        Trả về None nếu tour hiện tại khả thi mà phần đuôi trở nên vi phạm giờ mở cửa (bị loại).
+        """
+        delta = arrival - schedule.arrive[position]
+        feasible = schedule.lateness[-1] == 0
+        if self.has_visit_constraints:
+            if not self.use_td and feasible:
+                # (b) Kiểm tra khả thi + lan truyền độ lệch, O(1)
+                node = tour[position]
+                s = arrival if arrival >= self.earliest_start[node] else self.earliest_start[node]
+                if s > schedule.latest[position] + 1e-9:
+                    return None
+                shift = max(delta - schedule.shift_p[position], schedule.shift_q[position])
+                return schedule.arrive[-1] + shift, 0.0
+        elif -schedule.down[position] <= delta < schedule.up[position]:
+            # (a) Không chặng nào đổi khung giờ, O(1)
+            return schedule.arrive[-1] + delta, 0.0
+
+        # (c) Mô phỏng lại phần đuôi
+        travel = self._travel_time
+        service, earliest, latest = self.service_times, self.earliest_start, self.latest_start
+        t = arrival
+        late = 0.0
+        for k in range(position, len(tour)):
+            node = tour[k]
+            if k > position:
+                t += travel(tour[k - 1], node, t)
+            s = t if t >= earliest[node] else earliest[node]
+            if s > latest[node]:
+                if feasible:
+                    return None
+                late += s - latest[node]
+            if k < len(tour) - 1:
+                t = s + service[node]
+        return t, late
+
+    def _evaluate_segment(self, tour, schedule, first, segment, last):
+        """
+        Chi phí của tour mới = tour[:first] + segment + tour[last+1:], dùng lịch trình của tour cũ.
+        Chỉ mô phỏng 'segment' (các điểm thay đổi), phần đuôi được đánh giá bằng _finish.
+        Trả về inf nếu nước đi bị loại do vi phạm giờ mở cửa.
+        """
+        travel = self._travel_time
+        dm = self.distance_matrix
+        service, earliest, latest = self.service_times, self.earliest_start, self.latest_start
+        feasible = schedule.lateness[-1] == 0
+        inf = float('inf')
+
+        t = schedule.depart[first - 1]
+        prev = tour[first - 1]
+        late = schedule.lateness[first - 1]
+        dist = schedule.distance[first - 1]
+        for node in segment:
+            t += travel(prev, node, t)
+            dist += dm[prev][node]
+            s = t if t >= earliest[node] else earliest[node]
+            if s > latest[node]:
+                if feasible:
+                    return inf  # Cắt tỉa: tour đang khả thi -> không nhận nước đi gây trễ
+                late += s - latest[node]
+            t = s + service[node]
+            prev = node
+        following = tour[last + 1]
+        t += travel(prev, following, t)
+        dist += dm[prev][following] + schedule.distance[-1] - schedule.distance[last + 1]
+
+        finish = self._finish(tour, schedule, last + 1, t)
+        if finish is None:
+            return inf
+        end_arrival, tail_late = finish
+        base = end_arrival - self.departure_time if self.optimize_for == 'time' else dist
+        return base + self.LATENESS_PENALTY * (late + tail_late)
+
+    def _scheduled_local_search_2opt(self, tour):
+        """2-opt cho chế độ có lịch trình (đánh giá chính xác, kể cả ma trận bất đối xứng)."""
+        n = len(tour)
+        schedule = self._schedule(tour)
+        best_cost = schedule.cost
+        improved = True
+
+        while improved:
+            improved = False
+            for i in range(1, n - 2):
+                for j in range(i + 1, n - 1):
+                    # Đoạn đảo ngược tour[j], tour[j-1], ..., tour[i] rồi nối vào tour[j+1]
+                    new_cost = self._evaluate_segment(tour, schedule, i, tour[j:i - 1:-1], j)
+                    if new_cost < best_cost - 1e-9:  # Cải thiện
+                        tour[i:j+1] = tour[i:j+1][::-1]
+                        schedule = self._schedule(tour)
+                        best_cost = schedule.cost
+                        improved = True
+                        break
+                if improved:
+                    break
+        return tour
+
+    def _scheduled_local_search_or_opt(self, tour):
+        """Or-opt cho chế độ có lịch trình: chỉ mô phỏng đoạn bị xáo trộn, phần đuôi đánh giá O(1)."""
+        n = len(tour)
+        schedule = self._schedule(tour)
+        best_cost = schedule.cost
+        improved = True
+
+        while improved:
+            improved = False
+            for length in range(1, self.OR_OPT_MAX_SEGMENT + 1):
+                for i in range(1, n - length):
+                    e = i + length - 1
+                    segment = tour[i:e + 1]
+                    for p in range(0, n - 1):
+                        if i - 1 <= p <= e:
+                            continue
+                        if p < i:
+                            # Vị trí p+1..e: đoạn, rồi tour[p+1..i-1]
+                            window = segment + tour[p + 1:i]
+                            new_cost = self._evaluate_segment(tour, schedule, p + 1, window, e)
+                            first = p + 1
+                        else:
+                            # Vị trí i..p: tour[e+1..p], rồi đoạn
+                            window = tour[e + 1:p + 1] + segment
+                            new_cost = self._evaluate_segment(tour, schedule, i, window, p)
+                            first = i
+                        if new_cost < best_cost - 1e-9:
+                            tour[first:first + len(window)] = window
+                            schedule = self._schedule(tour)
+                            best_cost = schedule.cost
+                            improved = True
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+        return tour
+
+    def _scheduled_local_search_cluster_swap(self, tour):
+        """Đổi chỗ 2 cụm cho chế độ có lịch trình."""
+        n = len(tour)
+        schedule = self._schedule(tour)
+        best_cost = schedule.cost
+        improved = True
+
+        while improved:
+            improved = False
+            for i in range(1, n - 2):
+                for j in range(i + 1, n - 1):
+                    window = tour[i:j + 1]
+                    window[0], window[-1] = window[-1], window[0]
+                    new_cost = self._evaluate_segment(tour, schedule, i, window, j)
+                    if new_cost < best_cost - 1e-9:
+                        tour[i], tour[j] = tour[j], tour[i]
+                        schedule = self._schedule(tour)
+                        best_cost = schedule.cost
+                        improved = True
+                        break
+                if improved:
+                    break
+        return tour
+
+    def _scheduled_local_search_intra_cluster(self, tour):
+        """Cải tiến nội cụm cho chế độ có lịch trình."""
+        n = len(tour)
+        schedule = self._schedule(tour)
+        best_cost = schedule.cost
+        improved = True
+
+        while improved:
+            improved = False
+            for i in range(1, n - 1):
+                current_index = tour[i]
+                best_new_index = current_index
+
+                for candidate_index in self.cluster_members[self.node_cluster[current_index]]:
+                    if candidate_index == current_index:
+                        continue
+                    new_cost = self._evaluate_segment(tour, schedule, i, (candidate_index,), i)
+                    if new_cost < best_cost - 1e-9:
+                        best_cost = new_cost
+                        best_new_index = candidate_index
+                        improved = True
+
+                if improved:
+                    tour[i] = best_new_index
+                    schedule = self._schedule(tour)
+                    best_cost = schedule.cost
+                    break
+        return tour
+
+    def path_relinking(self, tour, guide):
+        """
+        Path Relinking: đi từ lời giải 'tour' đến lời giải ưu tú 'guide' từng bước một, mỗi bước đưa
+        một cụm về đúng vị trí (và đúng điểm đại diện) của nó trong guide. Ở mỗi bước chọn nước đi
+        có chi phí thấp nhất (greedy). Các lời giải TRUNG GIAN kết hợp "gen" của cả hai lời giải.
+
+        Nước đi tại vị trí k (guide[k] = điểm g thuộc cụm c, cụm c đang ở vị trí p trong tour):
+        đổi chỗ vị trí k và p, rồi đặt điểm g vào vị trí k.
+
+        Trả về (tour trung gian tốt nhất, chi phí), hoặc (None, inf) nếu không có lời giải trung gian.
+        """
+        inf = float('inf')
+        n = len(tour)
+        if n != len(guide):
+            return None, inf  # Tour lỗi (bị kẹt) - không so sánh được
+        current = array('i', tour)
+        node_cluster = self.node_cluster
+        # Vị trí của từng cụm trong tour hiện tại
+        position_of = array('i', [0]) * self.n_clusters
+        for k in range(n):
+            position_of[node_cluster[current[k]]] = k
+        differ = [k for k in range(1, n - 1) if current[k] != guide[k]]
+
+        scheduled = self.scheduled
+        cost_matrix = self.cost_matrix
+        current_cost = self.calculate_total_cost(current)
+        best_tour, best_cost = None, inf
+
+        def move(k, node):
+            """Đặt điểm node vào vị trí k (đổi chỗ với vị trí p của cụm chứa node). Trả về (p, tour[p] cũ)."""
+            p = position_of[node_cluster[node]]
+            replaced = current[p]
+            current[p] = current[k]
+            position_of[node_cluster[current[k]]] = p
+            current[k] = node
+            position_of[node_cluster[node]] = k
+            return p, replaced
+
+        def undo(k, p, replaced):
+            """Hoàn tác move(k, ...)."""
+            displaced = current[p]
+            current[k] = displaced
+            position_of[node_cluster[displaced]] = k
+            current[p] = replaced
+            position_of[node_cluster[replaced]] = p
+
+        def edges_cost(positions):
+            """Tổng chi phí các cạnh (a -> a+1) với a thuộc positions (chế độ tĩnh)."""
+            return sum(cost_matrix[current[a]][current[a + 1]] for a in positions)
+
+        # Lời giải trung gian cuối cùng trùng guide -> dừng khi chỉ còn 1 vị trí khác nhau
+        while len(differ) > 1:
+            best_move, best_move_cost = None, inf
+            for k in differ:
+                node = guide[k]
+                p = position_of[node_cluster[node]]
+                if scheduled:
+                    p, replaced = move(k, node)
+                    cost = self._schedule(current).cost
+                else:
+                    # Chỉ các cạnh kề vị trí k và p thay đổi -> tính chênh lệch O(1)
+                    edges = {k - 1, k, p - 1, p}
+                    before = edges_cost(edges)
+                    p, replaced = move(k, node)
+                    cost = current_cost + edges_cost(edges) - before
+                undo(k, p, replaced)
+                if cost < best_move_cost:
+                    best_move, best_move_cost = k, cost
+
+            move(best_move, guide[best_move])
+            current_cost = best_move_cost
+            differ = [k for k in differ if current[k] != guide[k]]
+            if differ and current_cost < best_cost - 1e-9:
+                best_tour, best_cost = array('i', current), current_cost
+
+        return best_tour, best_cost
+
+    def _improve(self, tour):
+        """Pha Cải tiến: lặp 2-opt, Or-opt, đổi chỗ cụm và cải tiến nội cụm cho đến khi không giảm được chi phí nữa."""
+        improved = True
+        while improved:
+            cost_before_opt = self.calculate_total_cost(tour)
+            
+            # 2a. Cải tiến 2-Opt (Tối ưu thứ tự cụm)
+            tour = self.local_search_2opt(tour)
+
+            # Di chuyển đoạn (Or-opt) và đổi chỗ 2 cụm (giữ chiều các cạnh - đúng với ma trận bất đối xứng)
+            tour = self.local_search_or_opt(tour)
+            tour = self.local_search_cluster_swap(tour)
+            
+            # 2b. Cải tiến nội cụm (Tối ưu điểm đại diện)
+            tour = self.local_search_intra_cluster(tour)
+            
+            # Nếu chi phí không giảm nữa (hoặc giảm không đáng kể) thì dừng cải tiến
+            if self.calculate_total_cost(tour) >= cost_before_opt - 1e-9:
+                improved = False
+        return tour
+
+    def solve(self, max_iterations=50, progress_callback=None, alpha=None, path_relinking=True, target_gap=None):
         """
         Hàm chính: Chạy thuật toán GRASP.
         Kết hợp Pha Xây dựng và Pha Cải tiến trong nhiều vòng lặp.
@@ -277,51 +1145,149 @@ class GTSPGraspSolver:
         Tham số:
         - max_iterations: Số lần chạy GRASP (ví dụ: 50, 100, 1000).
         - progress_callback: (Tùy chọn) Hàm callback để báo cáo tiến độ.
+        - alpha: Hệ số ngẫu nhiên cố định cho Pha Xây dựng. None (mặc định) = GRASP phản ứng:
+          tự học phân phối xác suất của alpha trên REACTIVE_ALPHAS theo chất lượng lời giải.
+        - path_relinking: Sau mỗi vòng lặp, nối lời giải vừa tìm được với một lời giải ưu tú
+          (Path Relinking) rồi cải tiến lời giải trung gian tốt nhất.
+        - target_gap: (Tùy chọn) Dừng sớm khi gap = (chi phí tốt nhất - cận dưới) / chi phí tốt nhất <= target_gap
+          (ví dụ 0.01 = cách tối ưu không quá 1%). Cận dưới được tính một lần sau vòng lặp đầu tiên
+          (xem lower_bound.py). None = luôn chạy đủ max_iterations (gap vẫn được báo cáo).
+          Cận dưới là quy hoạch động tập con (tối ưu chính xác) -> chỉ dừng khi gap <= EXACT_GAP.
+
+        Sau khi chạy, self.stats chứa thống kê để giám sát (xác suất/chi phí trung bình của từng alpha,
+        số lần Path Relinking tìm được lời giải tốt hơn, ...).
         """
         best_tour_so_far = None  # Lộ trình tốt nhất tìm được
         best_cost_so_far = float('inf')  # Chi phí tốt nhất tương ứng
+        best_iteration = 0
+
+        # GRASP phản ứng: xác suất, số lần dùng và tổng chi phí của từng alpha
+        alphas = self.REACTIVE_ALPHAS if alpha is None else (alpha,)
+        probabilities = [1.0 / len(alphas)] * len(alphas)
+        alpha_counts = [0] * len(alphas)
+        alpha_cost_sums = [0.0] * len(alphas)
+
+        # Tập lời giải ưu tú: list [(chi phí, tour)] tăng dần theo chi phí, các tour khác nhau
+        elite = []
+        relinking = {"runs": 0, "improved_iteration": 0, "new_best": 0}
+
+        # Cận dưới của chi phí tối ưu (tính sau vòng lặp đầu tiên, khi đã có chi phí tham chiếu cho subgradient)
+        bound = None
+        gap = None
+        iterations_run = 0
         
         print(f"BLL: Bắt đầu GRASP Solver với {max_iterations} vòng lặp...")
         
         for iteration in range(max_iterations):
+            iterations_run = iteration + 1
             # 1. Pha Xây dựng (Construction)
-            # Tạo 1 lộ trình "khá tốt" (có ngẫu nhiên)
-            current_tour = self.construction_phase()
+            # Tạo 1 lộ trình "khá tốt" (có ngẫu nhiên), alpha chọn theo phân phối đã học
+            a = random.choices(range(len(alphas)), weights=probabilities)[0] if len(alphas) > 1 else 0
+            current_tour = self.construction_phase(alphas[a])
             
             # 2. Pha Cải tiến (Local Search)
             # Liên tục cải tiến lộ trình này cho đến khi không thể tốt hơn
-            improved = True
-            while improved:
-                cost_before_opt = self.calculate_total_cost(current_tour)
-                
-                # 2a. Cải tiến 2-Opt (Tối ưu thứ tự cụm)
-                current_tour = self.local_search_2opt(current_tour)
-                
-                # 2b. Cải tiến nội cụm (Tối ưu điểm đại diện)
-                current_tour = self.local_search_intra_cluster(current_tour)
-                
-                # Tính chi phí sau 2 bước cải tiến
-                cost_after_opt = self.calculate_total_cost(current_tour)
-                
-                # Nếu chi phí không giảm nữa (hoặc giảm không đáng kể)
-                if cost_after_opt >= cost_before_opt - 1e-9:
-                    improved = False  # Dừng cải tiến
+            current_tour = self._improve(current_tour)
             
             # Lộ trình (current_tour) bây giờ là "tối ưu cục bộ" (local optimum)
             current_cost = self.calculate_total_cost(current_tour)
+            alpha_counts[a] += 1
+            alpha_cost_sums[a] += current_cost
+
+            # 2c. Path Relinking với một lời giải ưu tú (chọn ngẫu nhiên)
+            if path_relinking and elite:
+                relinking["runs"] += 1
+                _, guide = random.choice(elite)
+                relinked_tour, _ = self.path_relinking(current_tour, guide)
+                if relinked_tour is not None:
+                    relinked_tour = self._improve(relinked_tour)
+                    relinked_cost = self.calculate_total_cost(relinked_tour)
+                    if relinked_cost < current_cost - 1e-9:
+                        relinking["improved_iteration"] += 1
+                        if relinked_cost < best_cost_so_far - 1e-9:
+                            relinking["new_best"] += 1
+                        current_tour, current_cost = relinked_tour, relinked_cost
             
             # 3. Cập nhật kết quả tốt nhất (Best Solution Update)
             # So sánh với kết quả tốt nhất *từ trước đến nay*
             if current_cost < best_cost_so_far:
                 best_cost_so_far = current_cost
-                best_tour_so_far = current_tour.copy()  # Lưu lại bản sao
+                best_tour_so_far = array('i', current_tour)  # Lưu lại bản sao (tour là bộ đệm dùng lại)
+                best_iteration = iteration + 1
+
+            # Cập nhật tập ưu tú: thay lời giải tệ nhất nếu lời giải mới tốt hơn và chưa có trong tập
+            if path_relinking and (len(elite) < self.ELITE_SIZE or current_cost < elite[-1][0]) \
+                    and all(tour != current_tour for _, tour in elite):
+                elite.append((current_cost, array('i', current_tour)))
+                elite.sort(key=lambda item: item[0])
+                del elite[self.ELITE_SIZE:]
+
+            # GRASP phản ứng: cập nhật xác suất của các alpha sau mỗi REACTIVE_BLOCK vòng lặp
+            if len(alphas) > 1 and (iteration + 1) % self.REACTIVE_BLOCK == 0:
+                probabilities = self._reactive_probabilities(alpha_counts, alpha_cost_sums,
+                                                             best_cost_so_far, probabilities)
+            
+            # Gap so với cận dưới; đủ nhỏ thì dừng sớm (các vòng lặp còn lại gần như không cải thiện được nữa)
+            if bound is None and best_cost_so_far < float('inf'):
+                bound = gtsp_lower_bound(self, best_cost_so_far) or {}
+            if bound:
+                gap = max(0.0, (best_cost_so_far - bound["lower_bound"]) / best_cost_so_far) \
+                    if best_cost_so_far > 0 else 0.0
+            stop_gap = target_gap
+            if target_gap is not None and bound and bound["method"] == "subset_dp":
+                stop_gap = min(target_gap, self.EXACT_GAP)
+            stop = stop_gap is not None and gap is not None and gap <= stop_gap
             
             # (Tùy chọn) Gọi callback để báo cáo tiến độ
             if progress_callback:
-                progress = (iteration + 1) / max_iterations * 100
+                progress = 100.0 if stop else (iteration + 1) / max_iterations * 100
                 progress_callback(progress, best_cost_so_far)
+
+            if stop:
+                print(f"BLL: Dừng sớm sau {iteration + 1}/{max_iterations} vòng lặp "
+                      f"(gap {gap:.2%} <= {stop_gap:.2%}).")
+                break
+
+        self.stats = {
+            "iterations": iterations_run,
+            "max_iterations": max_iterations,
+            "best_iteration": best_iteration,  # Vòng lặp tìm ra lời giải tốt nhất
+            "reactive": len(alphas) > 1,
+            "alphas": [
+                {
+                    "alpha": alphas[a],
+                    "probability": round(probabilities[a], 4),
+                    "count": alpha_counts[a],
+                    "mean_cost": alpha_cost_sums[a] / alpha_counts[a] if alpha_counts[a] else None,
+                }
+                for a in range(len(alphas))
+            ],
+            "path_relinking": relinking,
+            "elite_costs": [cost for cost, _ in elite],
+            # Cận dưới (giá trị, phương pháp, thời gian tính) và gap của lời giải tốt nhất (None nếu không có)
+            "lower_bound": bound or None,
+            "gap": gap,
+            "target_gap": target_gap,
+            "stopped_early": iterations_run < max_iterations,
+        }
         
         # Sau khi chạy hết các vòng lặp (iterations)
-        print(f"BLL: Solver hoàn tất. Chi phí tốt nhất: {best_cost_so_far}")
-        # Trả về lộ trình tốt nhất (tối ưu toàn cục - global optimum) tìm được
-        return best_tour_so_far, best_cost_so_far
\ No newline at end of file
+        print(f"BLL: Solver hoàn tất. Chi phí tốt nhất: {best_cost_so_far} (vòng lặp {best_iteration}, "
+              f"Path Relinking cải thiện {relinking['improved_iteration']}/{relinking['runs']} lần"
+              + (f", gap {gap:.2%})" if gap is not None else ")"))
+        # Trả về lộ trình tốt nhất (tối ưu toàn cục - global optimum) tìm được, dạng list
+        return (best_tour_so_far.tolist() if best_tour_so_far is not None else None), best_cost_so_far
+
+    def _reactive_probabilities(self, counts, cost_sums, best_cost, probabilities):
+        """
+        Xác suất mới của các alpha (GRASP phản ứng): q_i = (best / chi phí trung bình_i) ^ REACTIVE_DELTA,
+        p_i = q_i / tổng q. Giữ nguyên xác suất cũ cho đến khi mọi alpha đã được thử ít nhất 1 lần.
+        """
+        if not all(counts) or best_cost == float('inf'):
+            return probabilities
+        quality = []
+        for count, cost_sum in zip(counts, cost_sums):
+            mean_cost = cost_sum / count
+            quality.append((best_cost / mean_cost) ** self.REACTIVE_DELTA if mean_cost > 0 and best_cost > 0 else 1.0)
+        total = sum(quality)
+        return [q / total for q in quality]
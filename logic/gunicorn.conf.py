@@ -0,0 +1,84 @@
+# logic/gunicorn.conf.py
+#
+# Cấu hình gunicorn cho chế độ production của Lớp Logic nghiệp vụ (BLL).
+# Chạy từ thư mục gốc của dự án:
+#
+#   gunicorn -c logic/gunicorn.conf.py
+#
+# Mọi tham số đều có thể ghi đè bằng biến môi trường (GTSP_*), ví dụ:
+#
+#   GTSP_WORKERS=8 GTSP_THREADS=4 OSRM_BASE_URL=http://localhost:5000 gunicorn -c logic/gunicorn.conf.py
+#
+# Lưu ý: gunicorn chỉ chạy trên Linux/macOS. Trên Windows dùng `python logic/app_logic.py`.
+import multiprocessing
+import os
+import tempfile
+
+# Các module trong logic/ import lẫn nhau theo kiểu "import database",
+# nên thêm thư mục logic/ vào sys.path của gunicorn.
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "wsgi:app"
+
+# --- Mạng ---
+bind = os.environ.get("GTSP_BIND", "0.0.0.0:5001")
+backlog = int(os.environ.get("GTSP_BACKLOG", "2048"))
+
+# --- Mức độ song song (concurrency) ---
+# Solver là tác vụ CPU-bound (bị GIL giới hạn) -> song song bằng nhiều tiến trình (workers).
+# Gọi OSRM là tác vụ I/O-bound -> mỗi worker có thêm vài thread (gthread).
+workers = int(os.environ.get("GTSP_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GTSP_THREADS", "4"))
+# Mỗi worker có pool tiến trình riêng để giải lại lộ trình nhiều ngày/xe (vrp_split.py): chia đều số CPU
+# cho các worker, tránh workers x CPU tiến trình Solver tranh nhau CPU (và bộ nhớ của từng tiến trình spawn).
+os.environ.setdefault("VRP_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
+worker_class = "gthread"
+
+# Tái khởi động worker sau N request (có jitter) để tránh rò rỉ bộ nhớ tích lũy
+max_requests = int(os.environ.get("GTSP_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GTSP_MAX_REQUESTS_JITTER", "100"))
+
+# --- Thời gian chờ & tắt an toàn (graceful shutdown) ---
+# timeout: worker bị kill nếu một request chạy quá lâu (solver + nhiều lời gọi OSRM).
+timeout = int(os.environ.get("GTSP_TIMEOUT", "120"))
+# graceful_timeout: khi nhận SIGTERM, worker được phép hoàn thành các request đang xử lý.
+graceful_timeout = int(os.environ.get("GTSP_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GTSP_KEEPALIVE", "5"))
+
+# --- Gộp lời gọi OSRM giữa các worker (single-flight, xem logic/singleflight.py) ---
+# Các worker cùng máy dùng chung thư mục file khóa/kết quả; đặt OSRM_SINGLEFLIGHT_DIR="" để tắt.
+# Mặc định: thư mục riêng của user chạy gunicorn (XDG_RUNTIME_DIR nếu có), tạo với quyền 0700;
+# thư mục không thuộc user này hoặc user khác truy cập được thì bị từ chối (xem singleflight.private_dir).
+os.environ.setdefault("OSRM_SINGLEFLIGHT_DIR", os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"gtsp-osrm-singleflight-{os.getuid()}"))
+
+# --- Preload (copy-on-write) ---
+# Import app (CSDL, thông tin cụm, mã Solver) MỘT LẦN ở master rồi mới fork worker.
+preload_app = True
+
+accesslog = os.environ.get("GTSP_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GTSP_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Master đã nạp xong app: warm-up và đóng băng heap trước khi fork worker."""
+    import wsgi
+    wsgi.preload()
+
+
+def post_fork(server, worker):
+    """
+    Chạy trong MỖI worker ngay sau khi fork.
+    Tạo connection pool OSRM riêng cho worker (không dùng chung socket với master).
+    """
+    import app_logic
+    app_logic.osrm.reset_session()
+    server.log.info(f"Worker {worker.pid}: đã tạo OSRM connection pool riêng")
+
+
+def worker_exit(server, worker):
+    """Worker tắt (graceful shutdown): đóng các kết nối OSRM và pool tiến trình chia lộ trình."""
+    import app_logic
+    import vrp_split
+    app_logic.osrm.close()
+    vrp_split.shutdown_route_pool()
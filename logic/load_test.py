@@ -0,0 +1,124 @@
+# logic/load_test.py
+#
+# Script load test cho API /solve_gtsp của BLL.
+# Gửi nhiều request song song và báo cáo: số request/giây (throughput),
+# độ trễ p50/p95/p99 và số request lỗi.
+#
+# Quy trình gợi ý (không cần mạng Internet):
+#   1. python logic/osrm_stub.py --port 5005
+#   2. OSRM_BASE_URL=http://localhost:5005 gunicorn -c logic/gunicorn.conf.py
+#   3. python logic/load_test.py --url http://localhost:5001 --concurrency 16 --requests 500
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import database
+
+# Dùng tên địa điểm có sẵn trong CSDL cho Start/End -> BLL không gọi Nominatim (geocoding).
+LANDMARK_NAMES = [info["name"] for info in database.ALL_LANDMARKS.values()]
+CLUSTER_IDS = list(database.CLUSTERS.keys())
+
+# Mỗi thread dùng 1 Session riêng (requests.Session không nên dùng chung giữa các thread)
+_thread_local = threading.local()
+
+
+def _get_session():
+    if not hasattr(_thread_local, "session"):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+
+def make_payload(rng, min_clusters, max_clusters):
+    """Tạo ngẫu nhiên một yêu cầu /solve_gtsp (Start/End là địa danh, k cụm bất kỳ)."""
+    k = rng.randint(min_clusters, min(max_clusters, len(CLUSTER_IDS)))
+    return {
+        "start_address": rng.choice(LANDMARK_NAMES),
+        "end_address": rng.choice(LANDMARK_NAMES),
+        "cluster_ids": rng.sample(CLUSTER_IDS, k),
+        "optimize_for": rng.choice(["distance", "time"]),
+    }
+
+
+def send_one(url, payload, timeout):
+    """Gửi 1 request, trả về (độ trễ giây, thành công?)."""
+    start = time.perf_counter()
+    try:
+        response = _get_session().post(f"{url}/solve_gtsp", json=payload, timeout=timeout)
+        ok = response.status_code == 200
+    except requests.exceptions.RequestException:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(sorted_values, p):
+    """Phân vị p (0-100) của một danh sách ĐÃ SẮP XẾP (nội suy tuyến tính)."""
+    if not sorted_values:
+        return float('nan')
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run(url, total_requests, concurrency, min_clusters, max_clusters, timeout, seed):
+    rng = random.Random(seed)
+    payloads = [make_payload(rng, min_clusters, max_clusters) for _ in range(total_requests)]
+
+    print(f"Load test: {total_requests} request, concurrency={concurrency}, url={url}")
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda p: send_one(url, p, timeout), payloads))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(lat for lat, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+
+    print(f"  Thời gian tổng     : {wall:.2f}s")
+    print(f"  Thành công / Lỗi   : {len(latencies)} / {errors}")
+    print(f"  Throughput         : {len(latencies) / wall:.1f} req/s")
+    print(f"  Độ trễ p50         : {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"  Độ trễ p95         : {percentile(latencies, 95) * 1000:.1f} ms")
+    print(f"  Độ trễ p99         : {percentile(latencies, 99) * 1000:.1f} ms")
+    return latencies, errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test cho API /solve_gtsp")
+    parser.add_argument("--url", default="http://localhost:5001", help="Địa chỉ BLL")
+    parser.add_argument("--requests", type=int, default=200, help="Tổng số request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Số request song song")
+    parser.add_argument("--min-clusters", type=int, default=2)
+    parser.add_argument("--max-clusters", type=int, default=6)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--with-stub", type=int, metavar="PORT",
+                        help="Khởi chạy luôn OSRM stub (osrm_stub.py) trong tiến trình này tại PORT")
+    parser.add_argument("--stub-fixtures", help="File cassette cho stub (xem osrm_stub.py --fixtures)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    parser.add_argument("--stub-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--stub-fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = None
+    if args.with_stub:
+        import osrm_stub
+        stub_config = osrm_stub.StubConfig(
+            fixtures=osrm_stub.load_fixtures(args.stub_fixtures) if args.stub_fixtures else None,
+            latency_ms=args.stub_latency_ms, jitter_ms=args.stub_jitter_ms,
+            fail_rate=args.stub_fail_rate, seed=args.seed,
+        )
+        stub = osrm_stub.make_server(port=args.with_stub, config=stub_config)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        print(f"OSRM stub chạy tại http://127.0.0.1:{args.with_stub} "
+              f"(BLL cần OSRM_BASE_URL=http://127.0.0.1:{args.with_stub})")
+
+    try:
+        run(args.url, args.requests, args.concurrency, args.min_clusters,
+            args.max_clusters, args.timeout, args.seed)
+    finally:
+        if stub:
+            stub.shutdown()
@@ -0,0 +1,268 @@
+# logic/lower_bound.py
+#
+# Cận dưới (lower bound) cho bài toán GTSP của GTSPGraspSolver -> biết lời giải GRASP còn cách tối ưu bao xa
+# (gap = (chi phí tìm được - cận dưới) / chi phí tìm được), và dừng sớm khi gap đã đủ nhỏ.
+#
+# Bài toán nhỏ (ít cụm): quy hoạch động trên tập con các cụm (Held-Karp DP) ở mức ĐIỂM
+#   best[S][v] = chi phí nhỏ nhất đi từ START qua đúng các cụm trong S, kết thúc tại điểm v
+# -> đúng bằng chi phí tối ưu ở chế độ tĩnh (gap = khoảng cách thật tới tối ưu). Chỉ dùng khi 2^(số cụm) đủ nhỏ.
+#
+# Bài toán lớn: nới lỏng về mức CỤM, chi phí đi từ cụm A sang cụm B được lấy nhỏ nhất trên mọi cặp điểm
+#   D[A][B] = min_{u thuộc A, v thuộc B} chi_phí(u, v)
+# (bỏ ràng buộc "vào và ra một cụm tại cùng một điểm"). Thêm cạnh giả END -> START chi phí 0 thì mỗi tour
+# START -> ... -> END là một chu trình Hamilton trên các cụm, và chi phí chu trình <= chi phí tour. Hai cận:
+#   1. Bài toán phân công (assignment): mỗi cụm có đúng 1 cạnh ra và 1 cạnh vào. Giải đúng bằng thuật toán
+#      Hungary O(k^3). Giữ được tính bất đối xứng của ma trận (đường một chiều).
+#   2. Lagrange / 1-tree (Held & Karp, 1971) trên ma trận đối xứng hóa min(D[A][B], D[B][A]): cây khung nhỏ nhất
+#      + 2 cạnh của START, với bội số Lagrange pi cập nhật bằng subgradient. Thường sát hơn nhiều với ma trận
+#      gần đối xứng (OSRM trong thành phố).
+# Cận dưới = max của hai cận (mọi pi đều cho cận hợp lệ, nên lấy giá trị tốt nhất gặp được).
+# Cụm có nhiều điểm cách xa nhau làm cận mức cụm lỏng hơn (gap lớn hơn thực tế).
+#
+# Chế độ có lịch trình: mức phạt trễ giờ và thời gian chờ >= 0 nên được bỏ qua; với optimize_for='time',
+# chi phí cạnh u -> v = thời gian di chuyển NHỎ NHẤT qua các khung giờ giao với [giờ xuất phát, giờ xuất phát + cận trên]
+# + thời gian tham quan tại u (chặng đi qua nhiều khung giờ cũng không nhanh hơn khung nhanh nhất trong số đó).
+#
+# Cần NumPy; không có NumPy -> không có cận dưới (None).
+import time
+
+from time_dependent import MINUTES_PER_DAY
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Quy hoạch động tập con chỉ chạy khi số cụm (không gồm START/END) <= SUBSET_DP_MAX_CLUSTERS
+# và 2^(số cụm) x (số điểm)^2 <= SUBSET_DP_MAX_WORK
+SUBSET_DP_MAX_CLUSTERS = 10
+SUBSET_DP_MAX_WORK = 5e7
+# Số vòng lặp subgradient tối đa của cận Held-Karp
+HELD_KARP_ITERATIONS = 100
+# Số vòng lặp không cải thiện trước khi giảm một nửa bước subgradient
+HELD_KARP_PATIENCE = 10
+
+
+def gtsp_lower_bound(solver, upper_bound):
+    """
+    Cận dưới cho chi phí tour tối ưu của solver (GTSPGraspSolver).
+    upper_bound: chi phí của một lời giải đã biết (dùng để chọn bước subgradient).
+    Trả về dict {"lower_bound", "method" ("subset_dp" hoặc "relaxation"), "assignment", "held_karp", "time_ms"}
+    hoặc None nếu không tính được.
+    """
+    if np is None:
+        return None
+    start = solver.node_cluster[solver.start_index]
+    end = solver.node_cluster[solver.end_index]
+    if start == end or any(len(members) == 0 for members in solver.cluster_members):
+        return None
+    started = time.perf_counter()
+
+    # Các điểm được phép thăm, xếp liền theo cụm (cụm START / END chỉ gồm đúng điểm START / END)
+    groups = [np.frombuffer(members, dtype=np.int32) for members in solver.cluster_members]
+    groups[start] = np.array([solver.start_index], dtype=np.int32)
+    groups[end] = np.array([solver.end_index], dtype=np.int32)
+    nodes = np.concatenate(groups)
+    offsets = np.cumsum([0] + [len(group) for group in groups[:-1]])
+
+    cost = _node_cost_matrix(solver, nodes, upper_bound)
+    # Không có đường đi (inf) -> một giá trị hữu hạn lớn hơn mọi tour hữu hạn (tránh inf - inf trong thuật toán)
+    finite = np.isfinite(cost)
+    big = (cost[finite].max(initial=0.0) + 1.0) * len(groups)
+    cost[~finite] = big
+
+    intermediate = [c for c in range(len(groups)) if c not in (start, end)]
+    if len(intermediate) <= SUBSET_DP_MAX_CLUSTERS and \
+            2 ** len(intermediate) * len(nodes) ** 2 <= SUBSET_DP_MAX_WORK:
+        return {
+            "lower_bound": _subset_dp_bound(cost, offsets, start, end, intermediate),
+            "method": "subset_dp",
+            "assignment": None,
+            "held_karp": None,
+            "time_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    cluster_cost = np.minimum.reduceat(np.minimum.reduceat(cost, offsets, axis=1), offsets, axis=0)
+    assignment = _assignment_bound(cluster_cost, start, end, big)
+    held_karp = None
+    if np.isfinite(upper_bound):
+        held_karp = _held_karp_bound(cluster_cost, start, end, upper_bound)
+    bound = max(value for value in (assignment, held_karp) if value is not None)
+    return {
+        "lower_bound": bound,
+        "method": "relaxation",
+        "assignment": assignment,
+        "held_karp": held_karp,
+        "time_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _active_slices(td, departure_time, upper_bound):
+    """
+    Các khung giờ mà tour có chi phí <= upper_bound có thể khởi hành một chặng trong đó.
+    Tối ưu theo thời gian: chi phí >= thời gian đã trôi qua, nên mọi chặng của tour như vậy khởi hành
+    trong [departure_time, departure_time + upper_bound] -> chỉ lấy min trên các khung giao với khoảng này
+    (ví dụ xuất phát 17:00 thì không lấy hệ số 0.85 của ban đêm).
+    """
+    if not np.isfinite(upper_bound) or upper_bound >= MINUTES_PER_DAY:
+        return list(range(td.n_slices))
+    active = []
+    t, finish = departure_time, departure_time + upper_bound
+    while True:
+        active.append(td.slice_index(t))
+        slice_end = td.slice_bounds(t)[1]
+        if slice_end > finish:
+            return sorted(set(active))
+        t = slice_end
+
+
+def _node_cost_matrix(solver, nodes, upper_bound=float('inf')):
+    """Ma trận chi phí cạnh (float64) giữa các điểm 'nodes' - xem đầu file cho chế độ có lịch trình."""
+    if solver.optimize_for == 'time' and solver.use_td:
+        td = solver.td_durations
+        slices = np.frombuffer(td.data, dtype=np.float32).reshape(td.n_slices, td.n, td.n)
+        active = _active_slices(td, solver.departure_time, upper_bound)
+        cost = slices[active][:, nodes][:, :, nodes].min(axis=0).astype(np.float64)
+    else:
+        cost = np.asarray(solver.cost_matrix, dtype=np.float64)[np.ix_(nodes, nodes)]
+    if solver.optimize_for == 'time' and solver.has_visit_constraints:
+        # Thời gian tham quan tại u được tính vào cạnh rời khỏi u (END không rời đi -> không tính)
+        cost += np.frombuffer(solver.service_times, dtype=np.float64)[nodes][:, None]
+    return cost
+
+
+def _subset_dp_bound(cost, offsets, start, end, intermediate):
+    """
+    Quy hoạch động trên tập con các cụm trung gian: best[S][v] (v là điểm của một cụm trong S).
+    Mỗi tập S là một mặt nạ bit; mỗi bước cập nhật cả một cụm bằng NumPy. O(2^m x n^2).
+    """
+    bounds = np.append(offsets, len(cost))
+    start_node, end_node = offsets[start], offsets[end]
+    m = len(intermediate)
+    if m == 0:
+        return float(cost[start_node, end_node])
+    inf = float('inf')
+    best = np.full((1 << m, len(cost)), inf)
+    for bit, c in enumerate(intermediate):
+        best[1 << bit, bounds[c]:bounds[c + 1]] = cost[start_node, bounds[c]:bounds[c + 1]]
+    for mask in range(1, 1 << m):
+        if mask & (mask - 1) == 0:
+            continue  # Tập 1 cụm: đã khởi tạo ở trên
+        for bit, c in enumerate(intermediate):
+            if not mask & (1 << bit):
+                continue
+            previous = best[mask ^ (1 << bit)]
+            # Điểm kết thúc trước đó: mọi điểm của các cụm trong S \ {c} (các điểm khác đang là inf)
+            best[mask, bounds[c]:bounds[c + 1]] = (previous[:, None] + cost[:, bounds[c]:bounds[c + 1]]).min(axis=0)
+    return float((best[-1] + cost[:, end_node]).min())
+
+
+def _assignment_bound(cluster_cost, start, end, big):
+    """
+    Cận phân công: chu trình Hamilton trên các cụm (với cạnh giả END -> START chi phí 0) là một phép phân công,
+    nên chi phí phân công nhỏ nhất là cận dưới. Thuật toán Hungary (đường tăng ngắn nhất, thế vị u/v), O(k^3).
+    """
+    cost = cluster_cost.copy()
+    np.fill_diagonal(cost, big)
+    cost[:, start] = big   # Chỉ vào START bằng cạnh giả từ END
+    cost[end, :] = big     # END chỉ ra bằng cạnh giả
+    cost[end, start] = 0.0
+
+    k = len(cost)
+    inf = float('inf')
+    u = np.zeros(k + 1)
+    v = np.zeros(k + 1)
+    owner = np.zeros(k + 1, dtype=np.int64)   # owner[j]: hàng đang được gán cho cột j (1..k), 0 = chưa gán
+    way = np.zeros(k + 1, dtype=np.int64)
+    for row in range(1, k + 1):
+        owner[0] = row
+        column = 0
+        min_value = np.full(k + 1, inf)
+        used = np.zeros(k + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = owner[column]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < min_value[1:])
+            min_value[1:][better] = reduced[better]
+            way[1:][better] = column
+            candidates = np.where(free, min_value[1:], inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_value[~used] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    rows = owner[1:] - 1
+    return float(cost[rows, np.arange(k)].sum())
+
+
+def _held_karp_bound(cluster_cost, start, end, upper_bound):
+    """
+    Cận Lagrange 1-tree (Held-Karp) trên ma trận đối xứng hóa; nút đặc biệt của 1-tree là START.
+    L(pi) = 1-tree nhỏ nhất với trọng số D[A][B] + pi[A] + pi[B], trừ 2 * tổng pi.
+    Bước subgradient theo Polyak: t = lambda * (upper_bound - L(pi)) / ||g||^2, g = bậc - 2.
+    """
+    k = len(cluster_cost)
+    if k < 3:
+        return None
+    weight = np.minimum(cluster_cost, cluster_cost.T)
+    weight[start, end] = weight[end, start] = 0.0   # Cạnh giả END - START
+    others = np.array([c for c in range(k) if c != start])
+    pi = np.zeros(k)
+    best = -float('inf')
+    step = 2.0
+    stale = 0
+    for _ in range(HELD_KARP_ITERATIONS):
+        adjusted = weight + pi[:, None] + pi[None, :]
+        edges, tree_cost = _minimum_spanning_tree(adjusted[np.ix_(others, others)])
+        degree = np.zeros(k)
+        for a, b in edges:
+            degree[others[a]] += 1
+            degree[others[b]] += 1
+        # 2 cạnh rẻ nhất nối START vào cây
+        start_row = adjusted[start, others]
+        cheapest = np.argpartition(start_row, 1)[:2]
+        degree[others[cheapest]] += 1
+        degree[start] = 2
+        value = tree_cost + start_row[cheapest].sum() - 2.0 * pi.sum()
+        if value > best + 1e-9:
+            best, stale = value, 0
+        else:
+            stale += 1
+            if stale >= HELD_KARP_PATIENCE:
+                step, stale = step / 2, 0
+        subgradient = degree - 2
+        norm = float(subgradient @ subgradient)
+        if norm == 0 or step < 1e-3 or upper_bound - best <= 1e-9 * max(1.0, abs(upper_bound)):
+            break  # 1-tree là một tour (tối ưu của bài toán nới lỏng) hoặc cận đã chạm lời giải đã biết
+        pi += step * (upper_bound - value) / norm * subgradient
+    return float(best)
+
+
+def _minimum_spanning_tree(weight):
+    """Cây khung nhỏ nhất (Prim, O(m^2) vector hóa) của đồ thị đầy đủ; trả về (các cạnh, tổng trọng số)."""
+    m = len(weight)
+    edges = []
+    in_tree = np.zeros(m, dtype=bool)
+    in_tree[0] = True
+    distance = weight[0].copy()
+    parent = np.zeros(m, dtype=np.int64)
+    total = 0.0
+    inf = float('inf')
+    for _ in range(m - 1):
+        node = int(np.argmin(np.where(in_tree, inf, distance)))
+        total += distance[node]
+        edges.append((int(parent[node]), node))
+        in_tree[node] = True
+        closer = weight[node] < distance
+        distance = np.where(closer, weight[node], distance)
+        parent = np.where(closer, node, parent)
+    return edges, total
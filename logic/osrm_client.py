@@ -1,30 +1,516 @@
 # logic/osrm_client.py
 import requests                      # Thư viện để thực hiện các yêu cầu HTTP (gọi API)
+from requests.adapters import HTTPAdapter  # Cấu hình kích thước connection pool cho Session
 from geopy.distance import geodesic  # Dùng để tính khoảng cách "đường chim bay" (cho hàm fallback)
 import polyline  
 import time  
+import json                          # Đọc/ghi file bản ghi (cassette) cho chế độ record/replay
+import os
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlencode
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from osrm_table import parse_table_response, to_matrix, MatrixRows  # Giải mã ma trận 'table' thẳng vào mảng số
+from singleflight import SingleFlight  # Gộp các lời gọi giống nhau đang chạy đồng thời
+
+
+# Các phương tiện (profile) được hỗ trợ và tốc độ trung bình giả định (km/h) của từng loại,
+# chỉ dùng cho ma trận dự phòng (đường chim bay) khi OSRM lỗi.
+# Lưu ý: OSRM chỉ dùng tên profile trong URL làm nhãn - mỗi osrm-routed phục vụ đúng 1 profile
+# (car.lua, bicycle.lua, foot.lua, motorbike.lua tự viết...), xem tham số profile_base_urls.
+PROFILE_FALLBACK_SPEED_KMH = {
+    'driving': 30,     # Ô tô / xe khách
+    'motorbike': 25,   # Xe máy
+    'cycling': 12,     # Xe đạp
+    'walking': 5,      # Đi bộ
+}
+
+
+def cassette_key(path, params):
+    """
+    Khóa (key) định danh 1 lời gọi OSRM trong file bản ghi (cassette).
+    Chỉ gồm đường dẫn + tham số (KHÔNG gồm base_url), để bản ghi dùng lại được
+    với bất kỳ OSRM server nào (và với osrm_stub.py --fixtures).
+
+    Ví dụ: "/table/v1/driving/106.69,10.77;106.70,10.78?annotations=distance%2Cduration"
+    """
+    return f"{path}?{urlencode(sorted(params.items()))}"
+
+
+def read_cassette(path):
+    """
+    Đọc file bản ghi (cassette) -> (dict {key: response JSON}, có cần nén lại không).
+
+    Định dạng: mỗi dòng một bản ghi JSON [key, response] (JSON lines) - khi ghi chỉ cần nối thêm 1 dòng,
+    không phải ghi lại cả file. Key xuất hiện nhiều lần thì dòng sau cùng thắng.
+    Vẫn đọc được định dạng cũ (cả file là 1 object JSON {key: response}).
+    """
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('{'):
+        return json.loads(content), True  # Định dạng cũ -> chuyển sang JSON lines
+    cassette, lines = {}, 0
+    for line in content.splitlines():
+        if line.strip():
+            key, data = json.loads(line)
+            cassette[key] = data
+            lines += 1
+    return cassette, lines > len(cassette)
+
+
+def _is_retryable(error):
+    """
+    Lỗi có đáng để thử lại (retry) / tính là backend hỏng hay không.
+    - Lỗi mạng, timeout, HTTP 5xx, HTTP 429 (quá tải): CÓ.
+    - HTTP 4xx khác (ví dụ 400 InvalidQuery): KHÔNG - gửi lại y hệt cũng sẽ lỗi y hệt.
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+# --- Định dạng file kết quả single-flight dùng chung giữa các worker (xem singleflight.py) ---
+# Không dùng pickle: file nằm trên đĩa, đọc pickle là thực thi mã. Chặng 'route' -> JSON, ma trận -> .npz (allow_pickle=False).
+
+def _dump_route(info, f):
+    f.write(json.dumps(info).encode('utf-8'))
+
+
+def _load_route(f):
+    return json.loads(f.read())
+
+
+def _dump_matrix(item, f):
+    """item = (ma trận, True) của _fetch_distance_matrix (chỉ kết quả thành công được ghi)."""
+    result = item[0]
+    if np is not None:
+        np.savez(f, distances=np.asarray(result['distances'], dtype=np.float64),
+                 durations=np.asarray(result['durations'], dtype=np.float64))
+    else:
+        f.write(json.dumps(result).encode('utf-8'))  # inf -> Infinity (json của Python đọc lại được)
+
+
+def _load_matrix(f):
+    if np is not None:
+        with np.load(f, allow_pickle=False) as data:
+            return {'distances': MatrixRows(data['distances']), 'durations': MatrixRows(data['durations'])}, True
+    return json.loads(f.read()), True
+
+
+ROUTE_CODEC = (_dump_route, _load_route)
+MATRIX_CODEC = (_dump_matrix, _load_matrix)
+
+
+class CircuitBreaker:
+    """
+    Cầu dao (circuit breaker) cho MỘT OSRM backend.
+
+    - 'closed'   : bình thường, mọi request đều được gửi.
+    - 'open'     : backend lỗi liên tiếp >= failure_threshold lần -> bỏ qua backend này
+                   ngay lập tức (không chờ timeout) trong reset_timeout giây.
+    - 'half_open': hết reset_timeout -> cho đúng 1 request "thăm dò" đi qua;
+                   thành công thì đóng cầu dao, thất bại thì mở lại.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def available(self):
+        """
+        Backend có thể nhận request không - CHỈ xem trạng thái, không giữ lượt thăm dò.
+        Dùng để lọc danh sách backend; lượt thăm dò chỉ được giữ bằng allow() ngay trước khi gửi thật.
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not self._probe_in_flight
+
+    def allow(self):
+        """Có được phép gửi request tới backend này không ('half_open': giữ lượt thăm dò duy nhất)."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """Trả lại lượt thăm dò khi request kết thúc mà không xác định được backend sống hay chết."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Ghi nhận 1 lần lỗi; trả về True nếu lần lỗi này làm cầu dao MỞ."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                tripped = self.state != 'open'
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                return tripped
+            return False
+
 
 class OSRMClient:
     """
     Lớp Client (máy khách) để đóng gói và quản lý tất cả các
     lời gọi API đến dịch vụ OSRM (Open Source Routing Machine).
+
+    Khả năng chịu lỗi (cho production):
+    - Retry với backoff theo cấp số nhân + jitter ngẫu nhiên (retries, backoff_base, backoff_max).
+    - Circuit breaker riêng cho từng backend: backend "chết" bị bỏ qua ngay, không chờ timeout.
+    - Hedged request: khi có nhiều base URL và hedge_delay được đặt, nếu backend đầu tiên
+      chưa trả lời sau hedge_delay giây thì gửi song song tới backend kế tiếp, lấy kết quả về trước.
+    - Single-flight: các lời gọi 'table' / 'route' giống nhau chạy đồng thời (giữa các thread, và giữa
+      các worker khi có singleflight_dir) chỉ gửi 1 request tới OSRM và dùng chung kết quả.
+    - Mọi sự kiện đều được đếm trong get_stats() (xem API /osrm_stats).
     """
 
-    def __init__(self, base_url="http://router.project-osrm.org"):
+    MODES = ('live', 'record', 'replay')
+
+    def __init__(self, base_url="http://router.project-osrm.org", pool_maxsize=10,
+                 mode='live', cassette_path=None, route_timeout=10, table_timeout=30,
+                 connect_timeout=3.05, retries=2, backoff_base=0.2, backoff_max=2.0,
+                 hedge_delay=None, breaker_threshold=5, breaker_reset_timeout=30.0,
+                 profile_base_urls=None, matrix_cache_size=128, singleflight_dir=None):
         # Sử dụng server OSRM demo công cộng
         # (Nên thay bằng server OSRM nội bộ nếu chạy production, ví dụ: "http://localhost:5000")
-        self.base_url = base_url
+        # base_url có thể là 1 chuỗi, hoặc danh sách nhiều OSRM server (dùng cho hedging/failover)
+        self.base_urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.base_url = self.base_urls[0]  # Backend chính
+        # OSRM server riêng cho từng profile (mỗi osrm-routed chỉ nạp 1 profile), ví dụ:
+        # {'walking': ['http://localhost:5002'], 'cycling': ['http://localhost:5003']}
+        # Profile không có trong dict dùng base_urls.
+        self.profile_base_urls = {profile: ([urls] if isinstance(urls, str) else list(urls))
+                                  for profile, urls in (profile_base_urls or {}).items()}
+        # Số kết nối TCP tối đa được giữ lại (keep-alive) tới MỖI OSRM backend.
+        # Nên >= số thread của mỗi worker để các thread không phải chờ nhau.
+        self.pool_maxsize = pool_maxsize
         # Khởi tạo 1 Session để tái sử dụng kết nối TCP (tăng hiệu suất khi gọi API nhiều lần)
-        self.session = requests.Session()
-        print(f"OSRM Client khởi tạo, kết nối tới: {self.base_url}")
+        self.session = self._create_session()
+        # Timeout (giây) cho từng loại API; 'table' lớn hơn vì response có thể rất lớn.
+        # connect_timeout ngắn để phát hiện nhanh backend không kết nối được.
+        self.route_timeout = route_timeout
+        self.table_timeout = table_timeout
+        self.connect_timeout = connect_timeout
+
+        # Retry: tổng số lần gửi tối đa = 1 + retries
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Hedging (None = tắt). Chỉ có tác dụng khi có >= 2 base URL.
+        self.hedge_delay = hedge_delay
+        self._executor = None  # ThreadPoolExecutor cho hedged request (tạo khi cần)
+        # Executor RIÊNG cho fan-out nhiều profile (get_distance_matrices): tránh việc các tác vụ
+        # fan-out chiếm hết thread của executor hedging rồi chờ chính executor đó (deadlock).
+        self._fanout_executor = None
+
+        # Mỗi backend có 1 circuit breaker riêng
+        self.breakers = {url: CircuitBreaker(breaker_threshold, breaker_reset_timeout)
+                         for url in self._all_base_urls()}
+
+        # Cache ma trận theo (profile, danh sách tọa độ), LRU tối đa matrix_cache_size phần tử.
+        # Ma trận trong cache được dùng chung giữa các request -> KHÔNG được sửa tại chỗ.
+        self.matrix_cache_size = matrix_cache_size
+        self._matrix_cache = OrderedDict()
+        self._matrix_cache_lock = threading.Lock()
+
+        # Gộp lời gọi đồng thời (xem singleflight.py). singleflight_dir: thư mục file khóa/kết quả
+        # dùng chung giữa các worker trên cùng máy; None -> chỉ gộp giữa các thread của worker.
+        self.singleflight_dir = singleflight_dir
+        self._single_flight = SingleFlight(singleflight_dir)
+
+        # Bộ đếm (counters) để quan sát hành vi client
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,          # Số lời gọi _get_json (route + table)
+            "attempts": 0,          # Số HTTP request thực sự gửi đi (gồm retry + hedge)
+            "successes": 0,
+            "failures": 0,          # Lời gọi thất bại sau khi đã hết retry
+            "retries": 0,
+            "hedges": 0,            # Số request "dự phòng" được gửi thêm
+            "hedge_wins": 0,        # Số lần request dự phòng trả về trước
+            "breaker_trips": 0,     # Số lần cầu dao chuyển sang 'open'
+            "breaker_rejections": 0,  # Số lần bỏ qua vì mọi backend đều đang 'open'
+            "fallbacks": 0,         # Số lần phải dùng dữ liệu dự phòng (đường chim bay / ma trận)
+            "replay_hits": 0,
+            "replay_misses": 0,
+            "matrix_cache_hits": 0,
+            "matrix_cache_misses": 0,
+            "coalesced": 0,           # Lời gọi dùng chung kết quả của thread khác (không gọi OSRM)
+            "coalesced_processes": 0,  # Lời gọi dùng chung kết quả do worker khác ghi ra singleflight_dir
+        }
+
+        # Chế độ ghi/phát lại (record/replay):
+        # - 'live'  : gọi OSRM bình thường.
+        # - 'record': gọi OSRM và nối mọi response vào file cassette_path (JSON lines).
+        # - 'replay': KHÔNG gọi mạng, trả về response đã ghi trong cassette_path.
+        if mode not in self.MODES:
+            raise ValueError(f"mode phải là một trong {self.MODES}, nhận được: {mode!r}")
+        if mode != 'live' and not cassette_path:
+            raise ValueError(f"Chế độ '{mode}' cần tham số cassette_path")
+        self.mode = mode
+        self.cassette_path = cassette_path
+        self._cassette_lock = threading.Lock()  # Các thread của worker ghi chung 1 cassette
+        self._cassette = self._load_cassette() if mode != 'live' else {}
+        print(f"OSRM Client khởi tạo, kết nối tới: {', '.join(self.base_urls)} (mode={self.mode})")
+
+    def _all_base_urls(self):
+        """Tất cả OSRM backend (mặc định + theo profile), không trùng lặp, giữ thứ tự."""
+        urls = list(self.base_urls)
+        for profile_urls in self.profile_base_urls.values():
+            urls.extend(u for u in profile_urls if u not in urls)
+        return urls
+
+    def _create_session(self):
+        """Tạo một requests.Session mới với connection pool có kích thước pool_maxsize."""
+        session = requests.Session()
+        # pool_connections: số pool (mỗi host 1 pool), pool_maxsize: số kết nối mỗi pool
+        adapter = HTTPAdapter(pool_connections=len(self._all_base_urls()), pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def reset_session(self):
+        """
+        Bỏ Session cũ và tạo Session (connection pool) mới.
+        Gọi trong mỗi worker ngay sau khi fork (gunicorn post_fork), vì socket
+        được mở ở tiến trình master KHÔNG được dùng chung an toàn giữa các tiến trình.
+        (Thread của executor cũng không tồn tại sau fork, nên tạo lại khi cần.)
+        """
+        self.session = self._create_session()
+        self._executor = None
+        self._fanout_executor = None
+        self._single_flight = SingleFlight(self.singleflight_dir)  # Bỏ các lời gọi "đang chạy" chép từ master
+
+    def close(self):
+        """Đóng tất cả kết nối trong connection pool (dùng khi worker tắt)."""
+        for executor in (self._executor, self._fanout_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self.session.close()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def get_stats(self):
+        """Ảnh chụp (snapshot) các bộ đếm + trạng thái circuit breaker của từng backend."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["breakers"] = {
+            url: {"state": b.state, "consecutive_failures": b.consecutive_failures}
+            for url, b in self.breakers.items()
+        }
+        return stats
+
+    def _load_cassette(self):
+        """
+        Đọc file cassette (chưa có file -> dict rỗng). Ở chế độ record, file có key trùng lặp
+        (hoặc định dạng cũ) được nén lại MỘT LẦN ở đây; sau đó mỗi bản ghi mới chỉ được nối thêm 1 dòng.
+        """
+        if not os.path.exists(self.cassette_path):
+            return {}
+        cassette, needs_compaction = read_cassette(self.cassette_path)
+        if needs_compaction and self.mode == 'record':
+            # Ghi vào file tạm rồi đổi tên để không bao giờ bị ghi dở
+            tmp_path = f"{self.cassette_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, data in cassette.items():
+                    f.write(json.dumps([key, data], ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.cassette_path)
+        return cassette
+
+    def _append_cassette(self, key, data):
+        """Nối 1 bản ghi vào cuối file (O(kích thước bản ghi), không ghi lại cả cassette)."""
+        with open(self.cassette_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([key, data], ensure_ascii=False) + "\n")
+
+    def _get_json(self, path, params, timeout, profile=None, decoder=None):
+        """
+        Gửi GET tới OSRM (base_url + path) và trả về response đã parse JSON.
+        decoder: (Tùy chọn) hàm bytes -> dữ liệu thay cho response.json() (ví dụ parse_table_response).
+        Ở chế độ record luôn dùng json để bản ghi ghi được ra file.
+        Đây là điểm duy nhất đi ra mạng của 'route' và 'table', nên record/replay,
+        retry, circuit breaker và hedging đều được xử lý ở đây.
+
+        Lỗi mạng/HTTP được ném ra dưới dạng requests.exceptions.RequestException
+        (kể cả khi replay không tìm thấy bản ghi) để hàm gọi dùng fallback như cũ.
+        """
+        self._count("requests")
+        key = cassette_key(path, params)
+        if self.mode == 'replay':
+            with self._cassette_lock:
+                data = self._cassette.get(key)
+            if data is None:
+                self._count("replay_misses")
+                raise requests.exceptions.RequestException(f"Replay: không có bản ghi cho {key}")
+            self._count("replay_hits")
+            return data
+
+        last_error = None
+        data = None  # Vẫn là None nếu hết retry HOẶC gặp lỗi không đáng retry (break sớm)
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                # Backoff cấp số nhân với "full jitter": ngủ ngẫu nhiên trong [0, base * 2^attempt]
+                # -> các worker không dồn dập retry cùng lúc vào 1 backend đang quá tải.
+                self._count("retries")
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+            try:
+                data = self._fetch_hedged(path, params, timeout, attempt,
+                                          self.profile_base_urls.get(profile, self.base_urls),
+                                          decoder if self.mode != 'record' else None)
+                break
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                if not _is_retryable(e):
+                    break
+
+        if data is None:
+            self._count("failures")
+            raise last_error
+
+        self._count("successes")
+        if self.mode == 'record':
+            with self._cassette_lock:
+                self._cassette[key] = data
+                self._append_cassette(key, data)
+        return data
+
+    def _fetch_one(self, base_url, path, params, timeout, decoder=None):
+        """Gửi ĐÚNG 1 HTTP request tới 1 backend, cập nhật circuit breaker của backend đó."""
+        breaker = self.breakers[base_url]
+        # Giữ lượt (thăm dò, nếu 'half_open') ngay trước khi gửi; thread khác đã giữ mất -> coi như lỗi kết nối
+        if not breaker.allow():
+            raise requests.exceptions.ConnectionError(f"OSRM: circuit breaker đang chặn {base_url}")
+        self._count("attempts")
+        try:
+            response = self.session.get(f"{base_url}{path}", params=params,
+                                        timeout=(self.connect_timeout, timeout))
+            response.raise_for_status()  # Ném lỗi nếu status code là 4xx hoặc 5xx
+            if decoder is None:
+                data = response.json()
+            else:
+                try:
+                    data = decoder(response.content)
+                except ValueError as e:  # JSON hỏng: xử lý giống lỗi của response.json()
+                    raise requests.exceptions.InvalidJSONError(str(e), response=response)
+        except requests.exceptions.RequestException as e:
+            if _is_retryable(e):
+                if breaker.record_failure():
+                    self._count("breaker_trips")
+                    print(f"OSRM: Circuit breaker MỞ cho {base_url}")
+            else:
+                breaker.record_success()  # Backend vẫn trả lời (lỗi do request), không phải backend hỏng
+            raise
+        except BaseException:
+            breaker.release()  # Lỗi khác (không phải HTTP): không giữ lượt thăm dò mãi mãi
+            raise
+        breaker.record_success()
+        return data
+
+    def _fetch_hedged(self, path, params, timeout, attempt, base_urls, decoder=None):
+        """
+        Gửi request tới các backend đang cho phép (circuit breaker không 'open').
+
+        - 1 backend hoặc hedge_delay=None: gửi tới 1 backend (mỗi lần retry xoay vòng sang backend kế tiếp).
+        - Nhiều backend + hedge_delay: gửi tới backend đầu tiên; cứ sau mỗi hedge_delay giây mà
+          chưa có kết quả thành công thì gửi thêm tới backend kế tiếp. Lấy kết quả thành công đầu tiên.
+        """
+        # Chỉ xem trạng thái (không giữ lượt thăm dò): backend không được gửi request thì không bị "treo" ở half_open
+        backends = [url for url in base_urls if self.breakers[url].available()]
+        if not backends:
+            self._count("breaker_rejections")
+            raise requests.exceptions.ConnectionError("OSRM: tất cả backend đang bị circuit breaker chặn")
+        # Xoay vòng thứ tự backend theo lần thử để retry không dồn vào cùng 1 node
+        shift = attempt % len(backends)
+        backends = backends[shift:] + backends[:shift]
+
+        if self.hedge_delay is None or len(backends) == 1:
+            return self._fetch_one(backends[0], path, params, timeout, decoder)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_maxsize,
+                                                thread_name_prefix="osrm-hedge")
+        pending = {}
+        last_error = None
+        next_backend = 0
+        while True:
+            if next_backend < len(backends):
+                if next_backend > 0:
+                    self._count("hedges")
+                future = self._executor.submit(self._fetch_one, backends[next_backend], path, params, timeout,
+                                               decoder)
+                pending[future] = next_backend
+                next_backend += 1
+            if not pending:
+                raise last_error
+            # Còn backend dự phòng -> chỉ chờ hedge_delay; hết backend -> chờ tới khi có kết quả
+            wait_timeout = self.hedge_delay if next_backend < len(backends) else None
+            done, _ = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    data = future.result()
+                except requests.exceptions.RequestException as e:
+                    last_error = e
+                    continue
+                if index > 0:
+                    self._count("hedge_wins")
+                return data
+
+    def _coalesce(self, key, fn, shareable=None, codec=None):
+        """Chạy fn() qua single-flight theo key, đếm số lời gọi được dùng chung kết quả."""
+        result, source = self._single_flight.do(key, fn, shareable, codec)
+        if source == 'thread':
+            self._count("coalesced")
+        elif source == 'process':
+            self._count("coalesced_processes")
+        return result
 
     def get_route_info(self, coord1, coord2, profile='driving'):
         """
         Lấy thông tin tuyến đường chi tiết giữa 2 điểm (API 'route').
         Hàm này trả về geometry (để vẽ) và steps (hướng dẫn rẽ).
 
+        Các lời gọi đồng thời với cùng (profile, coord1, coord2) dùng chung 1 request OSRM;
+        kết quả dùng chung -> KHÔNG được sửa tại chỗ.
+
         Input: coord1, coord2 là (latitude, longitude)
         """
+        key = ('route', profile, tuple(coord1), tuple(coord2))
+        # None (OSRM lỗi) chỉ dùng chung giữa các thread đang chờ, không ghi ra cho worker khác
+        return self._coalesce(key, lambda: self._fetch_route_info(coord1, coord2, profile),
+                              shareable=lambda info: info is not None, codec=ROUTE_CODEC)
+
+    def _fetch_route_info(self, coord1, coord2, profile):
+        """Gọi OSRM 'route' cho 1 chặng (xem get_route_info); trả về None nếu lỗi."""
         try:
             # OSRM API yêu cầu tọa độ theo định dạng (longitude, latitude)
             # Chúng ta cần chuyển đổi từ (lat, lon) sang (lon, lat)
@@ -32,17 +518,15 @@ class OSRMClient:
             lon2, lat2 = coord2[1], coord2[0]
 
             # Xây dựng URL cho OSRM 'route' service
-            url = f"{self.base_url}/route/v1/{profile}/{lon1},{lat1};{lon2},{lat2}"
+            path = f"/route/v1/{profile}/{lon1},{lat1};{lon2},{lat2}"
             params = {
                 'overview': 'full',  # Lấy geometry chi tiết nhất
                 'geometries': 'geojson',  # Yêu cầu trả về định dạng GeoJSON (dễ vẽ trên Leaflet/Mapbox)
                 'steps': 'true'  # Yêu cầu trả về các bước chỉ đường chi tiết
             }
 
-            # Gửi yêu cầu GET với timeout 10 giây
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()  # Ném lỗi nếu status code là 4xx hoặc 5xx
-            data = response.json()
+            # Gửi yêu cầu GET (mặc định timeout 10 giây)
+            data = self._get_json(path, params, timeout=self.route_timeout, profile=profile)
 
             if data['code'] == 'Ok' and len(data['routes']) > 0:
                 route = data['routes'][0]  # Lấy tuyến đường tốt nhất
@@ -73,10 +557,12 @@ class OSRMClient:
             else:
                 # Trường hợp OSRM trả về code không 'Ok' (ví dụ: 'NoRoute')
                 print(f"OSRM Route API trả về code: {data.get('code')}")
+                self._count("fallbacks")
                 return None
         except requests.exceptions.RequestException as e:
             # Xử lý lỗi mạng (timeout, không kết nối được, ...)
             print(f"OSRM Route API Error: {e}")
+            self._count("fallbacks")
             return None
 
     def get_distance_matrix(self, coordinates, profile='driving'):
@@ -84,53 +570,97 @@ class OSRMClient:
         Lấy ma trận khoảng cách/thời gian cho một danh sách các điểm (API 'table').
         Đây là hàm quan trọng nhất để cung cấp dữ liệu cho Solver.
 
+        Kết quả thành công được cache theo (profile, danh sách tọa độ); ma trận dự phòng
+        (fallback) KHÔNG được cache để lần sau còn thử lại OSRM.
+
         Input: coordinates là danh sách các (lat, lon)
         """
+        cache_key = (profile, tuple(tuple(c) for c in coordinates))
+        with self._matrix_cache_lock:
+            cached = self._matrix_cache.get(cache_key)
+            if cached is not None:
+                self._matrix_cache.move_to_end(cache_key)  # Đánh dấu "vừa dùng" (LRU)
+        if cached is not None:
+            self._count("matrix_cache_hits")
+            return cached
+        self._count("matrix_cache_misses")
+
+        # Các lời gọi đồng thời với cùng khóa chờ 1 request OSRM duy nhất; ma trận dự phòng chỉ dùng chung
+        # giữa các thread đang chờ, không ghi ra cho worker khác và không vào cache.
+        result, ok = self._coalesce(('table',) + cache_key,
+                                    lambda: self._fetch_distance_matrix(coordinates, profile),
+                                    shareable=lambda item: item[1], codec=MATRIX_CODEC)
+        if ok and self.matrix_cache_size > 0:
+            with self._matrix_cache_lock:
+                self._matrix_cache[cache_key] = result
+                self._matrix_cache.move_to_end(cache_key)
+                while len(self._matrix_cache) > self.matrix_cache_size:
+                    self._matrix_cache.popitem(last=False)  # Bỏ phần tử lâu không dùng nhất
+        return result
+
+    def _fetch_distance_matrix(self, coordinates, profile):
+        """
+        Gọi OSRM 'table' (xem get_distance_matrix).
+        Trả về (ma trận, True) nếu thành công, (ma trận dự phòng, False) nếu OSRM lỗi.
+        """
         try:
             # OSRM yêu cầu (lon,lat)
             # Chuyển đổi danh sách tọa độ thành chuỗi, ví dụ: "lon1,lat1;lon2,lat2;..."
             coords_str = ';'.join([f"{lon},{lat}" for lat, lon in coordinates])
 
-            url = f"{self.base_url}/table/v1/{profile}/{coords_str}"
+            path = f"/table/v1/{profile}/{coords_str}"
             params = {
                 'annotations': 'distance,duration'  # Yêu cầu trả về cả 2 ma trận
             }
 
-            # Gửi yêu cầu (timeout 30s vì đây là request có thể rất lớn)
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-
-            data = response.json()
+            # Gửi yêu cầu (mặc định timeout 30s vì đây là request có thể rất lớn)
+            # Response được giải mã thẳng vào mảng số (xem osrm_table.py), không qua response.json()
+            data = self._get_json(path, params, timeout=self.table_timeout, profile=profile,
+                                  decoder=parse_table_response)
 
             if data['code'] == 'Ok':
-                # Xử lý ma trận kết quả:
+                # Xử lý ma trận kết quả (vector hóa trên cả ma trận, xem osrm_table.to_matrix):
                 # 1. Chuyển đổi (mét -> km) và (giây -> phút)
                 # 2. Nếu OSRM trả về 'null' (không có đường đi), thay bằng float('inf') (vô cùng)
-                
-                distances_km = [
-                    [(dist / 1000.0) if dist is not None else float('inf') for dist in row]
-                    for row in data['distances']
-                ]
-                durations_min = [
-                    [(dur / 60.0) if dur is not None else float('inf') for dur in row]
-                    for row in data['durations']
-                ]
+                distances_km = to_matrix(data['distances'], 1000.0)
+                durations_min = to_matrix(data['durations'], 60.0)
 
-                return {
+                result = {
                     'distances': distances_km,
                     'durations': durations_min
                 }
+                return result, True
             else:
                 # Nếu OSRM báo lỗi (ví dụ: 'InvalidQuery')
                 print(f"OSRM Table API trả về code: {data.get('code')}")
-                return self._fallback_distance_matrix(coordinates)  # Chuyển sang hàm fallback
+                self._count("fallbacks")
+                return self._fallback_distance_matrix(coordinates, profile), False  # Chuyển sang hàm fallback
 
         except requests.exceptions.RequestException as e:
             # Lỗi mạng, timeout...
             print(f"OSRM Matrix API Error: {e}. Sử dụng fallback...")
-            return self._fallback_distance_matrix(coordinates)  # Chuyển sang hàm fallback
+            self._count("fallbacks")
+            return self._fallback_distance_matrix(coordinates, profile), False  # Chuyển sang hàm fallback
+
+    def get_distance_matrices(self, coordinates, profiles):
+        """
+        Lấy ma trận cho NHIỀU profile cùng lúc (fan-out song song), ví dụ để so sánh
+        ô tô / xe máy / đi bộ mà không phải chờ lần lượt từng lời gọi OSRM.
+
+        Trả về: dict { profile: {'distances': ..., 'durations': ...} }
+        """
+        profiles = list(dict.fromkeys(profiles))  # Bỏ trùng, giữ thứ tự
+        if len(profiles) == 1:
+            return {profiles[0]: self.get_distance_matrix(coordinates, profiles[0])}
+
+        if self._fanout_executor is None:
+            self._fanout_executor = ThreadPoolExecutor(max_workers=len(PROFILE_FALLBACK_SPEED_KMH),
+                                                       thread_name_prefix="osrm-fanout")
+        futures = {profile: self._fanout_executor.submit(self.get_distance_matrix, coordinates, profile)
+                   for profile in profiles}
+        return {profile: future.result() for profile, future in futures.items()}
 
-    def _fallback_distance_matrix(self, coordinates):
+    def _fallback_distance_matrix(self, coordinates, profile='driving'):
         """
         Hàm dự phòng (Fallback):
         Tính ma trận chi phí bằng khoảng cách ĐƯỜNG CHIM BAY (geodesic distance).
@@ -139,6 +669,7 @@ class OSRMClient:
         Lưu ý: Cách này KHÔNG TÍNH ĐƯỜNG ĐI THỰC TẾ, chỉ là ước lượng.
         """
         print("Cảnh báo: Đang sử dụng ma trận fallback (đường chim bay).")
+        speed_kmh = PROFILE_FALLBACK_SPEED_KMH.get(profile, PROFILE_FALLBACK_SPEED_KMH['driving'])
         n = len(coordinates)
         # Khởi tạo 2 ma trận rỗng (chứa giá trị 'inf')
         distances = [[float('inf')] * n for _ in range(n)]
@@ -151,9 +682,9 @@ class OSRMClient:
                 # Tính khoảng cách đường chim bay (đơn vị: km)
                 dist = geodesic(coordinates[i], coordinates[j]).kilometers
                 
-                # Ước lượng thời gian: Giả định tốc độ di chuyển trung bình là 30km/h
+                # Ước lượng thời gian: Giả định tốc độ di chuyển trung bình theo profile (ô tô: 30km/h)
                 # (Đây là một giả định rất thô sơ, chỉ dùng khi bất khả kháng)
-                dur = (dist / 30) * 60  # (km / (km/h)) * 60 (phút/h) = phút
+                dur = (dist / speed_kmh) * 60  # (km / (km/h)) * 60 (phút/h) = phút
 
                 # Gán giá trị cho ma trận (ma trận đối xứng)
                 distances[i][j] = distances[j][i] = dist
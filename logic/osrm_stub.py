@@ -0,0 +1,238 @@
+# logic/osrm_stub.py
+#
+# Server "giả lập" OSRM chạy cục bộ, dùng cho load test / benchmark không cần mạng.
+# Phục vụ 2 API mà OSRMClient sử dụng, với định dạng JSON giống OSRM thật:
+#   - GET /table/v1/<profile>/<lon,lat;lon,lat;...>?annotations=distance,duration
+#   - GET /route/v1/<profile>/<lon1,lat1;lon2,lat2>?overview=full&geometries=geojson&steps=true
+#
+# Nguồn dữ liệu trả về:
+#   - Mặc định: khoảng cách tính bằng công thức haversine (đường chim bay) nhân hệ số đường vòng,
+#     thời gian được ước lượng theo tốc độ trung bình.
+#   - --fixtures <file>: trả về đúng response OSRM thật đã ghi lại bằng OSRMClient(mode='record').
+#     Request không có trong file sẽ dùng mô hình haversine (hoặc lỗi 404 nếu --strict-fixtures).
+#
+# Giả lập điều kiện mạng/server để tinh chỉnh timeout & fallback:
+#   --latency-ms / --jitter-ms : độ trễ mỗi request (cố định + ngẫu nhiên)
+#   --fail-rate                : tỉ lệ request trả về HTTP 503
+#   --drop-rate                : tỉ lệ request bị đóng kết nối, không trả lời
+#   --slow-rate / --slow-ms    : tỉ lệ request bị chậm bất thường (mô phỏng 1 node OSRM "ì ạch")
+#
+# Chạy:
+#   python logic/osrm_stub.py --port 5005 --latency-ms 20 --jitter-ms 10 --fail-rate 0.02
+#   OSRM_BASE_URL=http://localhost:5005 gunicorn -c logic/gunicorn.conf.py
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+from osrm_client import cassette_key, read_cassette, PROFILE_FALLBACK_SPEED_KMH
+
+EARTH_RADIUS_M = 6371008.8  # Bán kính trung bình của Trái Đất (mét)
+DETOUR_FACTOR = 1.3         # Hệ số đường vòng: đường thực tế dài hơn đường chim bay ~30%
+SPEED_KMH = 30.0            # Tốc độ trung bình mặc định (profile không rõ)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Khoảng cách đường chim bay giữa 2 điểm (mét)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def road_estimate(lonlat1, lonlat2, speed_kmh=SPEED_KMH):
+    """Ước lượng (quãng đường mét, thời gian giây) giữa 2 điểm dạng (lon, lat)."""
+    dist = haversine_m(lonlat1[1], lonlat1[0], lonlat2[1], lonlat2[0]) * DETOUR_FACTOR
+    dur = dist / (speed_kmh * 1000 / 3600)
+    return dist, dur
+
+
+def parse_coords(coords_str):
+    """Chuyển chuỗi "lon1,lat1;lon2,lat2" thành list [(lon, lat), ...]."""
+    return [tuple(float(x) for x in pair.split(",")) for pair in coords_str.split(";")]
+
+
+def table_response(coords, speed_kmh=SPEED_KMH):
+    """Tạo response giống OSRM 'table' cho danh sách tọa độ (lon, lat)."""
+    n = len(coords)
+    distances = [[0.0] * n for _ in range(n)]
+    durations = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                distances[i][j], durations[i][j] = road_estimate(coords[i], coords[j], speed_kmh)
+    return {"code": "Ok", "distances": distances, "durations": durations}
+
+
+def route_response(coords, speed_kmh=SPEED_KMH):
+    """Tạo response giống OSRM 'route' (1 chặng, geometry là đường thẳng)."""
+    origin, destination = coords[0], coords[-1]
+    dist, dur = road_estimate(origin, destination, speed_kmh)
+    steps = [
+        {"name": "", "maneuver": {"type": "depart"}, "distance": dist, "duration": dur},
+        {"name": "", "maneuver": {"type": "arrive"}, "distance": 0.0, "duration": 0.0},
+    ]
+    return {
+        "code": "Ok",
+        "routes": [{
+            "distance": dist,
+            "duration": dur,
+            "geometry": {"type": "LineString", "coordinates": [list(origin), list(destination)]},
+            "legs": [{"distance": dist, "duration": dur, "steps": steps}],
+        }],
+    }
+
+
+class StubConfig:
+    """Cấu hình hành vi của stub (dùng chung cho mọi thread xử lý request)."""
+
+    def __init__(self, fixtures=None, strict_fixtures=False, latency_ms=0.0, jitter_ms=0.0,
+                 fail_rate=0.0, drop_rate=0.0, slow_rate=0.0, slow_ms=5000.0, seed=None):
+        self.fixtures = fixtures or {}        # {cassette_key: response JSON}
+        self.strict_fixtures = strict_fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()     # random.Random không an toàn khi nhiều thread cùng gọi
+        # Bộ đếm để kiểm tra nhanh stub đã phục vụ những gì (GET /stats)
+        self.counters = {"requests": 0, "fixture_hits": 0, "failed": 0, "dropped": 0, "slow": 0}
+
+    def random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def count(self, name):
+        with self._rng_lock:
+            self.counters[name] += 1
+
+
+class OSRMStubHandler(BaseHTTPRequestHandler):
+    """Xử lý các request GET /table/... và /route/... theo định dạng OSRM."""
+
+    # HTTP/1.1 để client giữ kết nối (keep-alive) giống OSRM thật
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            return self._send_json(200, self.config.counters)
+
+        config = self.config
+        config.count("requests")
+
+        # --- Giả lập sự cố (failure injection) ---
+        if config.drop_rate and config.random() < config.drop_rate:
+            config.count("dropped")
+            self.close_connection = True
+            return  # Đóng kết nối mà không trả lời -> client nhận ConnectionError
+        if config.fail_rate and config.random() < config.fail_rate:
+            config.count("failed")
+            return self._send_json(503, {"code": "ServiceUnavailable", "message": "injected failure"})
+
+        # --- Giả lập độ trễ ---
+        delay_ms = config.latency_ms
+        if config.jitter_ms:
+            delay_ms += config.random() * config.jitter_ms
+        if config.slow_rate and config.random() < config.slow_rate:
+            config.count("slow")
+            delay_ms += config.slow_ms
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+        # --- Trả về bản ghi (fixture) nếu có ---
+        if config.fixtures:
+            key = cassette_key(url.path, dict(parse_qsl(url.query)))
+            if key in config.fixtures:
+                config.count("fixture_hits")
+                return self._send_json(200, config.fixtures[key])
+            if config.strict_fixtures:
+                return self._send_json(404, {"code": "NoFixture", "message": key})
+
+        # Đường dẫn dạng: /<service>/v1/<profile>/<coords>
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 4 or parts[1] != "v1":
+            return self._send_json(400, {"code": "InvalidUrl", "message": self.path})
+
+        service, profile, coords_str = parts[0], parts[2], parts[3]
+        speed_kmh = PROFILE_FALLBACK_SPEED_KMH.get(profile, SPEED_KMH)
+        try:
+            coords = parse_coords(coords_str)
+        except ValueError:
+            return self._send_json(400, {"code": "InvalidQuery", "message": coords_str})
+
+        if service == "table":
+            return self._send_json(200, table_response(coords, speed_kmh))
+        if service == "route":
+            return self._send_json(200, route_response(coords, speed_kmh))
+        return self._send_json(400, {"code": "InvalidService", "message": service})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Tắt log mỗi request (load test sinh ra hàng nghìn dòng)
+        pass
+
+
+def load_fixtures(path):
+    """Đọc file bản ghi (cassette) do OSRMClient(mode='record') tạo ra."""
+    return read_cassette(path)[0]
+
+
+def make_server(host="127.0.0.1", port=5005, config=None):
+    """Tạo (chưa chạy) server stub; dùng được cả từ script khác (load_test.py)."""
+    server = ThreadingHTTPServer((host, port), OSRMStubHandler)
+    server.daemon_threads = True
+    server.config = config or StubConfig()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Server giả lập OSRM (table/route) cho load test")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--fixtures", help="File cassette (JSON) ghi bằng OSRMClient(mode='record')")
+    parser.add_argument("--strict-fixtures", action="store_true",
+                        help="Trả về 404 thay vì mô hình haversine khi không có bản ghi")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Độ trễ cố định mỗi request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Độ trễ ngẫu nhiên thêm [0, jitter]")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Tỉ lệ request trả về HTTP 503")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Tỉ lệ request bị đóng kết nối")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Tỉ lệ request bị chậm bất thường")
+    parser.add_argument("--slow-ms", type=float, default=5000.0, help="Độ trễ thêm cho request chậm")
+    parser.add_argument("--seed", type=int, help="Seed cho failure injection (tái lập kết quả)")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        fixtures=load_fixtures(args.fixtures) if args.fixtures else None,
+        strict_fixtures=args.strict_fixtures,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        fail_rate=args.fail_rate, drop_rate=args.drop_rate,
+        slow_rate=args.slow_rate, slow_ms=args.slow_ms, seed=args.seed,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"--- OSRM stub đang chạy tại: http://{args.host}:{args.port} ---")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,151 @@
+# logic/osrm_table.py
+#
+# Giải mã response 'table' của OSRM thẳng vào mảng số (không tạo đối tượng Python cho từng phần tử).
+#
+# Cách cũ: response.json() tạo ~2 x n^2 đối tượng float/None của Python (list lồng nhau), rồi đổi đơn vị
+# bằng list comprehension -> thêm 2 x n^2 float nữa. Với n = 1000: vài triệu đối tượng, hàng trăm MB bộ nhớ tạm.
+#
+# Cách mới (khi có NumPy):
+#   1. parse_table_response(): tìm 2 mảng "distances" / "durations" ngay trong bytes của response,
+#      rồi đọc từng khối hàng (bỏ dấu ngoặc, đổi 'null' -> 'nan') thẳng vào mảng float64 cấp phát sẵn
+#      bằng np.fromstring (mã C).
+#      Phần còn lại của JSON (code, sources, destinations...) rất nhỏ, parse bằng json như thường.
+#   2. to_matrix(): đổi đơn vị (m -> km, s -> phút) và null -> inf trên cả mảng (vector hóa),
+#      trả về MatrixRows - dùng được như list 2D (matrix[i][j]) mà không copy dữ liệu.
+#
+# Không có NumPy -> json.loads + list comprehension như cũ.
+import json
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Các khóa ma trận trong response 'table' (annotations=distance,duration)
+MATRIX_KEYS = ("distances", "durations")
+# Số hàng giải mã mỗi lần (giới hạn bộ nhớ tạm khi đọc ma trận lớn)
+ROWS_PER_CHUNK = 64
+# Cuối ma trận: "]]" (có thể cách nhau bởi khoảng trắng khi JSON được định dạng)
+_MATRIX_END = re.compile(rb'\]\s*\]')
+
+
+class MatrixRows(list):
+    """
+    Ma trận n x n dạng list các hàng; mỗi hàng là memoryview (float64) trỏ vào cùng một ndarray.
+
+    - matrix[i][j] trả về float của Python (giống list 2D), nên mọi code cũ dùng được nguyên vẹn.
+    - np.asarray(matrix) trả về chính ndarray bên dưới (không copy) - dùng cho Solver vector hóa / kernel.
+    - Pickle (gửi sang tiến trình con của vrp_split) gửi ndarray, không gửi từng phần tử.
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array):
+        super().__init__(memoryview(row) for row in array)
+        self.array = array
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or np.dtype(dtype) == self.array.dtype:
+            return self.array
+        return self.array.astype(dtype)
+
+    def __reduce__(self):
+        return MatrixRows, (self.array,)
+
+
+def _decode_rows(segment):
+    """Đọc các số trong một đoạn JSON dạng "[a,b,...],[c,d,...]" (null -> nan) thành mảng 1 chiều."""
+    text = segment.translate(None, b'[] \t\r\n').replace(b'null', b'nan').decode('ascii')
+    return np.fromstring(text, dtype=np.float64, sep=',')
+
+
+def _decode_matrix(content, key):
+    """
+    Đọc mảng 2D số của khóa key trực tiếp từ bytes JSON vào một ndarray cấp phát trước.
+    Giải mã từng khối ROWS_PER_CHUNK hàng -> bộ nhớ tạm chỉ bằng 1 khối, không bằng cả ma trận.
+    Trả về (ndarray float64 - null thành nan, vị trí bắt đầu, vị trí kết thúc) hoặc None nếu không tìm thấy.
+    """
+    quoted = b'"' + key.encode() + b'"'
+    name = content.find(quoted)
+    while name >= 0:
+        # Chỉ nhận khóa của object ("distances": [...]), không nhận chuỗi giá trị (ví dụ "name": "distances")
+        colon = name + len(quoted)
+        while content[colon:colon + 1] in (b' ', b'\t', b'\r', b'\n'):
+            colon += 1
+        if content[colon:colon + 1] == b':':
+            break
+        name = content.find(quoted, colon)
+    if name < 0:
+        return None
+    start = content.find(b'[', colon)
+    if start < 0 or content[colon + 1:start].strip():
+        return None  # Giá trị không phải mảng (ví dụ null) -> để json xử lý
+    closing = _MATRIX_END.search(content, start)  # Ma trận chỉ chứa số -> "]]" đầu tiên là điểm kết thúc
+    if closing is None:
+        return None
+    end = closing.start()
+    n_rows = content.count(b'[', start + 1, end)
+    first_row = _decode_rows(content[start + 1:content.find(b']', start) + 1])
+    matrix = np.empty((n_rows, first_row.size), dtype=np.float64)
+    flat = matrix.reshape(-1)
+
+    row = 0
+    position = start + 1  # Vị trí dấu '[' của hàng tiếp theo
+    while row < n_rows:
+        rows = min(ROWS_PER_CHUNK, n_rows - row)
+        chunk_end = position
+        for _ in range(rows):
+            chunk_end = content.find(b']', chunk_end) + 1
+        values = _decode_rows(content[position:chunk_end])
+        if values.size != rows * first_row.size:
+            raise ValueError(f"Ma trận '{key}' không vuông/không đều")
+        flat[row * first_row.size:(row + rows) * first_row.size] = values
+        row += rows
+        position = content.find(b'[', chunk_end)
+    return matrix, start, closing.end()
+
+
+def parse_table_response(content):
+    """
+    Parse bytes của response 'table'. Trả về dict như json.loads, nhưng "distances"/"durations"
+    là ndarray float64 (null -> nan). Gặp định dạng lạ thì dùng json.loads cho chắc chắn.
+    """
+    if np is None:
+        return json.loads(content)
+    try:
+        matrices = {}
+        for key in MATRIX_KEYS:
+            decoded = _decode_matrix(content, key)
+            if decoded is not None:
+                matrices[key] = decoded
+        # Phần còn lại (thay 2 ma trận bằng null) nhỏ -> parse bằng json
+        pieces, position = [], 0
+        for _, start, end in sorted(matrices.values(), key=lambda item: item[1]):
+            pieces += [content[position:start], b'null']
+            position = end
+        pieces.append(content[position:])
+        data = json.loads(b''.join(pieces))
+        for key, (values, _, _) in matrices.items():
+            # Kích thước phải khớp số điểm nguồn/đích (phát hiện giải mã nhầm chỗ -> dùng json.loads)
+            shape = (len(data.get("sources") or values), len(data.get("destinations") or values.T))
+            if values.shape != shape:
+                raise ValueError(f"Ma trận '{key}' có kích thước {values.shape}, cần {shape}")
+            data[key] = values
+        return data
+    except ValueError:
+        return json.loads(content)
+
+
+def to_matrix(values, divisor):
+    """
+    Chuyển ma trận OSRM (ndarray từ parse_table_response hoặc list 2D từ cassette) sang đơn vị mới
+    (chia cho divisor) và thay null/nan bằng inf (không có đường đi).
+    """
+    if np is None:
+        return [[(value / divisor) if value is not None else float('inf') for value in row] for row in values]
+    # ndarray của parse_table_response: dùng luôn, sửa tại chỗ; list (cassette): tạo mảng mới, None -> nan
+    matrix = np.asarray(values, dtype=np.float64)
+    np.divide(matrix, divisor, out=matrix)
+    matrix[np.isnan(matrix)] = np.inf
+    return MatrixRows(matrix)
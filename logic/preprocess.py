@@ -0,0 +1,169 @@
+# logic/preprocess.py
+#
+# Tiền xử lý bài toán trước khi gọi OSRM và chạy Solver:
+#
+#   1. Gộp tọa độ trùng / gần trùng (collapse_coordinates): các điểm cách nhau <= MERGE_RADIUS_M (mặc định 25 m,
+#      biến môi trường PREPROCESS_MERGE_RADIUS_M) dùng chung MỘT tọa độ khi gọi OSRM 'table'
+#      (ví dụ Chợ Tân Định và Nhà thờ Tân Định cùng tọa độ) -> ma trận OSRM nhỏ hơn.
+#      expand_matrix() trải ma trận nhỏ ra lại theo index của từng địa điểm, nên phần còn lại của BLL
+#      (index điểm, service_times, time_windows, hậu xử lý) không đổi.
+#   2. Bỏ điểm bị trội trong cụm (prune_dominated): điểm v bị bỏ nếu có điểm u CÙNG CỤM mà mọi cạnh
+#      đi vào/đi ra u tới các cụm khác đều không đắt hơn của v -> luôn thay v bằng u được mà tour không tệ hơn.
+#      Pha Xây dựng, nội cụm, Or-opt... chỉ duyệt các điểm còn lại (ít ứng viên hơn).
+#      - Chế độ tĩnh: so sánh trên ma trận chi phí đang tối ưu (khoảng cách hoặc thời gian).
+#      - Chế độ có lịch trình (giờ xuất phát / giờ mở cửa): chỉ bỏ điểm TƯƠNG ĐƯƠNG hoàn toàn (cùng cạnh trên
+#        cả 2 ma trận, cùng thời gian tham quan và giờ mở cửa), vì đến sớm hơn chưa chắc tốt hơn khi có khung giờ.
+#
+# Solver vẫn chạy trên index gốc của từng địa điểm; điểm bị bỏ chỉ không còn trong định nghĩa cụm,
+# nên lộ trình trả về là index (-> id địa điểm) gốc, không cần ánh xạ ngược.
+import math
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from osrm_table import MatrixRows
+
+# Bán kính gộp tọa độ (mét); 0 -> chỉ gộp tọa độ trùng khít
+MERGE_RADIUS_M = float(os.environ.get("PREPROCESS_MERGE_RADIUS_M", "25"))
+# Số mét trên 1 độ vĩ độ (xấp xỉ phẳng, đủ chính xác ở khoảng cách vài chục mét)
+METERS_PER_DEGREE = 111320.0
+
+
+def collapse_coordinates(coords, radius_m=MERGE_RADIUS_M):
+    """
+    Gộp các tọa độ (lat, lon) cách nhau <= radius_m vào tọa độ đại diện đầu tiên gặp.
+
+    Trả về (unique_coords, node_of):
+    - unique_coords: các tọa độ đại diện (gửi cho OSRM)
+    - node_of[i]   : vị trí trong unique_coords của tọa độ coords[i]
+    Chia lưới ô cạnh radius_m (mét) -> mỗi điểm chỉ so với các đại diện trong 3 x 3 ô lân cận.
+    1 độ kinh độ chỉ dài METERS_PER_DEGREE * cos(vĩ độ) mét, nên ô theo kinh độ rộng cell_size / cos(vĩ độ)
+    với vĩ độ xa xích đạo nhất của tập điểm (ô không bao giờ hẹp hơn radius_m) -> không bỏ sót cặp điểm nào.
+    """
+    coords = list(coords)
+    unique_coords = []
+    node_of = []
+    cell_size = max(radius_m, 1.0) / METERS_PER_DEGREE  # Cạnh ô lưới theo vĩ độ (độ)
+    max_lat = max((abs(lat) for lat, _ in coords), default=0.0)
+    cell_lon = cell_size / max(math.cos(math.radians(max_lat)), 1e-6)  # Cạnh ô lưới theo kinh độ (độ)
+    grid = {}  # (ô vĩ độ, ô kinh độ) -> [vị trí đại diện, ...]
+
+    for lat, lon in coords:
+        row, col = int(math.floor(lat / cell_size)), int(math.floor(lon / cell_lon))
+        scale = math.cos(math.radians(lat))
+        node = None
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                for candidate in grid.get((row + dr, col + dc), ()):
+                    c_lat, c_lon = unique_coords[candidate]
+                    dy = (lat - c_lat) * METERS_PER_DEGREE
+                    dx = (lon - c_lon) * METERS_PER_DEGREE * scale
+                    if dx * dx + dy * dy <= radius_m * radius_m:
+                        node = candidate
+                        break
+                if node is not None:
+                    break
+            if node is not None:
+                break
+        if node is None:
+            node = len(unique_coords)
+            unique_coords.append((lat, lon))
+            grid.setdefault((row, col), []).append(node)
+        node_of.append(node)
+    return unique_coords, node_of
+
+
+def expand_matrix(matrix, node_of):
+    """Ma trận theo tọa độ đại diện (m x m) -> ma trận theo từng điểm (n x n): ô [i][j] = matrix[node_of[i]][node_of[j]]."""
+    if np is not None and isinstance(matrix, MatrixRows):
+        index = np.asarray(node_of, dtype=np.intp)
+        return MatrixRows(matrix.array[np.ix_(index, index)])
+    return [[row[j] for j in node_of] for row in (matrix[i] for i in node_of)]
+
+
+def co_located_points(pruned, node_of, point_ids):
+    """
+    Điểm bị bỏ (pruned) có CÙNG tọa độ OSRM với điểm giữ lại thay cho nó (ví dụ Chợ Tân Định / Nhà thờ Tân Định).
+    Trả về { index giữ lại: [point_ids[index bị bỏ], ...] } để báo kèm chặng đi tới điểm giữ lại.
+    """
+    co_located = {}
+    for index, kept_index in pruned.items():
+        if node_of[index] == node_of[kept_index]:
+            co_located.setdefault(kept_index, []).append(point_ids[index])
+    return co_located
+
+
+def _dominates(cost, u, v, outside):
+    """Mọi cạnh giữa u và các điểm ngoài cụm (outside) đều không đắt hơn cạnh tương ứng của v."""
+    if np is not None:
+        return bool(np.all(cost[outside, u] <= cost[outside, v]) and np.all(cost[u, outside] <= cost[v, outside]))
+    return all(cost[x][u] <= cost[x][v] and cost[u][x] <= cost[v][x] for x in outside)
+
+
+def _equivalent(costs, u, v, outside, service_times, time_windows):
+    """u và v hoán đổi được hoàn toàn: cùng cạnh trên mọi ma trận, cùng thời gian tham quan và giờ mở cửa."""
+    if (service_times or {}).get(u) != (service_times or {}).get(v):
+        return False
+    if (time_windows or {}).get(u) != (time_windows or {}).get(v):
+        return False
+    return all(_dominates(cost, u, v, outside) and _dominates(cost, v, u, outside) for cost in costs)
+
+
+def prune_dominated(clusters, cost_matrix, duration_matrix=None, scheduled=False,
+                    service_times=None, time_windows=None):
+    """
+    Bỏ các điểm bị trội trong từng cụm (xem đầu file).
+
+    - clusters       : { cluster_id: [index, ...] } (gồm cả START/END)
+    - cost_matrix    : ma trận chi phí đang tối ưu (chế độ tĩnh)
+    - duration_matrix, scheduled, service_times, time_windows: chế độ có lịch trình -> chỉ bỏ điểm tương đương
+      trên cả cost_matrix và duration_matrix.
+
+    Trả về (clusters mới, pruned) với pruned = { index bị bỏ: index giữ lại thay cho nó }.
+    Điểm tương đương nhau: giữ điểm đứng trước trong cụm.
+    """
+    costs = [cost_matrix] + ([duration_matrix] if scheduled and duration_matrix is not None else [])
+    if np is not None:
+        costs = [np.asarray(cost, dtype=np.float64) for cost in costs]
+
+    pruned = {}
+    result = {}
+    for cluster_id, members in clusters.items():
+        if len(members) < 2:
+            result[cluster_id] = list(members)
+            continue
+        member_set = set(members)
+        outside = [index for other in clusters.values() for index in other if index not in member_set]
+        if np is not None:
+            outside = np.asarray(outside, dtype=np.intp)
+
+        kept = []
+        for position, v in enumerate(members):
+            for other_position, u in enumerate(members):
+                if u == v or u in pruned:
+                    continue
+                if scheduled:
+                    # Tương đương: chỉ điểm đứng trước được giữ lại
+                    dominated = other_position < position and _equivalent(costs, u, v, outside,
+                                                                          service_times, time_windows)
+                else:
+                    # u trội hơn v; nếu v cũng trội hơn u (bằng nhau) thì giữ điểm đứng trước
+                    dominated = _dominates(costs[0], u, v, outside) and (
+                        other_position < position or not _dominates(costs[0], v, u, outside))
+                if dominated:
+                    pruned[v] = u
+                    break
+            else:
+                kept.append(v)
+        result[cluster_id] = kept
+
+    # Điểm giữ lại thay cho v có thể đã bị bỏ sau đó (dominance bắc cầu) -> trỏ thẳng tới điểm còn lại
+    for v in pruned:
+        u = pruned[v]
+        while u in pruned:
+            u = pruned[u]
+        pruned[v] = u
+    return result, pruned
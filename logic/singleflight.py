@@ -0,0 +1,169 @@
+# logic/singleflight.py
+#
+# Gộp các lời gọi GIỐNG NHAU đang chạy đồng thời thành MỘT (single-flight / request coalescing).
+#
+# Khi cả đoàn khách mở app cùng lúc, nhiều request /solve_gtsp song song gọi cùng một ma trận 'table'
+# và cùng các chặng 'route' tới OSRM. Với single-flight:
+#   - Trong 1 tiến trình: thread đầu tiên với một khóa (key) là "leader" và thực sự gọi OSRM;
+#     các thread đến sau với cùng khóa chỉ chờ rồi dùng chung kết quả (hoặc lỗi) của leader.
+#   - Giữa các worker (tiến trình) gunicorn - khi có thư mục lock_dir: leader của mỗi tiến trình
+#     giữ khóa file (flock) theo khóa; leader ghi kết quả ra file trước khi nhả khóa.
+#     Tiến trình chờ khóa xong mà thấy file kết quả được ghi SAU lúc nó bắt đầu chờ -> đọc file,
+#     không gọi OSRM nữa. Kết quả cũ hơn thì gọi lại như thường (đây là gộp lời gọi, không phải cache).
+#     Định dạng file do bên gọi chọn (codec), KHÔNG dùng pickle: đọc pickle từ thư mục mà người khác ghi được
+#     là thực thi mã tùy ý. Thư mục phải thuộc user hiện tại và chỉ user đó truy cập được (0700), nếu không
+#     thì chỉ gộp giữa các thread.
+#
+# Không có fcntl (Windows) -> chỉ gộp giữa các thread.
+import hashlib
+import os
+import stat
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# File kết quả được ghi trong khoảng này trước lúc bắt đầu chờ vẫn được dùng chung
+# (lời gọi đến ngay sau khi leader vừa ghi xong, trước khi leader kịp nhả khóa)
+SHARE_GRACE_SECONDS = 1.0
+# Dọn file kết quả cũ hơn STALE_SECONDS, tối đa 1 lần mỗi SWEEP_INTERVAL giây trong mỗi tiến trình
+STALE_SECONDS = 60.0
+SWEEP_INTERVAL = 30.0
+
+
+class _Call:
+    """Một lời gọi đang chạy: các thread chờ trên event, rồi đọc result / error."""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def private_dir(path):
+    """
+    Tạo (nếu chưa có) thư mục path với quyền 0700 và kiểm tra nó an toàn để dùng chung giữa các worker:
+    là thư mục thật (không phải symlink), thuộc user hiện tại, user khác không đọc/ghi được.
+    Trả về True nếu an toàn.
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError as e:
+        print(f"Cảnh báo: không tạo được thư mục single-flight {path}: {e}")
+        return False
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        print(f"Cảnh báo: thư mục single-flight {path} không thuộc user hiện tại hoặc user khác truy cập được "
+              f"(cần quyền 0700) - chỉ gộp giữa các thread.")
+        return False
+    return True
+
+
+class SingleFlight:
+    """
+    Gộp các lời gọi đồng thời có cùng khóa.
+
+    do(key, fn, shareable, codec) trả về (kết quả, nguồn) với nguồn là:
+      - 'leader' : lời gọi này đã tự chạy fn()
+      - 'thread' : dùng chung kết quả của thread khác trong cùng tiến trình
+      - 'process': đọc kết quả do tiến trình (worker) khác ghi ra lock_dir
+    shareable(kết quả): có ghi kết quả ra file cho tiến trình khác hay không
+    (ví dụ: KHÔNG chia sẻ ma trận dự phòng khi OSRM lỗi).
+    codec = (dump(kết quả, file nhị phân), load(file nhị phân) -> kết quả): định dạng file kết quả
+    (JSON, np.save...). Không có codec -> chỉ gộp giữa các thread.
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if lock_dir and fcntl is None:
+            print("Cảnh báo: không có fcntl (Windows) - single-flight chỉ gộp giữa các thread.")
+        if self.lock_dir and not private_dir(self.lock_dir):
+            self.lock_dir = None
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._last_sweep = 0.0
+
+    def do(self, key, fn, shareable=None, codec=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, 'thread'
+
+        try:
+            if self.lock_dir and codec is not None:
+                call.result, source = self._do_across_processes(key, fn, shareable, codec)
+            else:
+                call.result, source = fn(), 'leader'
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Bỏ khỏi bảng TRƯỚC khi đánh thức: lời gọi đến sau lúc này sẽ là lời gọi mới
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, source
+
+    def _do_across_processes(self, key, fn, shareable, codec):
+        """Leader của tiến trình: giữ flock theo khóa, dùng file kết quả mới hoặc tự gọi fn() rồi ghi file."""
+        dump, load = codec
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f"{name}.lock")
+        result_path = os.path.join(self.lock_dir, f"{name}.result")
+        started = time.time()
+        with open(lock_path, 'a') as lock_file:
+            # Chờ tiến trình khác (nếu đang gọi cùng khóa) xong việc; lời gọi OSRM có timeout nên không chờ mãi
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    if os.stat(result_path).st_mtime >= started - SHARE_GRACE_SECONDS:
+                        with open(result_path, 'rb') as f:
+                            return load(f), 'process'
+                except Exception:
+                    pass  # Chưa có file / file đã bị dọn / hỏng (lỗi tùy codec) -> tự gọi
+
+                result = fn()
+                if shareable is None or shareable(result):
+                    # Ghi file tạm rồi đổi tên: tiến trình khác không bao giờ đọc phải file ghi dở
+                    tmp_path = f"{result_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    try:
+                        with open(tmp_path, 'wb') as f:
+                            dump(result, f)
+                        os.replace(tmp_path, result_path)
+                    except OSError as e:
+                        print(f"Single-flight: không ghi được {result_path}: {e}")
+                return result, 'leader'
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._sweep()
+
+    def _sweep(self):
+        """Xóa các file kết quả cũ (ma trận lớn có thể vài MB). File .lock rỗng được giữ lại."""
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return
+            self._last_sweep = now
+        try:
+            with os.scandir(self.lock_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(('.result', '.tmp')):
+                        try:
+                            if now - entry.stat().st_mtime > STALE_SECONDS:
+                                os.remove(entry.path)
+                        except OSError:
+                            pass  # Tiến trình khác vừa xóa / thay file
+        except OSError:
+            pass
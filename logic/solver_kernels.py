@@ -0,0 +1,157 @@
+# logic/solver_kernels.py
+#
+# (Tùy chọn) Kernel biên dịch (Numba) cho Pha Cải tiến của GTSPGraspSolver ở chế độ TĨNH
+# (không có lịch trình): 2-opt, Or-opt, đổi chỗ cụm và cải tiến nội cụm.
+#
+# Các vòng lặp này chỉ là phép toán số nguyên/số thực trên ma trận chi phí, nên Python thuần rất chậm
+# (mỗi phép truy cập tour[i] / matrix[a][b] là một lời gọi đối tượng). Numba biên dịch chúng thành mã máy:
+#   - Cùng thuật toán, cùng thứ tự duyệt và cùng thứ tự phép cộng/trừ số thực (không dùng fastmath)
+#     -> kết quả GIỐNG HỆT bản Python với cùng seed (kiểm tra bằng benchmark_kernels.py).
+#   - nogil=True: nhả GIL khi chạy -> các thread của worker gunicorn (gthread) chạy song song được.
+#   - Biên dịch sẵn (có chữ ký kiểu) khi import và lưu cache trên đĩa (cache=True), nên với
+#     gunicorn preload_app=True chỉ tiến trình master biên dịch một lần.
+#
+# Không có Numba (hoặc SOLVER_KERNELS=0) -> ENABLED = False, Solver dùng vòng lặp Python như cũ.
+# Chế độ có lịch trình (khung giờ / giờ mở cửa) luôn dùng bản Python.
+import os
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    njit = None
+
+ENABLED = njit is not None and os.environ.get("SOLVER_KERNELS", "1") != "0"
+
+
+def two_opt(tour, cost):
+    """
+    2-opt trên tour (mảng int32, sửa trực tiếp) với ma trận chi phí cost (float64 n x n).
+    Giống GTSPGraspSolver.local_search_2opt: chênh lệch chính xác cho ma trận bất đối xứng (tổng tiền tố
+    xuôi/ngược), cải tiến đầu tiên (first improvement), rồi duyệt lại từ đầu.
+    """
+    n = tour.shape[0]
+    forward = np.zeros(n)
+    backward = np.zeros(n)
+    improved = True
+    while improved:
+        improved = False
+        for k in range(1, n):
+            forward[k] = forward[k - 1] + cost[tour[k - 1], tour[k]]
+            backward[k] = backward[k - 1] + cost[tour[k], tour[k - 1]]
+        for i in range(1, n - 2):
+            for j in range(i + 1, n - 1):
+                a, b, c, d = tour[i - 1], tour[i], tour[j], tour[j + 1]
+                cost_before = cost[a, b] + cost[c, d] + (forward[j] - forward[i])
+                cost_after = cost[a, c] + cost[b, d] + (backward[j] - backward[i])
+                if cost_after - cost_before < -1e-9:
+                    # Đảo ngược đoạn [i, j] ngay trên tour
+                    lo, hi = i, j
+                    while lo < hi:
+                        tour[lo], tour[hi] = tour[hi], tour[lo]
+                        lo += 1
+                        hi -= 1
+                    improved = True
+                    break
+            if improved:
+                break
+
+
+def or_opt(tour, cost, max_segment):
+    """Or-opt (giống GTSPGraspSolver.local_search_or_opt): chuyển đoạn 1..max_segment cụm, giữ chiều."""
+    n = tour.shape[0]
+    buffer = np.empty(n, dtype=np.int32)
+    improved = True
+    while improved:
+        improved = False
+        for length in range(1, max_segment + 1):
+            for i in range(1, n - length):
+                e = i + length - 1
+                a, first, last, b = tour[i - 1], tour[i], tour[e], tour[e + 1]
+                removed = cost[a, first] + cost[last, b] - cost[a, b]
+                for p in range(0, n - 1):
+                    if i - 1 <= p <= e:
+                        continue
+                    x, y = tour[p], tour[p + 1]
+                    if cost[x, first] + cost[last, y] - cost[x, y] - removed < -1e-9:
+                        if p < i:
+                            # Vị trí p+1..e: đoạn, rồi tour[p+1..i-1]
+                            lo, hi = p + 1, e + 1
+                            buffer[0:length] = tour[i:e + 1]
+                            buffer[length:hi - lo] = tour[p + 1:i]
+                        else:
+                            # Vị trí i..p: tour[e+1..p], rồi đoạn
+                            lo, hi = i, p + 1
+                            buffer[0:p - e] = tour[e + 1:p + 1]
+                            buffer[p - e:hi - lo] = tour[i:e + 1]
+                        tour[lo:hi] = buffer[0:hi - lo]
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+
+
+def cluster_swap(tour, cost):
+    """Đổi chỗ 2 cụm (giống GTSPGraspSolver.local_search_cluster_swap)."""
+    n = tour.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 2):
+            a, x, b = tour[i - 1], tour[i], tour[i + 1]
+            for j in range(i + 1, n - 1):
+                c, y, d = tour[j - 1], tour[j], tour[j + 1]
+                if j == i + 1:
+                    cost_before = cost[a, x] + cost[x, y] + cost[y, d]
+                    cost_after = cost[a, y] + cost[y, x] + cost[x, d]
+                else:
+                    cost_before = cost[a, x] + cost[x, b] + cost[c, y] + cost[y, d]
+                    cost_after = cost[a, y] + cost[y, b] + cost[c, x] + cost[x, d]
+                if cost_after - cost_before < -1e-9:
+                    tour[i], tour[j] = y, x
+                    improved = True
+                    break
+            if improved:
+                break
+
+
+def intra_cluster(tour, cost, node_cluster, member_start, members):
+    """
+    Cải tiến nội cụm trên tour (mảng int32, sửa trực tiếp).
+    Các điểm của cụm c nằm trong members[member_start[c]:member_start[c + 1]] (dạng CSR),
+    cùng thứ tự với GTSPGraspSolver.cluster_members[c].
+    """
+    n = tour.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            current_index = tour[i]
+            prev_index = tour[i - 1]
+            next_index = tour[i + 1]
+            cost_before = cost[prev_index, current_index] + cost[current_index, next_index]
+            best_new_index = current_index
+            c = node_cluster[current_index]
+            for k in range(member_start[c], member_start[c + 1]):
+                candidate_index = members[k]
+                if candidate_index == current_index:
+                    continue
+                cost_after = cost[prev_index, candidate_index] + cost[candidate_index, next_index]
+                if cost_after < cost_before - 1e-9:
+                    cost_before = cost_after
+                    best_new_index = candidate_index
+                    improved = True
+            if improved:
+                tour[i] = best_new_index
+                break
+
+
+if ENABLED:
+    # Chữ ký kiểu cố định -> biên dịch ngay khi import (không phải chờ ở request đầu tiên)
+    two_opt = njit("void(int32[:], float64[:, :])", cache=True, nogil=True)(two_opt)
+    or_opt = njit("void(int32[:], float64[:, :], int64)", cache=True, nogil=True)(or_opt)
+    cluster_swap = njit("void(int32[:], float64[:, :])", cache=True, nogil=True)(cluster_swap)
+    intra_cluster = njit("void(int32[:], float64[:, :], int32[:], int32[:], int32[:])",
+                         cache=True, nogil=True)(intra_cluster)
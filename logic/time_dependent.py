@@ -0,0 +1,193 @@
+# logic/time_dependent.py
+#
+# Mô hình chi phí phụ thuộc thời gian (time-dependent travel time).
+#
+# Giao thông TP.HCM lúc 17:00 khác hẳn lúc 10:00, nên một ma trận thời gian "tĩnh" duy nhất
+# cho cả ngày là không đủ. Module này lưu NHIỀU ma trận thời gian, mỗi ma trận ứng với một
+# khung giờ (time slice), và trả về thời gian di chuyển i -> j theo GIỜ KHỞI HÀNH.
+#
+# Lưu trữ gọn (compact): tất cả K ma trận n x n nằm liền nhau trong MỘT array('f') (float32),
+# thay vì K danh sách lồng nhau chứa các đối tượng float của Python (~24 byte/phần tử + con trỏ).
+# Ví dụ n = 1000, K = 9: ~36 MB thay vì vài trăm MB.
+#
+# Thời gian được tính bằng PHÚT kể từ 00:00 của ngày khởi hành (ví dụ 8:30 -> 510).
+# Giá trị >= 1440 (qua ngày hôm sau) được quy về khung giờ tương ứng trong ngày.
+#
+# Mô hình tốc độ theo khung giờ (Ichoua, Gendreau & Potvin, 2003): ma trận của khung k là thời gian đi i -> j
+# nếu CẢ chặng chạy với tốc độ của khung k. Chặng đi qua ranh giới khung giờ đi phần còn lại với tốc độ
+# của khung kế tiếp (không nhảy thời gian đi của cả chặng theo giờ khởi hành). Nhờ vậy mô hình thỏa FIFO:
+# khởi hành muộn hơn không bao giờ đến sớm hơn (ví dụ 08:59 lúc cao điểm không đến sau người đi lúc 09:00).
+from array import array
+from bisect import bisect_right
+
+try:
+    import numpy as np  # (Tùy chọn) Tạo nhanh các ma trận theo khung giờ
+except ImportError:
+    np = None
+
+MINUTES_PER_DAY = 24 * 60
+
+# Hệ số ùn tắc mặc định theo khung giờ cho TP.HCM (so với ma trận OSRM "đường thông thoáng").
+# Mỗi phần tử: (phút bắt đầu khung giờ, hệ số nhân thời gian di chuyển = 1 / hệ số tốc độ trong khung).
+# Khung giờ kéo dài đến khi khung kế tiếp bắt đầu; khung cuối kéo dài đến 24:00.
+HCMC_CONGESTION_PROFILE = (
+    (0,            0.85),  # 00:00 - 06:00  Đêm, đường vắng
+    (6 * 60,       1.20),  # 06:00 - 07:00  Bắt đầu đông
+    (7 * 60,       1.60),  # 07:00 - 09:00  Cao điểm sáng
+    (9 * 60,       1.15),  # 09:00 - 11:00
+    (11 * 60,      1.25),  # 11:00 - 13:00  Giờ trưa
+    (13 * 60,      1.10),  # 13:00 - 16:30
+    (16 * 60 + 30, 1.75),  # 16:30 - 19:00  Cao điểm chiều
+    (19 * 60,      1.25),  # 19:00 - 21:00
+    (21 * 60,      0.95),  # 21:00 - 24:00
+)
+
+
+def parse_clock(value):
+    """Chuyển chuỗi "HH:MM" thành số phút kể từ 00:00. Ví dụ: "08:30" -> 510."""
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Giờ không hợp lệ: {value!r}")
+    return hours * 60 + minutes
+
+
+def format_clock(minutes):
+    """Chuyển số phút thành chuỗi "HH:MM" (qua ngày thì cộng thêm "+1", "+2", ...)."""
+    total = int(round(minutes))
+    days, rest = divmod(total, MINUTES_PER_DAY)
+    text = f"{rest // 60:02d}:{rest % 60:02d}"
+    return text if days == 0 else f"{text} (+{days})"
+
+
+class TimeDependentDurations:
+    """
+    K ma trận thời gian di chuyển (phút), mỗi ma trận cho 1 khung giờ trong ngày.
+
+    Phần tử (khung k, điểm i, điểm j) nằm tại data[k * n * n + i * n + j].
+    """
+
+    def __init__(self, n_nodes, slice_starts, data):
+        """
+        Tham số:
+        - n_nodes: số điểm (kích thước mỗi ma trận n x n).
+        - slice_starts: danh sách phút bắt đầu của từng khung giờ, tăng dần, phần tử đầu là 0.
+        - data: array('f') độ dài K * n * n (K = len(slice_starts)).
+        """
+        slice_starts = list(slice_starts)
+        if not slice_starts or slice_starts[0] != 0 or slice_starts != sorted(set(slice_starts)):
+            raise ValueError("slice_starts phải tăng dần và bắt đầu từ 0")
+        if len(data) != len(slice_starts) * n_nodes * n_nodes:
+            raise ValueError(f"data phải có {len(slice_starts)} x {n_nodes} x {n_nodes} phần tử")
+
+        self.n = n_nodes
+        self.nn = n_nodes * n_nodes
+        self.slice_starts = slice_starts
+        self.slice_ends = slice_starts[1:] + [MINUTES_PER_DAY]
+        self.n_slices = len(slice_starts)
+        self.data = data
+        self._np_slices = None  # data dạng mảng NumPy (K, n, n), tạo khi cần - xem travel_times
+
+    @classmethod
+    def from_base_matrix(cls, duration_matrix, congestion_profile=HCMC_CONGESTION_PROFILE):
+        """
+        Tạo các ma trận theo khung giờ bằng cách nhân ma trận gốc (OSRM) với hệ số ùn tắc của từng khung.
+        """
+        n = len(duration_matrix)
+        data = array('f')
+        if np is not None:
+            # Nhân cả ma trận trong NumPy (float64, rồi làm tròn về float32 như array('f'))
+            base = np.asarray(duration_matrix, dtype=np.float64)
+            for _, factor in congestion_profile:
+                data.frombytes((base * factor).astype(np.float32).tobytes())
+        else:
+            flat = [value for row in duration_matrix for value in row]
+            for _, factor in congestion_profile:
+                data.extend([value * factor for value in flat])
+        return cls(n, [start for start, _ in congestion_profile], data)
+
+    @classmethod
+    def from_slice_matrices(cls, slice_starts, matrices):
+        """
+        Tạo từ các ma trận đo thực tế cho từng khung giờ (ví dụ: dữ liệu tốc độ lịch sử,
+        hoặc nhiều bộ dữ liệu OSRM khác nhau). matrices[k] là ma trận n x n của khung k.
+        """
+        n = len(matrices[0])
+        data = array('f')
+        for matrix in matrices:
+            for row in matrix:
+                data.extend(row)
+        return cls(n, slice_starts, data)
+
+    def slice_index(self, t):
+        """Chỉ số khung giờ chứa thời điểm t (phút)."""
+        return bisect_right(self.slice_starts, t % MINUTES_PER_DAY) - 1
+
+    def slice_bounds(self, t):
+        """(bắt đầu, kết thúc) của khung giờ chứa t, tính theo cùng "ngày" với t."""
+        day_offset = t - t % MINUTES_PER_DAY
+        k = self.slice_index(t)
+        return day_offset + self.slice_starts[k], day_offset + self.slice_ends[k]
+
+    def travel_time(self, i, j, t):
+        """
+        Thời gian di chuyển (phút) từ i đến j nếu KHỞI HÀNH lúc t.
+        Chặng nằm gọn trong khung giờ của t -> đúng giá trị của ma trận khung đó; chặng vượt qua ranh giới khung
+        -> mỗi khung đi được (thời gian trong khung / giá trị của khung) quãng đường (xem đầu file).
+        """
+        k = self.slice_index(t)
+        offset = i * self.n + j
+        data = self.data
+        end = t - t % MINUTES_PER_DAY + self.slice_ends[k]
+        remaining = 1.0  # Phần quãng đường chưa đi
+        elapsed = 0.0
+        while True:
+            duration = data[k * self.nn + offset]
+            left = end - t
+            if remaining * duration <= left:
+                return elapsed + remaining * duration
+            if duration == float('inf'):
+                return duration  # Không có đường đi
+            remaining -= left / duration
+            elapsed += left
+            t = end
+            k = k + 1 if k + 1 < self.n_slices else 0
+            end = t + self.slice_ends[k] - self.slice_starts[k]
+
+    def travel_times(self, i, nodes, t):
+        """
+        travel_time(i, j, t) cho mọi j trong nodes (mảng index NumPy) -> mảng float64.
+        Cùng các phép tính số thực như travel_time (kết quả giống hệt), chỉ lặp thêm qua các khung giờ
+        khi có chặng vượt ranh giới khung.
+        """
+        if self._np_slices is None:
+            # Xem array('f') như mảng (K, n, n) - không copy dữ liệu
+            self._np_slices = np.frombuffer(self.data, dtype=np.float32).reshape(self.n_slices, self.n, self.n)
+        k = self.slice_index(t)
+        end = t - t % MINUTES_PER_DAY + self.slice_ends[k]
+        result = self._np_slices[k, i, nodes].astype(np.float64)
+        pending = np.flatnonzero(result > end - t)
+        if pending.size == 0:
+            return result
+        pending = pending[np.isfinite(result[pending])]  # inf: không có đường đi
+        remaining = 1.0 - (end - t) / result[pending]
+        elapsed = end - t
+        while pending.size:
+            t = end
+            k = k + 1 if k + 1 < self.n_slices else 0
+            end = t + self.slice_ends[k] - self.slice_starts[k]
+            duration = self._np_slices[k, i, nodes[pending]].astype(np.float64)
+            left = end - t
+            done = remaining * duration <= left
+            result[pending[done]] = elapsed + remaining[done] * duration[done]
+            keep = ~done & np.isfinite(duration)
+            result[pending[~done & ~keep]] = np.inf
+            remaining = remaining[keep] - left / duration[keep]
+            pending = pending[keep]
+            elapsed += left
+        return result
+
+    def slice_matrix(self, k):
+        """Ma trận (list 2D) của khung giờ k - dùng cho hiển thị/kiểm tra, không dùng trong vòng lặp nóng."""
+        base = k * self.nn
+        return [list(self.data[base + i * self.n: base + (i + 1) * self.n]) for i in range(self.n)]
@@ -0,0 +1,211 @@
+# logic/vrp_split.py
+#
+# Chia lộ trình cho NHIỀU NGÀY hoặc NHIỀU XE (clustered VRP) theo hướng "route-first, cluster-second":
+#
+#   1. Giải GTSP như bình thường -> 1 "tour khổng lồ" (giant tour) START -> ... -> END qua mọi cụm.
+#   2. Split (Prins, 2004): chia dãy điểm của giant tour thành tối đa K đoạn liên tiếp bằng quy hoạch
+#      động trên đồ thị có hướng không chu trình. Mỗi đoạn là 1 lộ trình START -> đoạn -> END
+#      (mỗi ngày xuất phát từ START lúc departure_time / mỗi xe xuất phát cùng lúc).
+#        - Có giới hạn thời lượng mỗi lộ trình: tối thiểu TỔNG chi phí, mọi lộ trình <= giới hạn.
+#        - Không có giới hạn: dùng đúng K lộ trình, tối thiểu lộ trình DÀI NHẤT (chia đều các ngày).
+#   3. Mỗi lộ trình là một bài toán GTSP nhỏ trên đúng các cụm được chia cho nó -> giải lại SONG SONG
+#      (mỗi lộ trình 1 tiến trình, vì Solver là tác vụ CPU-bound bị GIL giới hạn) để chọn lại thứ tự
+#      và điểm đại diện. Giữ kết quả tốt hơn giữa đoạn gốc và lời giải mới (nếu vẫn thỏa giới hạn).
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from gtsp_solver import GTSPGraspSolver
+
+# Pool tiến trình dùng chung cho mọi request của 1 worker (tạo khi cần, xem _get_route_pool)
+_route_pool = None
+
+
+def _get_route_pool():
+    """
+    Pool tiến trình để giải lại các lộ trình song song.
+    Dùng 'spawn' (không fork) vì worker gunicorn (gthread) đang có nhiều thread.
+    Số tiến trình: biến môi trường VRP_WORKERS (mặc định = số CPU / GTSP_WORKERS).
+    Mỗi worker gunicorn có pool RIÊNG, nên tổng số tiến trình Solver = số worker x VRP_WORKERS;
+    mặc định chia đều số CPU cho các worker để không tranh nhau CPU (gunicorn.conf.py đặt sẵn giá trị này).
+    """
+    global _route_pool
+    if _route_pool is None:
+        default = max(1, (os.cpu_count() or 1) // int(os.environ.get("GTSP_WORKERS", "1")))
+        max_workers = int(os.environ.get("VRP_WORKERS", default))
+        _route_pool = ProcessPoolExecutor(max_workers=max_workers,
+                                          mp_context=multiprocessing.get_context("spawn"))
+    return _route_pool
+
+
+def shutdown_route_pool():
+    """Đóng pool tiến trình (gọi khi worker tắt)."""
+    global _route_pool
+    if _route_pool is not None:
+        _route_pool.shutdown(wait=False, cancel_futures=True)
+        _route_pool = None
+
+
+def route_cost_and_duration(solver, nodes):
+    """
+    Chi phí (theo optimize_for, gồm mức phạt trễ giờ mở cửa) và thời lượng (phút, gồm thời gian
+    tham quan & chờ) của lộ trình START -> nodes -> END.
+    """
+    if not nodes:
+        departure = solver.departure_time
+        finish = departure + solver.travel_time(solver.start_index, solver.end_index, departure)
+        base = finish - departure if solver.optimize_for == 'time' else \
+            solver.distance_matrix[solver.start_index][solver.end_index]
+        return base, finish - departure
+    costs, durations = _segment_table(solver, nodes, first_only=True)
+    last = len(nodes) - 1
+    return costs[0, last], durations[0, last]
+
+
+def _segment_table(solver, sequence, first_only=False):
+    """
+    Chi phí & thời lượng của MỌI đoạn sequence[i..j] khi chạy thành 1 lộ trình riêng.
+    Với mỗi i, mô phỏng tăng dần j (mỗi bước O(1)) -> tổng O(m^2) thay vì O(m^3).
+    Trả về 2 dict {(i, j): giá trị}. first_only=True: chỉ tính các đoạn bắt đầu từ i = 0.
+    """
+    start, end = solver.start_index, solver.end_index
+    dm = solver.distance_matrix
+    service, earliest, latest = solver.service_times, solver.earliest_start, solver.latest_start
+    by_time = solver.optimize_for == 'time'
+    departure = solver.departure_time
+    costs, durations = {}, {}
+
+    for i in range(1 if first_only else len(sequence)):
+        t = departure  # Thời điểm rời điểm cuối cùng của đoạn
+        dist = late = 0.0
+        prev = start
+        for j in range(i, len(sequence)):
+            node = sequence[j]
+            t += solver.travel_time(prev, node, t)
+            dist += dm[prev][node]
+            s = max(t, earliest[node])
+            if s > latest[node]:
+                late += s - latest[node]
+            t = s + service[node]
+            prev = node
+
+            # Đóng lộ trình: đi từ điểm cuối của đoạn về END
+            finish = t + solver.travel_time(node, end, t)
+            base = finish - departure if by_time else dist + dm[node][end]
+            costs[i, j] = base + solver.LATENESS_PENALTY * late
+            durations[i, j] = finish - departure
+    return costs, durations
+
+
+def split_giant_tour(solver, giant_tour, num_routes, max_route_duration=None):
+    """
+    Chia giant tour (START -> ... -> END) thành tối đa num_routes lộ trình.
+    Trả về list các dãy điểm (không gồm START/END), mỗi dãy là 1 lộ trình.
+    Raise ValueError nếu không thể chia thỏa max_route_duration với num_routes lộ trình.
+    """
+    sequence = list(giant_tour[1:-1])
+    m = len(sequence)
+    if m == 0:
+        return [[]]
+    num_routes = max(1, min(num_routes, m))
+    costs, durations = _segment_table(solver, sequence)
+
+    inf = float('inf')
+    # best[k][j]: giá trị tốt nhất khi k lộ trình phủ đúng j điểm đầu tiên; parent[k][j]: điểm bắt đầu đoạn cuối
+    best = [[inf] * (m + 1) for _ in range(num_routes + 1)]
+    parent = [[-1] * (m + 1) for _ in range(num_routes + 1)]
+    best[0][0] = 0.0
+
+    for k in range(1, num_routes + 1):
+        for j in range(1, m + 1):
+            for i in range(k - 1, j):
+                if best[k - 1][i] == inf:
+                    continue
+                if max_route_duration is not None:
+                    # Split Prins: tối thiểu tổng chi phí, mỗi lộ trình không vượt giới hạn
+                    if durations[i, j - 1] > max_route_duration + 1e-9:
+                        continue
+                    value = best[k - 1][i] + costs[i, j - 1]
+                else:
+                    # Chia đều: tối thiểu thời lượng của lộ trình dài nhất
+                    value = max(best[k - 1][i], durations[i, j - 1])
+                if value < best[k][j] - 1e-9:
+                    best[k][j] = value
+                    parent[k][j] = i
+
+    if max_route_duration is not None:
+        # Được dùng ÍT hơn num_routes lộ trình nếu rẻ hơn
+        used = min(range(1, num_routes + 1), key=lambda k: best[k][m])
+    else:
+        used = num_routes
+    if best[used][m] == inf:
+        raise ValueError(f"Không thể chia {m} điểm thành {num_routes} lộ trình "
+                         f"với thời lượng tối đa {max_route_duration} phút mỗi lộ trình")
+
+    routes = []
+    j = m
+    for k in range(used, 0, -1):
+        i = parent[k][j]
+        routes.append(sequence[i:j])
+        j = i
+    routes.reverse()
+    return routes
+
+
+def _solve_route(solver_kwargs, max_iterations, target_gap=None):
+    """Giải GTSP cho 1 lộ trình (chạy trong tiến trình con)."""
+    solver = GTSPGraspSolver(**solver_kwargs)
+    return solver.solve(max_iterations=max_iterations, target_gap=target_gap)
+
+
+def solve_multi_route(solver, giant_tour, num_routes, max_route_duration=None,
+                      solver_kwargs=None, max_iterations=100, target_gap=None):
+    """
+    Chia giant tour thành nhiều lộ trình rồi giải lại từng lộ trình song song.
+
+    Tham số:
+    - solver: GTSPGraspSolver đã dùng để tìm giant_tour.
+    - solver_kwargs: các tham số đã dùng để tạo solver (ma trận, giờ xuất phát, giờ mở cửa, ...);
+      mỗi lộ trình được giải bằng một solver mới với cùng tham số nhưng chỉ gồm các cụm của nó.
+    - target_gap: ngưỡng gap để dừng sớm khi giải lại từng lộ trình (xem GTSPGraspSolver.solve).
+    Trả về list [(tour, cost), ...], mỗi tour có dạng [START, ..., END].
+    """
+    routes = split_giant_tour(solver, giant_tour, num_routes, max_route_duration)
+
+    jobs = []
+    for nodes in routes:
+        route_clusters = {solver.cluster_id_of(node) for node in nodes}
+        kwargs = dict(solver_kwargs)
+        kwargs["clusters"] = {
+            cluster_id: solver.clusters[cluster_id]
+            for cluster_id in (*route_clusters,
+                               solver.cluster_id_of(solver.start_index),
+                               solver.cluster_id_of(solver.end_index))
+        }
+        jobs.append(kwargs)
+
+    resolved = None
+    if len(jobs) > 1:
+        try:
+            resolved = list(_get_route_pool().map(_solve_route, jobs, [max_iterations] * len(jobs),
+                                                  [target_gap] * len(jobs)))
+        except BrokenProcessPool as e:
+            # Tiến trình con chết (OOM, bị kill, ...): bỏ pool hỏng, giải tuần tự ngay trong request này
+            print(f"BLL: Pool tiến trình chia lộ trình bị lỗi ({e}), chuyển sang giải tuần tự.")
+            shutdown_route_pool()
+    if resolved is None:
+        resolved = [_solve_route(kwargs, max_iterations, target_gap) for kwargs in jobs]
+
+    results = []
+    for nodes, (new_tour, new_cost) in zip(routes, resolved):
+        split_tour = [solver.start_index, *nodes, solver.end_index]
+        split_cost, _ = route_cost_and_duration(solver, nodes)
+        # Lời giải mới chỉ được nhận nếu rẻ hơn VÀ vẫn không vượt thời lượng tối đa
+        if new_tour and new_cost < split_cost - 1e-9:
+            _, new_duration = route_cost_and_duration(solver, new_tour[1:-1])
+            if max_route_duration is None or new_duration <= max_route_duration + 1e-9:
+                results.append((new_tour, new_cost))
+                continue
+        results.append((split_tour, split_cost))
+    return results
@@ -0,0 +1,33 @@
+# logic/wsgi.py
+#
+# Điểm vào (entry point) WSGI cho chế độ production của Lớp Logic nghiệp vụ (BLL).
+# Dùng cùng với gunicorn.conf.py:
+#
+#   gunicorn -c logic/gunicorn.conf.py
+#
+# File này được import MỘT LẦN ở tiến trình master (preload_app = True).
+# Mọi thứ được nạp ở đây (CSDL địa điểm, thông tin cụm, mã Solver, ...) sẽ được
+# các worker dùng chung theo cơ chế copy-on-write sau khi fork.
+import gc
+
+import database                          # CSDL tĩnh: ALL_LANDMARKS, CLUSTERS
+import gtsp_solver                       # Nạp sẵn mã Solver (bytecode) ở master
+import app_logic                         # Tạo Flask app + CLUSTERS_INFO + LANDMARKS_BY_NAME
+
+# Đối tượng WSGI mà gunicorn sẽ phục vụ
+app = app_logic.app
+
+
+def preload():
+    """
+    Nạp sẵn (warm-up) dữ liệu dùng chung ở tiến trình master, trước khi fork worker.
+
+    Sau khi nạp xong, gọi gc.freeze() để chuyển toàn bộ đối tượng hiện có sang
+    "thế hệ vĩnh viễn" của bộ thu gom rác: GC của worker sẽ không duyệt (và không
+    ghi vào header) các đối tượng này nữa, nên các trang bộ nhớ dùng chung không
+    bị sao chép (copy-on-write) một cách vô ích.
+    """
+    print(f"BLL: Preload {len(database.ALL_LANDMARKS)} địa điểm, "
+          f"{len(app_logic.CLUSTERS_INFO)} cụm, solver={gtsp_solver.GTSPGraspSolver.__name__}")
+    gc.collect()
+    gc.freeze()
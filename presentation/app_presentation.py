@@ -1,9 +1,101 @@
 # presentation/app_presentation.py
-from flask import Flask, render_template  # Import Flask và hàm render_template
+from flask import Flask, render_template, request, Response, abort  # Import Flask và hàm render_template
+import os                                 # Đọc cấu hình từ biến môi trường
+import gzip                               # Nén sẵn các file tĩnh (gzip)
+import hashlib                            # Dấu vân tay (fingerprint) / ETag theo nội dung file
+import mimetypes                          # Content-Type theo đuôi file
+
+try:
+    import brotli                         # (Tùy chọn) Nén brotli - nhỏ hơn gzip ~15-20% với JS
+except ImportError:
+    brotli = None
 
 # Khởi tạo Flask App cho Lớp Trình diễn (Presentation Layer)
 # Đây là server chỉ có MỘT nhiệm vụ: phục vụ file HTML, CSS, JS cho trình duyệt.
-app = Flask(__name__)
+# static_folder=None: tắt route /static mặc định của Flask (gửi file gốc, không nén) - mọi file tĩnh đi qua
+# send_asset bên dưới (xem /assets và /static).
+app = Flask(__name__, static_folder=None)
+
+# --- File tĩnh nén sẵn + dấu vân tay (fingerprint) ---
+# Khi khởi động, mỗi file trong static/ được đọc, băm nội dung và nén sẵn (gzip, và brotli nếu có) MỘT LẦN.
+# Trang HTML tham chiếu file qua URL có mã băm (/assets/app.<băm>.js): nội dung đổi -> URL đổi,
+# nên trình duyệt được phép lưu file 1 năm (immutable) mà không bao giờ dùng nhầm bản cũ.
+STATIC_DIR = os.path.join(app.root_path, 'static')
+# Chỉ nén các định dạng văn bản (ảnh/phông đã được nén sẵn)
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Cache-Control cho file có dấu vân tay: 1 năm, không cần hỏi lại server
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+class Asset:
+    """Một file (hoặc trang HTML) đã đọc sẵn: nội dung gốc, các bản nén và ETag."""
+
+    __slots__ = ("body", "mimetype", "etag", "encoded")
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        # { 'br' | 'gzip': bytes nén } - chỉ giữ bản nén thực sự nhỏ hơn bản gốc
+        self.encoded = {}
+        if mimetype.startswith(COMPRESSIBLE_TYPES):
+            candidates = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                candidates['br'] = brotli.compress(body, quality=11)
+            self.encoded = {name: data for name, data in candidates.items() if len(data) < len(body)}
+
+
+def load_assets():
+    """Đọc + nén sẵn mọi file trong static/. Trả về (theo tên file, theo URL có dấu vân tay)."""
+    by_name, by_url = {}, {}
+    for name in sorted(os.listdir(STATIC_DIR)):
+        path = os.path.join(STATIC_DIR, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            asset = Asset(f.read(), mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        stem, ext = os.path.splitext(name)
+        url_name = f"{stem}.{asset.etag[:10]}{ext}"  # Ví dụ: app.3f2a9c1b7e.js
+        by_name[name] = (asset, f"/assets/{url_name}")
+        by_url[url_name] = asset
+    return by_name, by_url
+
+
+ASSETS_BY_NAME, ASSETS_BY_URL = load_assets()
+_index_page = None  # Trang index.html đã render + nén sẵn (tạo ở request đầu tiên)
+
+
+@app.context_processor
+def asset_helpers():
+    """Cho template dùng {{ asset_url('app.js') }} -> /assets/app.<băm>.js"""
+    return {"asset_url": lambda name: ASSETS_BY_NAME[name][1]}
+
+
+def send_asset(asset, max_age, immutable=False):
+    """
+    Gửi Asset: chọn bản nén theo Accept-Encoding (br > gzip > gốc), kèm ETag + Cache-Control.
+    Request có If-None-Match trùng ETag -> 304 (không có body).
+    """
+    encoding = None
+    if 'br' in asset.encoded and request.accept_encodings['br']:
+        encoding = 'br'
+    elif 'gzip' in asset.encoded and request.accept_encodings['gzip']:
+        encoding = 'gzip'
+
+    response = Response(asset.encoded[encoding] if encoding else asset.body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{asset.etag}-{encoding}")  # Mỗi bản nén là một biểu diễn khác -> ETag riêng
+    else:
+        response.set_etag(asset.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True  # Luôn hỏi lại (rẻ: 304 nếu không đổi)
+    return response.make_conditional(request)
 
 
 @app.route('/')  # Định nghĩa route (đường dẫn) gốc
@@ -12,16 +104,48 @@ def index():
     Phục vụ trang web chính (index.html).
     Khi người dùng truy cập vào http://localhost:8080/,
     hàm này sẽ được gọi.
+
+    Trang được render và nén MỘT LẦN; các lần tải sau chỉ trả 304 nếu trình duyệt đã có bản này.
+    """
+    global _index_page, ASSETS_BY_NAME, ASSETS_BY_URL
+    if app.debug:
+        # Chế độ phát triển: đọc lại file tĩnh / template mỗi lần tải trang để thấy ngay thay đổi
+        ASSETS_BY_NAME, ASSETS_BY_URL = load_assets()
+        _index_page = None
+    if _index_page is None:
+        # render_template sẽ tự động tìm file 'index.html'
+        # trong thư mục 'templates' (theo quy ước của Flask)
+        _index_page = Asset(render_template('index.html').encode('utf-8'), 'text/html')
+    return send_asset(_index_page, max_age=0)
+
+
+@app.route('/assets/<name>')
+def assets(name):
+    """File tĩnh có dấu vân tay (nén sẵn, lưu cache 1 năm). Tên không khớp bản hiện tại -> 404."""
+    asset = ASSETS_BY_URL.get(name)
+    if asset is None:
+        abort(404)
+    return send_asset(asset, max_age=ASSET_MAX_AGE, immutable=True)
+
+
+@app.route('/static/<name>')
+def static_file(name):
+    """
+    File tĩnh theo tên gốc (không có dấu vân tay - ví dụ URL dự phòng của Web Worker trong app.js):
+    vẫn nén sẵn + ETag, nhưng trình duyệt luôn hỏi lại (304 nếu không đổi) vì URL không đổi khi nội dung đổi.
     """
-    # render_template sẽ tự động tìm file 'index.html'
-    # trong thư mục 'templates' (theo quy ước của Flask)
-    return render_template('index.html')
+    entry = ASSETS_BY_NAME.get(name)
+    if entry is None:
+        abort(404)
+    return send_asset(entry[0], max_age=0)
 
 
 if __name__ == '__main__':
     # Điểm khởi chạy khi ta chạy file python này
     # (ví dụ: python app_presentation.py)
-    
+
     # Chạy Presentation server trên cổng 8080
     print("--- Lớp Trình diễn (UI) đang chạy tại: http://localhost:8080 ---")
-    app.run(debug=True, port=8080)
\ No newline at end of file
+    # Debug/reloader chỉ bật khi FLASK_DEBUG=1 (mặc định bật khi chạy trực tiếp để phát triển).
+    # Production: gunicorn --chdir presentation -w 2 -b 0.0.0.0:8080 app_presentation:app
+    app.run(debug=os.environ.get("FLASK_DEBUG", "1") == "1", port=8080)
@@ -35,6 +35,29 @@ function formatDistance(totalKm) {
     return `${totalKm.toFixed(1).replace(/\.0$/, '')} km`;
 }
 
+// Tên hiển thị của các phương tiện (profile OSRM)
+const PROFILE_LABELS = {
+    'driving': 'Ô tô / Xe khách',
+    'motorbike': 'Xe máy',
+    'cycling': 'Xe đạp',
+    'walking': 'Đi bộ'
+};
+
+// Màu của từng lộ trình (chế độ nhiều ngày / nhiều xe); lộ trình đầu tiên giữ màu xanh như cũ
+const ROUTE_COLORS = ['#0d6efd', '#dc3545', '#198754', '#fd7e14', '#6f42c1', '#20c997', '#d63384'];
+
+// --- HIỂN THỊ LỘ TRÌNH LỚN (30+ điểm dừng) KHÔNG LÀM ĐƠ TRÌNH DUYỆT ---
+// Mục tiêu đo được: không có tác vụ nào trên main thread dài quá LONG_TASK_MS (long task) khi hiển thị kết quả,
+// và mỗi khung hình khi cuộn danh sách chỉ đường <= 1 khung 60 fps. Số liệu in ra console (xem measureRender).
+const LONG_TASK_MS = 50;
+// Danh sách chỉ đường dài hơn ngưỡng này được "ảo hóa": chỉ tạo DOM cho các dòng đang nhìn thấy
+const STEP_VIRTUALIZE_THRESHOLD = 40;
+const STEP_ROW_HEIGHT = 28;   // px - chiều cao cố định của 1 dòng chỉ đường (khớp CSS .step-row)
+const STEP_VIEW_ROWS = 10;    // Số dòng hiển thị trong khung cuộn
+const STEP_OVERSCAN = 5;      // Số dòng dựng thêm phía trên/dưới khung nhìn (cuộn mượt)
+// Độ chính xác polyline (khớp GEOMETRY_PRECISION của BLL)
+const GEOMETRY_PRECISION = 5;
+
 // --- HÀM HỖ TRỢ DỊCH HƯỚNG DẪN (MỚI) ---
 
 /**
@@ -88,6 +111,12 @@ function getManeuverText(step) {
 // 1. KHỞI TẠO CÁC ĐỐI TƯỢNG GIAO DIỆN (DOM Elements)
 // Tham chiếu đến các phần tử HTML để tương tác
 const map = L.map('map').setView([10.7769, 106.7009], 12); // Tọa độ trung tâm Sài Gòn
+// Đường đi vẽ trên MỘT canvas (không phải hàng nghìn phần tử SVG); padding 0.5 để kéo bản đồ không bị hụt nét
+const routeRenderer = L.canvas({ padding: 0.5 });
+// Web Worker giải mã geometry (không có Worker -> nhận GeoJSON và xử lý trên main thread)
+// URL có dấu vân tay do trang truyền vào (data-worker-url); thiếu thì dùng URL tên gốc (vẫn nén, luôn hỏi lại server)
+const geometryWorkerUrl = document.currentScript?.dataset.workerUrl || '/static/geometry_worker.js';
+const geometryWorker = window.Worker ? new Worker(geometryWorkerUrl) : null;
 const clusterListDiv = document.getElementById('cluster-list');
 const solveForm = document.getElementById('solve-form');
 const loadingOverlay = document.getElementById('loading');
@@ -97,6 +126,7 @@ const resultsSummaryDiv = document.getElementById('results-summary');
 let clusterMarkers = []; // Mảng chứa các marker của cụm
 let routeLayer = null;   // Layer chứa đường đi (sẽ bị xóa và vẽ lại)
 let startEndMarkers = []; // Mảng chứa marker điểm đầu, cuối và các điểm dừng
+let renderId = 0;        // Tăng mỗi lần hiển thị kết quả -> bỏ qua kết quả giải mã của lần tìm đường cũ
 
 
 // 2. THIẾT LẬP BẢN ĐỒ LEAFLET
@@ -151,6 +181,16 @@ solveForm.addEventListener('submit', async (e) => {
     const startAddress = document.getElementById('start-address').value;
     const endAddress = document.getElementById('end-address').value;
     const optimizeFor = document.getElementById('optimize-for').value;
+    const profile = document.getElementById('travel-profile').value;
+    const departureTime = document.getElementById('departure-time').value; // "HH:MM" hoặc ""
+    const respectOpeningHours = document.getElementById('respect-opening-hours').checked;
+    const numRoutes = parseInt(document.getElementById('num-routes').value, 10) || 1;
+    const splitBy = document.getElementById('split-by').value;
+    const maxRouteHours = parseFloat(document.getElementById('max-route-hours').value); // Giờ, hoặc NaN
+    // Nếu chọn so sánh: lấy ma trận của TẤT CẢ phương tiện trong 1 lần gọi (BLL fan-out song song)
+    const compareProfiles = document.getElementById('compare-profiles').checked
+        ? Object.keys(PROFILE_LABELS).filter(p => p !== profile)
+        : [];
     
     // Lấy danh sách các ID cụm đã được check
     const selectedClusters = Array.from(
@@ -182,7 +222,16 @@ solveForm.addEventListener('submit', async (e) => {
                 start_address: startAddress,
                 end_address: endAddress,
                 cluster_ids: selectedClusters,
-                optimize_for: optimizeFor
+                optimize_for: optimizeFor,
+                profile: profile,
+                compare_profiles: compareProfiles,
+                departure_time: departureTime || null,
+                respect_opening_hours: respectOpeningHours,
+                num_routes: numRoutes,
+                split_by: splitBy,
+                max_route_duration_min: maxRouteHours > 0 ? maxRouteHours * 60 : null,
+                // Chuỗi polyline gọn hơn GeoJSON nhiều lần; giải mã trong Web Worker
+                geometry_format: geometryWorker ? 'polyline' : 'geojson'
             })
         });
         
@@ -193,7 +242,7 @@ solveForm.addEventListener('submit', async (e) => {
         
         console.log("Kết quả từ BLL:", result);
         // Gọi hàm để hiển thị kết quả lên giao diện
-        displayResults(result);
+        await displayResults(result);
         
     } catch (error) {
         // Xử lý nếu có lỗi (lỗi mạng, lỗi BLL)
@@ -207,7 +256,148 @@ solveForm.addEventListener('submit', async (e) => {
 
 
 // 5. HÀM HIỂN THỊ KẾT QUẢ LỘ TRÌNH LÊN GIAO DIỆN
-function displayResults(result) {
+
+/**
+ * Giải mã geometry của các chặng thành mảng phẳng [lat, lon, ...] (trong Web Worker nếu có)
+ * @param {object} result - Kết quả từ BLL (geometries + geometry_format)
+ * @param {number} id - Số thứ tự lần hiển thị (renderId)
+ * @returns {Promise<{legs: Float64Array[], bounds: number[][]}>}
+ */
+function decodeGeometries(result, id) {
+    const format = result.geometry_format || 'geojson';
+    if (!geometryWorker) {
+        // Không có Worker: BLL trả GeoJSON ([lon, lat]), đổi sang mảng phẳng [lat, lon] ngay tại đây
+        const bounds = [[Infinity, Infinity], [-Infinity, -Infinity]];
+        const legs = result.geometries.map(geom => Float64Array.from(geom.coordinates.flatMap(([lon, lat]) => {
+            bounds[0] = [Math.min(bounds[0][0], lat), Math.min(bounds[0][1], lon)];
+            bounds[1] = [Math.max(bounds[1][0], lat), Math.max(bounds[1][1], lon)];
+            return [lat, lon];
+        })));
+        return Promise.resolve({ legs, bounds });
+    }
+    return new Promise((resolve, reject) => {
+        const onMessage = (event) => {
+            if (event.data.id !== id) return; // Kết quả của lần hiển thị khác
+            geometryWorker.removeEventListener('message', onMessage);
+            geometryWorker.removeEventListener('error', onError);
+            resolve(event.data);
+        };
+        const onError = (error) => {
+            geometryWorker.removeEventListener('message', onMessage);
+            geometryWorker.removeEventListener('error', onError);
+            reject(new Error(`Không giải mã được geometry: ${error.message}`));
+        };
+        geometryWorker.addEventListener('message', onMessage);
+        geometryWorker.addEventListener('error', onError);
+        geometryWorker.postMessage({ id, format, geometries: result.geometries, precision: GEOMETRY_PRECISION });
+    });
+}
+
+/**
+ * Mảng phẳng [lat, lon, ...] -> mảng L.LatLng cho Leaflet
+ * @param {Float64Array} flat
+ * @returns {L.LatLng[]}
+ */
+function toLatLngs(flat) {
+    const latlngs = new Array(flat.length / 2);
+    for (let i = 0; i < latlngs.length; i++) {
+        latlngs[i] = L.latLng(flat[2 * i], flat[2 * i + 1]);
+    }
+    return latlngs;
+}
+
+/**
+ * Dựng danh sách chỉ đường của 1 chặng vào container (chỉ gọi khi người dùng mở "Chi tiết").
+ * Danh sách dài (> STEP_VIRTUALIZE_THRESHOLD) được ảo hóa: khung cuộn cố định, chỉ các dòng đang nhìn thấy
+ * (cộng STEP_OVERSCAN dòng mỗi phía) có phần tử DOM; cập nhật theo requestAnimationFrame khi cuộn.
+ * @param {HTMLElement} container - Phần tử .card-body của chặng
+ * @param {object[]} steps - Mảng 'steps' của chặng
+ */
+function renderSteps(container, steps) {
+    if (steps.length === 0) {
+        container.innerHTML = '<span class="text-muted step-instruction">Không có chỉ đường chi tiết.</span>';
+        return;
+    }
+    if (steps.length <= STEP_VIRTUALIZE_THRESHOLD) {
+        container.innerHTML = `<ul class="list-unstyled mb-0">${
+            steps.map(step => `<li class="step-instruction">${getManeuverText(step)}</li>`).join('')
+        }</ul>`;
+        return;
+    }
+
+    const viewport = document.createElement('div');
+    viewport.className = 'step-viewport';
+    viewport.style.height = `${STEP_ROW_HEIGHT * STEP_VIEW_ROWS}px`;
+    const spacer = document.createElement('div'); // Chiều cao của TOÀN BỘ danh sách -> thanh cuộn đúng tỉ lệ
+    spacer.className = 'step-spacer';
+    spacer.style.height = `${STEP_ROW_HEIGHT * steps.length}px`;
+    const rows = document.createElement('ul');
+    rows.className = 'list-unstyled mb-0 step-window';
+    spacer.appendChild(rows);
+    viewport.appendChild(spacer);
+    container.replaceChildren(viewport);
+
+    const texts = new Array(steps.length); // Câu chỉ đường đã dịch (dịch khi dòng được hiển thị lần đầu)
+    let first = -1;
+    let frame = 0;
+    const update = () => {
+        frame = 0;
+        const start = Math.max(0, Math.floor(viewport.scrollTop / STEP_ROW_HEIGHT) - STEP_OVERSCAN);
+        if (start === first) return;
+        first = start;
+        const end = Math.min(steps.length, start + STEP_VIEW_ROWS + 2 * STEP_OVERSCAN);
+        let html = '';
+        for (let i = start; i < end; i++) {
+            texts[i] = texts[i] || getManeuverText(steps[i]);
+            html += `<li class="step-instruction step-row" title="${texts[i].replace(/<[^>]+>/g, '')}">${texts[i]}</li>`;
+        }
+        rows.style.transform = `translateY(${start * STEP_ROW_HEIGHT}px)`;
+        rows.innerHTML = html;
+    };
+    viewport.addEventListener('scroll', () => {
+        if (!frame) frame = requestAnimationFrame(update);
+    }, { passive: true });
+    update();
+}
+
+/**
+ * Đo chi phí hiển thị kết quả trên main thread: thời gian đến khung hình đầu tiên đã vẽ xong
+ * và các long task (> LONG_TASK_MS, qua PerformanceObserver nếu trình duyệt hỗ trợ).
+ * Kết quả in ra console và lưu ở window.lastRenderStats (để so sánh giữa các lần thử).
+ * @returns {function(number): void} - Gọi khi dựng xong, với số điểm dừng
+ */
+function measureRender() {
+    const started = performance.now();
+    const longTasks = [];
+    let observer = null;
+    if (window.PerformanceObserver && (PerformanceObserver.supportedEntryTypes || []).includes('longtask')) {
+        observer = new PerformanceObserver(list => list.getEntries().forEach(entry => longTasks.push(entry.duration)));
+        observer.observe({ type: 'longtask' });
+    }
+    return (stops) => {
+        // 2 lần requestAnimationFrame: khung hình chứa kết quả đã được vẽ
+        requestAnimationFrame(() => requestAnimationFrame(() => {
+            if (observer) observer.disconnect();
+            const stats = {
+                stops,
+                render_ms: Math.round(performance.now() - started),
+                long_tasks: observer ? longTasks.length : null,
+                longest_task_ms: longTasks.length ? Math.round(Math.max(...longTasks)) : 0
+            };
+            window.lastRenderStats = stats;
+            const ok = stats.longest_task_ms <= LONG_TASK_MS;
+            console[ok ? 'info' : 'warn'](
+                `Hiển thị ${stops} điểm dừng: ${stats.render_ms} ms, long task dài nhất ${stats.longest_task_ms} ms ` +
+                `(mục tiêu <= ${LONG_TASK_MS} ms)`, stats);
+        }));
+    };
+}
+
+async function displayResults(result) {
+    const id = ++renderId;
+    const finishMeasure = measureRender();
+    // Giải mã geometry trong Worker SONG SONG với việc dựng phần tóm tắt / danh sách chặng bên dưới
+    const decoding = decodeGeometries(result, id);
     
     // --- Hiển thị tóm tắt ---
     // Định dạng chi phí (solver) dựa trên tiêu chí tối ưu
@@ -220,86 +410,84 @@ function displayResults(result) {
         <div class="alert alert-success p-2">
             <h5 class="alert-heading fs-6">Hoàn thành!</h5>
             <p class="mb-1"><b>Tối ưu theo:</b> ${result.optimize_for === 'distance' ? 'Quãng đường' : 'Thời gian'}</p>
+            <p class="mb-1"><b>Phương tiện:</b> ${PROFILE_LABELS[result.profile] || result.profile}</p>
+            ${result.departure_time ? `<p class="mb-1"><b>Giờ xuất phát:</b> ${result.departure_time}</p>` : ''}
+            ${result.finish_time ? `<p class="mb-1"><b>Dự kiến đến nơi:</b> ${result.finish_time}</p>` : ''}
+            ${result.time_window_violations && result.time_window_violations.length
+                ? `<p class="mb-1 text-danger"><b>Không kịp giờ mở cửa:</b> ${result.time_window_violations.join(', ')}</p>`
+                : ''}
             <p class="mb-0"><b>Chi phí tối ưu (Solver):</b> ${formattedSolverCost}</p>
         </div>
         <hr>
         <p><b>Tổng quãng đường (OSRM):</b> ${formatDistance(result.total_distance_km)}</p>
         <p><b>Tổng thời gian (OSRM):</b> ${formatDuration(result.total_duration_min)}</p>
-        <h6 class="fw-bold mt-3">Chi tiết lộ trình:</h6>
     `;
+
+    // --- Bảng so sánh phương tiện (nếu có) ---
+    // Cùng lộ trình, chi phí tính theo ma trận của từng phương tiện
+    if (result.profile_comparison) {
+        let rows = '';
+        Object.entries(result.profile_comparison).forEach(([profile, totals]) => {
+            rows += `
+                <tr class="${profile === result.profile ? 'table-success' : ''}">
+                    <td>${PROFILE_LABELS[profile] || profile}</td>
+                    <td>${formatDistance(totals.distance_km)}</td>
+                    <td>${formatDuration(totals.duration_min)}</td>
+                </tr>`;
+        });
+        resultsSummaryDiv.innerHTML += `
+            <h6 class="fw-bold mt-3">So sánh phương tiện:</h6>
+            <table class="table table-sm">
+                <thead><tr><th>Phương tiện</th><th>Quãng đường</th><th>Thời gian</th></tr></thead>
+                <tbody>${rows}</tbody>
+            </table>
+        `;
+    }
+    resultsSummaryDiv.innerHTML += `<h6 class="fw-bold mt-3">Chi tiết lộ trình:</h6>`;
     
-    // --- Tạo danh sách các chặng (Bắt đầu sửa) ---
+    // --- Danh sách các chặng ---
+    // Dựng HTML của mọi chặng thành MỘT chuỗi rồi gán 1 lần (innerHTML += trong vòng lặp parse lại
+    // toàn bộ danh sách ở mỗi chặng -> O(n^2)). Chỉ đường chi tiết CHƯA được dựng (xem renderSteps).
     const tourList = document.createElement('div'); // Dùng <div> thay vì <ol>
     tourList.className = 'list-group'; // Dùng list-group của Bootstrap
-    
-    // --- Vẽ đường đi lên bản đồ ---
-    // Gom tất cả các đoạn geometry (từ BLL) thành một FeatureCollection (chuẩn GeoJSON)
-    const allGeometries = {
-        type: "FeatureCollection",
-        features: result.geometries.map(geom => ({
-            type: "Feature", geometry: geom, properties: {}
-        }))
-    };
-    
-    // Tạo lớp (layer) GeoJSON từ geometries và vẽ lên bản đồ
-    routeLayer = L.geoJSON(allGeometries, {
-        style: { color: '#0d6efd', weight: 5, opacity: 0.8 } // Màu xanh, dày 5px
-    }).addTo(map);
-    
-    // Tự động zoom bản đồ để vừa với toàn bộ lộ trình
-    map.fitBounds(routeLayer.getBounds().pad(0.1)); // Thêm 10% padding
-    
-    // --- Hiển thị các chặng và Marker ---
-    
-    // Chặng 0 (Xử lý riêng cho Điểm Bắt Đầu)
     const firstStopName = result.tour[0].from.replace("START_POINT", "Điểm xuất phát");
-    // Lấy tọa độ điểm bắt đầu (là tọa độ ĐẦU TIÊN [0] của geometry ĐẦU TIÊN [0])
-    // OSRM trả về [lon, lat]
-    const firstStopCoord = result.geometries[0].coordinates[0]; // [lon, lat]
-    
-    // Thêm HTML cho điểm bắt đầu (chặng 1)
-    tourList.innerHTML += `
+    const rows = [`
         <div class="list-group-item list-group-item-success d-flex align-items-center">
             <span class="badge bg-dark rounded-pill me-2">1</span>
             <b>${firstStopName}</b>
         </div>
-    `;
-    // Tạo marker cho điểm bắt đầu (Leaflet yêu cầu [lat, lon])
-    let startMarker = L.marker([firstStopCoord[1], firstStopCoord[0]]) // Chú ý: [1], [0]
-        .bindPopup(`<b>1. Điểm xuất phát</b><br>${firstStopName}`)
-        .addTo(map);
-    startEndMarkers.push(startMarker);
+    `];
+    const stopNames = [];
 
-    
-    // Duyệt qua từng chặng (leg) trong lộ trình (result.tour) để hiển thị
-    // (Bao gồm các chặng giữa và điểm kết thúc)
     result.tour.forEach((leg, index) => {
+        // Chế độ nhiều ngày/xe: chèn tiêu đề khi bắt đầu một lộ trình mới
+        if (leg.route_label && (index === 0 || result.tour[index - 1].route_index !== leg.route_index)) {
+            const route = result.routes[leg.route_index];
+            rows.push(`
+                <div class="list-group-item list-group-item-secondary fw-bold"
+                     style="border-left: 6px solid ${ROUTE_COLORS[leg.route_index % ROUTE_COLORS.length]}">
+                    ${leg.route_label}: ${formatDistance(route.total_distance_km)} / ${formatDuration(route.total_duration_min)}
+                    ${route.finish_time ? ` &middot; Kết thúc lúc ${route.finish_time}` : ''}
+                </div>
+            `);
+        }
         let stopName = leg.to;
         let cssClass = "";
-        let isEnd = false;
         
         // Xử lý riêng (tô màu đỏ) nếu là Điểm Kết Thúc
         if (stopName.includes("END_POINT")) {
             stopName = leg.to.replace("END_POINT", "Điểm kết thúc");
             cssClass = "list-group-item-danger"; // Màu đỏ
-            isEnd = true;
         }
+        stopNames.push(stopName);
 
         const legDistance = formatDistance(leg.distance_km);
         const legDuration = formatDuration(leg.duration_min);
         // Tạo ID duy nhất cho nút 'Chi tiết' (collapse) của Bootstrap
         const collapseId = `collapse-step-${index}`;
 
-        // Xây dựng HTML cho danh sách các bước chỉ đường chi tiết
-        let stepsHtml = '<ul class="list-unstyled mt-2">';
-        leg.steps.forEach(step => {
-            // Gọi hàm dịch getManeuverText
-            stepsHtml += `<li class="step-instruction">${getManeuverText(step)}</li>`;
-        });
-        stepsHtml += '</ul>';
-
-        // Tạo HTML cho chặng này (bao gồm nút 'Chi tiết' và nội dung 'collapse')
-        tourList.innerHTML += `
+        // HTML cho chặng này (nút 'Chi tiết' + khung 'collapse' rỗng, được lấp khi mở lần đầu)
+        rows.push(`
             <div class="list-group-item ${cssClass}">
                 <div class="d-flex w-100 justify-content-between align-items-center">
                     <h6 class="mb-0">
@@ -311,32 +499,73 @@ function displayResults(result) {
                             data-bs-target="#${collapseId}" 
                             aria-expanded="false" 
                             aria-controls="${collapseId}">
-                        Chi tiết
+                        Chi tiết (${leg.steps.length})
                     </button>
                 </div>
                 <small class="text-muted d-block mt-1">
                     Chặng ${index + 1}: ${legDistance} / ${legDuration}
+                    ${leg.arrive_time ? ` &middot; Đến lúc ${leg.arrive_time}` : ''}
+                    ${leg.wait_min ? ` &middot; Chờ mở cửa ${formatDuration(leg.wait_min)}` : ''}
+                    ${leg.visit_min ? ` &middot; Tham quan ${formatDuration(leg.visit_min)}` : ''}
+                    ${leg.opening_hours ? ` &middot; Mở cửa ${leg.opening_hours}` : ''}
+                    ${leg.late_min ? ` <span class="text-danger">&middot; Trễ ${formatDuration(leg.late_min)}</span>` : ''}
+                    ${leg.co_located ? ` &middot; Cùng vị trí: ${leg.co_located.join(', ')}` : ''}
                 </small>
                 
-                <div class="collapse mt-2" id="${collapseId}">
-                    <div class="card card-body p-2">
-                        ${stepsHtml}
-                    </div>
+                <div class="collapse mt-2" id="${collapseId}" data-leg-index="${index}">
+                    <div class="card card-body p-2"></div>
                 </div>
             </div>
-        `;
-        
-        // Thêm marker cho điểm dừng này
-        // Tọa độ của điểm dừng này là tọa độ CUỐI CÙNG (.slice(-1)[0]) của geometry HIỆN TẠI (index)
-        const stopCoord = result.geometries[index].coordinates.slice(-1)[0]; // [lon, lat]
-        let marker = L.marker([stopCoord[1], stopCoord[0]]) // Chuyển sang [lat, lon]
-            .bindPopup(`<b>${index + 2}. ${stopName}</b>`)
-            .addTo(map);
-        startEndMarkers.push(marker);
+        `);
+    });
+    tourList.innerHTML = rows.join('');
+
+    // Chỉ đường chi tiết: dựng khi người dùng mở "Chi tiết" lần đầu (sự kiện collapse của Bootstrap nổi bọt lên đây)
+    tourList.addEventListener('show.bs.collapse', (event) => {
+        const body = event.target.querySelector('.card-body');
+        if (!body || body.dataset.rendered) return;
+        body.dataset.rendered = '1';
+        renderSteps(body, result.tour[Number(event.target.dataset.legIndex)].steps);
     });
     
     // Gắn danh sách chặng đã tạo vào trang
     resultsSummaryDiv.appendChild(tourList);
+
+    // --- Vẽ đường đi lên bản đồ ---
+    const decoded = await decoding;
+    if (id !== renderId) return; // Người dùng đã tìm đường lần nữa trong lúc đang giải mã
+
+    // Mỗi lộ trình (chế độ nhiều ngày/xe: theo route_index) là MỘT polyline nhiều đoạn trên canvas dùng chung,
+    // thay vì một GeoJSON layer với mỗi chặng một đường SVG
+    const lines = new Map();
+    decoded.legs.forEach((flat, index) => {
+        const routeIndex = result.tour[index].route_index || 0;
+        if (!lines.has(routeIndex)) lines.set(routeIndex, []);
+        lines.get(routeIndex).push(toLatLngs(flat));
+    });
+    routeLayer = L.layerGroup(Array.from(lines, ([routeIndex, latlngs]) => L.polyline(latlngs, {
+        renderer: routeRenderer,
+        color: ROUTE_COLORS[routeIndex % ROUTE_COLORS.length],
+        weight: 5, opacity: 0.8, // Dày 5px
+        interactive: false
+    }))).addTo(map);
+    
+    // Tự động zoom bản đồ để vừa với toàn bộ lộ trình (khung bao do Worker tính sẵn)
+    map.fitBounds(L.latLngBounds(decoded.bounds).pad(0.1)); // Thêm 10% padding
+    
+    // --- Marker các điểm dừng ---
+    // Điểm bắt đầu = tọa độ ĐẦU TIÊN của chặng đầu tiên; điểm dừng thứ i = tọa độ CUỐI CÙNG của chặng i
+    const firstLeg = decoded.legs[0];
+    startEndMarkers.push(L.marker([firstLeg[0], firstLeg[1]])
+        .bindPopup(`<b>1. Điểm xuất phát</b><br>${firstStopName}`)
+        .addTo(map));
+    decoded.legs.forEach((flat, index) => {
+        startEndMarkers.push(L.marker([flat[flat.length - 2], flat[flat.length - 1]])
+            .bindPopup(`<b>${index + 2}. ${stopNames[index]}</b>`)
+            .addTo(map));
+    });
+
+    finishMeasure(result.tour.length + 1);
 }
 
 // 6. CHẠY HÀM KHỞI TẠO KHI TRANG TẢI XONG
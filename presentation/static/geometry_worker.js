@@ -0,0 +1,76 @@
+// presentation/static/geometry_worker.js
+
+/**
+ * Web Worker: giải mã geometry của các chặng NGOÀI main thread.
+ *
+ * Lộ trình 30+ điểm dừng có hàng chục nghìn tọa độ; giải mã polyline và tính khung bao (bounds)
+ * trên main thread làm trình duyệt "đơ". Worker trả về mỗi chặng một Float64Array phẳng
+ * [lat0, lon0, lat1, lon1, ...] và chuyển quyền sở hữu (transfer) - không copy dữ liệu về main thread.
+ *
+ * Nhận:  { id, format: 'polyline' | 'geojson', geometries: [...], precision }
+ * Trả:   { id, legs: [Float64Array, ...], bounds: [[south, west], [north, east]] }
+ */
+
+/**
+ * Giải mã chuỗi polyline (Google Encoded Polyline Algorithm) thành mảng phẳng [lat, lon, ...]
+ * @param {string} encoded - Chuỗi polyline
+ * @param {number} precision - Số chữ số thập phân (5 như BLL / OSRM)
+ * @returns {Float64Array}
+ */
+function decodePolyline(encoded, precision) {
+    const factor = Math.pow(10, precision);
+    // Mỗi tọa độ cần ít nhất 2 ký tự (lat, lon) -> cấp phát dư rồi cắt
+    const out = new Float64Array(encoded.length);
+    let index = 0, count = 0, lat = 0, lon = 0;
+    while (index < encoded.length) {
+        for (let axis = 0; axis < 2; axis++) {
+            let shift = 0, result = 0, byte;
+            do {
+                byte = encoded.charCodeAt(index++) - 63;
+                result |= (byte & 0x1f) << shift;
+                shift += 5;
+            } while (byte >= 0x20);
+            const delta = (result & 1) ? ~(result >> 1) : (result >> 1);
+            if (axis === 0) lat += delta; else lon += delta;
+        }
+        out[count++] = lat / factor;
+        out[count++] = lon / factor;
+    }
+    return out.slice(0, count);
+}
+
+/**
+ * GeoJSON LineString ([lon, lat]) -> mảng phẳng [lat, lon, ...]
+ * @param {object} geometry
+ * @returns {Float64Array}
+ */
+function flattenGeoJSON(geometry) {
+    const coords = geometry.coordinates;
+    const out = new Float64Array(coords.length * 2);
+    for (let i = 0; i < coords.length; i++) {
+        out[2 * i] = coords[i][1];
+        out[2 * i + 1] = coords[i][0];
+    }
+    return out;
+}
+
+self.onmessage = (event) => {
+    const { id, format, geometries, precision } = event.data;
+    let south = Infinity, west = Infinity, north = -Infinity, east = -Infinity;
+
+    const legs = geometries.map(geometry => {
+        const flat = format === 'polyline' ? decodePolyline(geometry, precision) : flattenGeoJSON(geometry);
+        for (let i = 0; i < flat.length; i += 2) {
+            if (flat[i] < south) south = flat[i];
+            if (flat[i] > north) north = flat[i];
+            if (flat[i + 1] < west) west = flat[i + 1];
+            if (flat[i + 1] > east) east = flat[i + 1];
+        }
+        return flat;
+    });
+
+    self.postMessage(
+        { id, legs, bounds: [[south, west], [north, east]] },
+        legs.map(flat => flat.buffer)  // Transfer: không copy
+    );
+};
@@ -0,0 +1,35 @@
+# tests/conftest.py
+#
+# Các module trong logic/ import lẫn nhau theo kiểu "import database" (giống gunicorn.conf.py),
+# nên thêm thư mục logic/ (và presentation/ cho app_presentation) vào sys.path trước khi chạy test.
+#
+# Chạy từ thư mục gốc của dự án:  python -m pytest -q tests
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "presentation"))
+sys.path.insert(0, os.path.join(ROOT, "logic"))
+
+import osrm_stub  # noqa: E402
+
+
+@pytest.fixture
+def stub_server():
+    """Hàm tạo OSRM stub chạy nền trên cổng ngẫu nhiên; trả về (base_url, config). Tự tắt khi test xong."""
+    servers = []
+
+    def start(config=None):
+        server = osrm_stub.make_server(port=0, config=config)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}", server.config
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,44 @@
+# tests/test_construction.py
+#
+# Pha Xây dựng vector hóa (NumPy, dùng khi n >= VECTORIZE_MIN_NODES) phải cho đúng tour của vòng lặp
+# Python với cùng seed: cùng RCL và cùng thứ tự ứng viên (random.randrange chọn theo vị trí).
+import random
+
+import pytest
+
+from benchmark_memory import make_instance
+from gtsp_solver import GTSPGraspSolver
+from time_dependent import TimeDependentDurations, parse_clock
+
+
+def make_solver(mode, seed):
+    distances, durations, clusters = make_instance(150, 15, seed=seed)
+    options = {}
+    if mode != 'static':
+        rng = random.Random(seed)
+        nodes = range(2, len(distances))
+        time_windows = {}
+        for v in nodes:
+            if rng.random() < 0.5:
+                opening = rng.randint(8 * 60, 12 * 60)
+                time_windows[v] = (opening, opening + rng.randint(120, 480))
+        options = dict(departure_time=parse_clock("08:00"), time_windows=time_windows,
+                       service_times={v: rng.choice((10, 20, 30)) for v in nodes})
+        if mode == 'time_dependent':
+            options['td_durations'] = TimeDependentDurations.from_base_matrix(durations)
+    return GTSPGraspSolver(distances, durations, clusters, 0, 1, optimize_for='time', **options)
+
+
+@pytest.mark.parametrize("mode", ["static", "time_windows", "time_dependent"])
+@pytest.mark.parametrize("alpha", [0.0, 0.3, 1.0])
+def test_vectorized_construction_matches_loop(mode, alpha):
+    solver = make_solver(mode, seed=4)
+    assert solver.n_nodes >= solver.VECTORIZE_MIN_NODES and solver._np_mask is not None
+    for seed in range(5):
+        random.seed(seed)
+        vectorized = list(solver.construction_phase(alpha))
+        mask, solver._np_mask = solver._np_mask, None  # Buộc dùng vòng lặp Python
+        random.seed(seed)
+        loop = list(solver.construction_phase(alpha))
+        solver._np_mask = mask
+        assert vectorized == loop
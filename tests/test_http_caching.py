@@ -0,0 +1,118 @@
+# tests/test_http_caching.py
+import gzip
+import json
+import re
+
+import pytest
+
+import app_logic
+import app_presentation
+
+
+@pytest.fixture
+def bll():
+    return app_logic.app.test_client()
+
+
+@pytest.fixture
+def ui():
+    return app_presentation.app.test_client()
+
+
+# --- BLL: /get_clusters ---
+
+def test_get_clusters_gzip_and_identity(bll):
+    compressed = bll.get('/get_clusters', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.status_code == 200
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['Vary'] == 'Accept-Encoding'
+    assert compressed.get_etag() == (f"{app_logic.CLUSTERS_ETAG}-gzip", False)
+    assert json.loads(gzip.decompress(compressed.data)) == json.loads(app_logic.CLUSTERS_JSON)
+
+    plain = bll.get('/get_clusters', headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_etag() == (app_logic.CLUSTERS_ETAG, False)
+    assert plain.get_json() == json.loads(app_logic.CLUSTERS_JSON)
+    assert f"max-age={app_logic.CLUSTERS_MAX_AGE}" in plain.headers['Cache-Control']
+
+
+def test_get_clusters_if_none_match(bll):
+    etag = bll.get('/get_clusters', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    cached = bll.get('/get_clusters', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == etag
+    # ETag của bản gzip không khớp bản gốc (biểu diễn khác) -> gửi lại đầy đủ
+    other = bll.get('/get_clusters', headers={'If-None-Match': etag})
+    assert other.status_code == 200 and other.get_json() == json.loads(app_logic.CLUSTERS_JSON)
+
+
+# --- Presentation: trang chính, /assets (dấu vân tay), /static ---
+
+def test_index_links_fingerprinted_assets_and_revalidates(ui):
+    page = ui.get('/', headers={'Accept-Encoding': 'identity'})
+    assert page.status_code == 200 and page.mimetype == 'text/html'
+    html = page.get_data(as_text=True)
+    for name in ('app.js', 'geometry_worker.js'):
+        url = app_presentation.ASSETS_BY_NAME[name][1]
+        assert re.fullmatch(r"/assets/[\w-]+\.[0-9a-f]{10}\.js", url) and url in html
+    assert 'no-cache' in page.headers['Cache-Control']
+
+    cached = ui.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': page.headers['ETag']})
+    assert cached.status_code == 304 and cached.data == b''
+
+
+def test_fingerprinted_asset_is_immutable_and_conditional(ui):
+    asset, url = app_presentation.ASSETS_BY_NAME['app.js']
+    response = ui.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == asset.body
+    cache_control = response.headers['Cache-Control']
+    assert 'immutable' in cache_control and f"max-age={app_presentation.ASSET_MAX_AGE}" in cache_control
+
+    cached = ui.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304 and cached.data == b''
+    # Dấu vân tay cũ / sai -> 404 (không bao giờ trả nhầm nội dung cho URL đã lưu cache 1 năm)
+    assert ui.get('/assets/app.0000000000.js').status_code == 404
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ('br, gzip', 'br'),
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+])
+def test_asset_encoding_selection(ui, monkeypatch, accept, expected):
+    asset, url = app_presentation.ASSETS_BY_NAME['app.js']
+    # Môi trường test không có brotli: thêm bản "br" giả để kiểm tra thứ tự ưu tiên br > gzip > gốc
+    monkeypatch.setitem(asset.encoded, 'br', b'brotli-body')
+    response = ui.get(url, headers={'Accept-Encoding': accept})
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers.get('Content-Encoding') == expected
+    assert response.data == (asset.encoded[expected] if expected else asset.body)
+    # Mỗi biểu diễn có ETag riêng: 304 chỉ khi khớp đúng bản nén được chọn
+    assert response.get_etag()[0] == (f"{asset.etag}-{expected}" if expected else asset.etag)
+    for encoding in ('br', 'gzip', None):
+        etag = f'"{asset.etag}-{encoding}"' if encoding else f'"{asset.etag}"'
+        status = ui.get(url, headers={'Accept-Encoding': accept, 'If-None-Match': etag}).status_code
+        assert status == (304 if encoding == expected else 200)
+
+
+def test_static_route_is_compressed_and_revalidated(ui):
+    """/static/<tên gốc> (URL dự phòng của Worker) đi qua send_asset: có nén + ETag, luôn hỏi lại server."""
+    asset, _ = app_presentation.ASSETS_BY_NAME['geometry_worker.js']
+    response = ui.get('/static/geometry_worker.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == asset.body
+    assert 'no-cache' in response.headers['Cache-Control'] and 'immutable' not in response.headers['Cache-Control']
+    cached = ui.get('/static/geometry_worker.js',
+                    headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+    assert ui.get('/static/khong_co.js').status_code == 404
+    # Không còn route /static mặc định của Flask (gửi file gốc, không nén)
+    assert 'static' not in app_presentation.app.view_functions
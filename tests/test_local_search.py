@@ -0,0 +1,125 @@
+# tests/test_local_search.py
+import random
+
+import pytest
+
+import solver_kernels
+from gtsp_solver import GTSPGraspSolver
+
+
+class RecordingTour(list):
+    """
+    Tour ghi lại trạng thái sau mỗi lần bị sửa (để kiểm tra từng bước cải tiến của Local Search).
+    Quá MAX_STATES bước -> dừng bằng lỗi (chênh lệch tính sai có thể làm Local Search lặp vô hạn).
+    """
+
+    MAX_STATES = 1000
+
+    def __init__(self, tour):
+        super().__init__(tour)
+        self.states = [list(tour)]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        # Đổi chỗ 2 cụm sửa 2 ô liên tiếp: bỏ trạng thái trung gian (một điểm xuất hiện 2 lần)
+        if sorted(self) == sorted(self.states[0]):
+            self.states.append(list(self))
+            assert len(self.states) <= self.MAX_STATES, "Local Search không hội tụ"
+
+
+def make_solver(seed, n_clusters=12, cluster_size=2):
+    """Ma trận chi phí ngẫu nhiên BẤT ĐỐI XỨNG; điểm 0 = START, 1 = END, mỗi cụm cluster_size điểm."""
+    rng = random.Random(seed)
+    n = 2 + n_clusters * cluster_size
+    matrix = [[0.0 if i == j else rng.uniform(1.0, 100.0) for j in range(n)] for i in range(n)]
+    clusters = {"START_CLUSTER": [0], "END_CLUSTER": [1]}
+    for c in range(n_clusters):
+        clusters[f"cluster_{c}"] = list(range(2 + c * cluster_size, 2 + (c + 1) * cluster_size))
+    solver = GTSPGraspSolver(matrix, matrix, clusters, 0, 1)
+    members = [rng.choice(clusters[f"cluster_{c}"]) for c in range(n_clusters)]
+    rng.shuffle(members)
+    return solver, [0, *members, 1]
+
+
+def two_opt_moves(tour):
+    """Các lân cận 2-opt theo đúng thứ tự duyệt của local_search_2opt."""
+    n = len(tour)
+    for i in range(1, n - 2):
+        for j in range(i + 1, n - 1):
+            yield tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+
+
+def or_opt_moves(tour, max_segment=GTSPGraspSolver.OR_OPT_MAX_SEGMENT):
+    """Các lân cận Or-opt (chuyển đoạn, giữ chiều) theo thứ tự duyệt của local_search_or_opt."""
+    n = len(tour)
+    for length in range(1, max_segment + 1):
+        for i in range(1, n - length):
+            e = i + length - 1
+            segment, rest = tour[i:e + 1], tour[:i] + tour[e + 1:]
+            for p in range(0, n - 1):
+                if i - 1 <= p <= e:
+                    continue
+                # Chèn sau tour[p] (vị trí trong tour sau khi gỡ đoạn)
+                at = p + 1 if p < i else p + 1 - length
+                yield rest[:at] + segment + rest[at:]
+
+
+def cluster_swap_moves(tour):
+    """Các lân cận đổi chỗ 2 cụm theo thứ tự duyệt của local_search_cluster_swap."""
+    n = len(tour)
+    for i in range(1, n - 2):
+        for j in range(i + 1, n - 1):
+            moved = list(tour)
+            moved[i], moved[j] = moved[j], moved[i]
+            yield moved
+
+
+SEARCHES = [
+    ("local_search_2opt", two_opt_moves),
+    ("local_search_or_opt", or_opt_moves),
+    ("local_search_cluster_swap", cluster_swap_moves),
+]
+
+
+def first_improvement(solver, tour, moves):
+    """Lân cận ĐẦU TIÊN (theo thứ tự duyệt) giảm chi phí khi tính lại toàn bộ tour; None nếu không có."""
+    current = solver.calculate_total_cost(tour)
+    for moved in moves(tour):
+        if solver.calculate_total_cost(moved) - current < -1e-9:
+            return moved
+    return None
+
+
+@pytest.mark.parametrize("name, moves", SEARCHES)
+@pytest.mark.parametrize("seed", range(5))
+def test_each_move_matches_full_recomputation(seed, name, moves):
+    """
+    Mỗi bước Local Search áp dụng đúng lân cận đầu tiên có chênh lệch ÂM khi tính lại calculate_total_cost
+    trên cả tour: chênh lệch O(1) của Solver cùng dấu với chênh lệch thật ở mọi lân cận đã duyệt (kể cả
+    các cạnh bên trong đoạn bị đảo với ma trận bất đối xứng). Tour hội tụ không còn lân cận nào tốt hơn.
+    """
+    solver, tour = make_solver(seed)
+    solver._kernel_cost = None  # Kiểm tra vòng lặp Python
+    recorded = RecordingTour(tour)
+    result = getattr(solver, name)(recorded)
+
+    states = recorded.states
+    assert len(states) > 1  # Có ít nhất 1 bước cải tiến
+    for before, after in zip(states, states[1:]):
+        assert after == first_improvement(solver, before, moves)
+        assert solver.calculate_total_cost(after) < solver.calculate_total_cost(before) - 1e-9
+    assert list(result) == states[-1]
+    assert first_improvement(solver, list(result), moves) is None
+
+
+@pytest.mark.skipif(not solver_kernels.ENABLED, reason="không có Numba")
+@pytest.mark.parametrize("name, moves", SEARCHES)
+@pytest.mark.parametrize("seed", range(5))
+def test_kernels_match_python_loops(seed, name, moves):
+    """Kernel Numba cho ra đúng tour của vòng lặp Python (cùng thứ tự duyệt, cùng phép tính)."""
+    solver, tour = make_solver(seed)
+    compiled = list(getattr(solver, name)(list(tour)))
+    kernel_cost, solver._kernel_cost = solver._kernel_cost, None
+    assert kernel_cost is not None
+    assert compiled == list(getattr(solver, name)(RecordingTour(tour)))
+    assert first_improvement(solver, compiled, moves) is None
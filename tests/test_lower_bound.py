@@ -0,0 +1,46 @@
+# tests/test_lower_bound.py
+import contextlib
+import io
+import random
+
+from benchmark_memory import make_instance
+from gtsp_solver import GTSPGraspSolver
+from lower_bound import gtsp_lower_bound
+from time_dependent import TimeDependentDurations, parse_clock
+
+
+def test_rush_hour_gap_is_zero_when_solved_exactly():
+    """
+    Xuất phát 17:00, cả tour nằm trong khung cao điểm chiều: cận dưới (quy hoạch động tập con) chỉ lấy min
+    trên khung giờ tour có thể đi qua -> bằng đúng chi phí tối ưu (trước đây lấy cả hệ số 0.85 ban đêm, gap ~0.5).
+    """
+    distances, durations, clusters = make_instance(30, 7, seed=3)
+    durations = [[value / 10 for value in row] for row in durations]  # Tour ngắn (< 2 giờ)
+    solver = GTSPGraspSolver(distances, durations, clusters, 0, 1, optimize_for='time',
+                             td_durations=TimeDependentDurations.from_base_matrix(durations),
+                             departure_time=parse_clock("17:00"))
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, cost = solver.solve(max_iterations=60)
+
+    bound = gtsp_lower_bound(solver, cost)
+    assert bound["method"] == "subset_dp"
+    assert bound["lower_bound"] <= cost + 1e-6
+    assert solver.stats["gap"] < 1e-6
+
+
+def test_subset_dp_bound_only_stops_at_optimum():
+    """
+    <= 10 cụm: cận dưới quy hoạch động là chi phí tối ưu -> target_gap 5% không được dừng ở lời giải cách tối ưu
+    vài phần trăm (trước đây dừng sau 7 vòng lặp ở 30.51 so với tối ưu 29.31).
+    """
+    distances, durations, clusters = make_instance(40, 6, seed=1)
+    solver = GTSPGraspSolver(distances, durations, clusters, 0, 1)
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, cost = solver.solve(max_iterations=30, target_gap=0.05)
+
+    assert solver.stats["lower_bound"]["method"] == "subset_dp"
+    if solver.stats["stopped_early"]:
+        assert solver.stats["gap"] <= GTSPGraspSolver.EXACT_GAP
+    assert abs(cost - solver.stats["lower_bound"]["lower_bound"]) < 1e-6
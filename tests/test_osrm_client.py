@@ -0,0 +1,84 @@
+# tests/test_osrm_client.py
+import json
+import time
+
+import osrm_stub
+from osrm_client import OSRMClient
+
+COORDS = [(10.7769, 106.7009), (10.7798, 106.6990), (10.7626, 106.6602)]
+
+
+def test_non_retryable_status_falls_back(stub_server):
+    """OSRM trả 4xx (không đáng retry): không retry, dùng ma trận / chặng dự phòng thay vì ném lỗi."""
+    base_url, config = stub_server(osrm_stub.StubConfig(fixtures={"/khac": {}}, strict_fixtures=True))  # Mọi request -> 404
+    client = OSRMClient(base_url, retries=2, backoff_base=0.0)
+
+    matrix = client.get_distance_matrix(COORDS)
+    assert matrix['distances'][0][1] > 0  # Ma trận đường chim bay
+    assert client.get_route_info(COORDS[0], COORDS[1]) is None
+
+    stats = client.get_stats()
+    assert stats["retries"] == 0
+    assert stats["failures"] == 2
+    assert stats["fallbacks"] == 2
+    assert config.counters["requests"] == 2
+
+
+def test_half_open_probe_not_leaked_by_unused_backend(stub_server):
+    """Backend 'half_open' không được gửi request (đứng sau, không hedging) thì không bị giữ mất lượt thăm dò."""
+    good_url, _ = stub_server()
+    recovered_url, config = stub_server()
+    client = OSRMClient([good_url, recovered_url], matrix_cache_size=0, breaker_threshold=1,
+                        breaker_reset_timeout=0.01)
+    breaker = client.breakers[recovered_url]
+    breaker.record_failure()  # Cầu dao mở
+    time.sleep(0.02)          # Hết reset_timeout -> được thăm dò
+
+    for _ in range(3):
+        client.get_distance_matrix(COORDS)  # Lần thử đầu tiên luôn tới good_url
+    assert config.counters["requests"] == 0
+    assert breaker.allow()  # Lượt thăm dò vẫn còn
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_probe_recovers_backend(stub_server):
+    """Request thăm dò thành công đóng lại cầu dao."""
+    base_url, config = stub_server()
+    client = OSRMClient(base_url, matrix_cache_size=0, breaker_threshold=1, breaker_reset_timeout=0.01)
+    client.breakers[base_url].record_failure()
+    time.sleep(0.02)
+    client.get_distance_matrix(COORDS)
+    assert config.counters["requests"] == 1
+    assert client.breakers[base_url].state == 'closed'
+
+
+def test_record_appends_and_replay_reads_cassette(stub_server, tmp_path):
+    """Record nối mỗi response thành 1 dòng (không ghi lại cả file); replay đọc lại đúng các response đó."""
+    base_url, _ = stub_server()
+    cassette = tmp_path / "cassette.jsonl"
+    recorder = OSRMClient(base_url, mode='record', cassette_path=str(cassette), matrix_cache_size=0)
+    expected = recorder.get_distance_matrix(COORDS)
+    size_after_first = cassette.stat().st_size
+    route = recorder.get_route_info(COORDS[0], COORDS[1])
+    lines = cassette.read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 2
+    assert cassette.read_text(encoding='utf-8').startswith(lines[0]) and len(lines[0]) + 1 == size_after_first
+
+    player = OSRMClient("http://127.0.0.1:9", mode='replay', cassette_path=str(cassette))
+    assert player.get_distance_matrix(COORDS)['distances'][0][1] == expected['distances'][0][1]
+    assert player.get_route_info(COORDS[0], COORDS[1]) == route
+    assert player.get_stats()["replay_misses"] == 0
+
+
+def test_record_compacts_legacy_and_duplicate_cassettes(tmp_path):
+    cassette = tmp_path / "cassette.json"
+    cassette.write_text(json.dumps({"/a": {"code": "Ok"}, "/b": {"code": "Ok"}}), encoding='utf-8')  # Định dạng cũ
+    OSRMClient("http://127.0.0.1:9", mode='record', cassette_path=str(cassette))
+    assert [json.loads(line)[0] for line in cassette.read_text(encoding='utf-8').splitlines()] == ["/a", "/b"]
+
+    with open(cassette, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(["/a", {"code": "NoRoute"}]) + "\n")
+    client = OSRMClient("http://127.0.0.1:9", mode='record', cassette_path=str(cassette))
+    assert client._cassette["/a"] == {"code": "NoRoute"}
+    assert len(cassette.read_text(encoding='utf-8').splitlines()) == 2
@@ -0,0 +1,88 @@
+# tests/test_osrm_table.py
+import json
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+from osrm_table import MatrixRows, parse_table_response, to_matrix
+
+
+def table_response(n, seed, names=None, sources_first=False, indent=None):
+    """Response 'table' giả lập (có null = không có đường đi) và bản json.loads của nó."""
+    rng = random.Random(seed)
+    matrix = lambda: [[None if rng.random() < 0.1 else round(rng.uniform(0, 5000), 1) for _ in range(n)]
+                      for _ in range(n)]
+    waypoints = [{"hint": "abc]]def", "distance": 1.5, "name": (names or [f"Đường {i}"] * n)[i],
+                  "location": [106.7 + i / 100, 10.77]} for i in range(n)]
+    parts = [("code", "Ok"), ("distances", matrix()), ("durations", matrix()),
+             ("sources", waypoints), ("destinations", waypoints)]
+    if sources_first:
+        parts = parts[:1] + parts[3:] + parts[1:3]
+    data = dict(parts)
+    return json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8'), data
+
+
+def assert_same(parsed, expected):
+    for key in ("distances", "durations"):
+        assert isinstance(parsed[key], np.ndarray)
+        reference = np.array([[np.nan if value is None else value for value in row] for row in expected[key]])
+        np.testing.assert_array_equal(parsed[key], reference)
+    assert {key: value for key, value in parsed.items() if key not in ("distances", "durations")} == \
+        {key: value for key, value in expected.items() if key not in ("distances", "durations")}
+
+
+@pytest.mark.parametrize("n", [1, 3, 70, 150])  # > ROWS_PER_CHUNK: nhiều khối hàng
+@pytest.mark.parametrize("indent", [None, 1])
+@pytest.mark.parametrize("sources_first", [False, True])
+def test_parse_matches_json_loads(n, indent, sources_first):
+    content, expected = table_response(n, seed=n, sources_first=sources_first, indent=indent)
+    assert_same(parse_table_response(content), expected)
+
+
+@pytest.mark.parametrize("sources_first", [False, True])
+def test_parse_ignores_key_names_inside_string_values(sources_first):
+    """Tên đường chứa "]]", hoặc đúng bằng "distances"/"durations", không làm lệch vị trí ma trận."""
+    names = ["a]]b", "distances", "durations", '"distances": [[1]]', "]],[["]
+    content, expected = table_response(5, seed=1, names=names, sources_first=sources_first)
+    assert b'"distances"' in content[:content.index(b'"distances":')] or not sources_first
+    assert_same(parse_table_response(content), expected)
+
+
+def test_parse_falls_back_to_json_for_unexpected_layout():
+    content = json.dumps({"code": "Ok", "distances": None, "durations": [[0, 1], [2, None]],
+                          "sources": [{}, {}], "destinations": [{}, {}]}).encode()
+    parsed = parse_table_response(content)
+    assert parsed["distances"] is None
+    np.testing.assert_array_equal(parsed["durations"], [[0, 1], [2, np.nan]])
+
+
+def test_to_matrix_converts_units_and_null_to_inf():
+    content, expected = table_response(4, seed=3)
+    matrix = to_matrix(parse_table_response(content)["durations"], 60.0)
+    from_list = to_matrix(expected["durations"], 60.0)  # Cassette: list 2D với None
+    for rows in (matrix, from_list):
+        assert isinstance(rows, MatrixRows)
+        for i, row in enumerate(expected["durations"]):
+            assert [rows[i][j] for j in range(4)] == \
+                [float('inf') if value is None else value / 60.0 for value in row]
+
+
+def test_matrix_rows_pickle_and_array_protocol():
+    array = np.arange(12, dtype=np.float64).reshape(3, 4) / 7
+    rows = MatrixRows(array)
+    assert rows[2][3] == array[2, 3] and len(rows) == 3
+
+    # np.asarray trả về chính ndarray bên dưới (không copy); dtype khác -> mảng mới
+    assert np.asarray(rows) is array
+    assert np.asarray(rows, dtype=np.float64) is array
+    converted = np.asarray(rows, dtype=np.float32)
+    assert converted.dtype == np.float32 and np.allclose(converted, array)
+
+    # Pickle gửi ndarray (không gửi từng memoryview), nhận lại MatrixRows dùng được như list 2D
+    restored = pickle.loads(pickle.dumps(rows))
+    assert isinstance(restored, MatrixRows)
+    np.testing.assert_array_equal(restored.array, array)
+    assert [list(row) for row in restored] == array.tolist()
+    assert np.asarray(restored) is restored.array
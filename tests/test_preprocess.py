@@ -0,0 +1,145 @@
+# tests/test_preprocess.py
+import itertools
+import math
+import random
+
+import numpy as np
+import pytest
+
+from osrm_table import MatrixRows
+from preprocess import (METERS_PER_DEGREE, co_located_points, collapse_coordinates, expand_matrix,
+                        prune_dominated)
+
+
+def ground_distance(a, b):
+    """Khoảng cách (mét) theo cùng xấp xỉ phẳng với collapse_coordinates (hệ số kinh độ theo vĩ độ của a)."""
+    dy = (a[0] - b[0]) * METERS_PER_DEGREE
+    dx = (a[1] - b[1]) * METERS_PER_DEGREE * math.cos(math.radians(a[0]))
+    return math.hypot(dx, dy)
+
+
+def test_collapse_merges_pair_along_longitude_at_high_latitude():
+    """
+    Ở vĩ độ 60, 1 độ kinh độ chỉ dài bằng nửa 1 độ vĩ độ: 2 điểm cách nhau 24 m theo kinh độ cách nhau
+    gần 2 ô nếu ô lưới có cùng số độ ở cả 2 trục (trước đây lưới 3 x 3 bỏ sót cặp này).
+    """
+    cell = 25 / METERS_PER_DEGREE
+    lon = cell * 1000.5  # Giữa một ô theo lưới cũ
+    coords = [(60.0, lon), (60.0, lon + 24 / (METERS_PER_DEGREE * math.cos(math.radians(60.0))))]
+    assert ground_distance(*coords) == pytest.approx(24.0)
+    unique_coords, node_of = collapse_coordinates(coords, radius_m=25)
+    assert unique_coords == [coords[0]] and node_of == [0, 0]
+    # Cách 26 m -> không gộp
+    coords[1] = (60.0, lon + 26 / (METERS_PER_DEGREE * math.cos(math.radians(60.0))))
+    assert collapse_coordinates(coords, radius_m=25)[1] == [0, 1]
+
+
+@pytest.mark.parametrize("center", [(10.77, 106.70), (60.0, 10.0), (-45.0, 170.0)])
+def test_collapse_never_misses_a_representative(center):
+    """Điểm mới chỉ thành đại diện khi MỌI đại diện trước đó đều xa hơn bán kính (so với duyệt toàn bộ)."""
+    rng = random.Random(str(center))
+    spread = 300 / METERS_PER_DEGREE  # Các điểm trong khoảng vài trăm mét -> nhiều cặp sát nhau
+    coords = [(center[0] + rng.uniform(-spread, spread), center[1] + rng.uniform(-spread, spread) * 2)
+              for _ in range(400)]
+    unique_coords, node_of = collapse_coordinates(coords, radius_m=25)
+
+    seen = 0
+    for point, node in zip(coords, node_of):
+        if node == seen:  # Đại diện mới
+            assert unique_coords[node] == point
+            assert all(ground_distance(point, rep) > 25 for rep in unique_coords[:node])
+            seen += 1
+        else:
+            assert node < seen and ground_distance(point, unique_coords[node]) <= 25
+    assert seen == len(unique_coords) < len(coords)
+
+
+def test_collapse_exact_duplicates_only_with_zero_radius():
+    coords = [(10.79, 106.69), (10.79, 106.69), (10.79001, 106.69)]
+    assert collapse_coordinates(coords, radius_m=0) == ([coords[0], coords[2]], [0, 0, 1])
+
+
+def test_expand_matrix_lists_and_matrix_rows():
+    small = [[0.0, 1.5, 2.5], [3.0, 0.0, 4.0], [5.0, 6.0, 0.0]]
+    node_of = [0, 2, 0, 1, 2]
+    expected = [[small[a][b] for b in node_of] for a in node_of]
+    assert expand_matrix(small, node_of) == expected
+    rows = expand_matrix(MatrixRows(np.array(small)), node_of)
+    assert isinstance(rows, MatrixRows)
+    assert np.asarray(rows).tolist() == expected
+    assert [list(row) for row in rows] == expected
+
+
+def gtsp_optimum(clusters, cost, start=0, end=1):
+    """Chi phí tối ưu (duyệt toàn bộ thứ tự cụm và điểm đại diện) của tour START -> mọi cụm -> END."""
+    middle = [members for cluster_id, members in clusters.items()
+              if cluster_id not in ("START_CLUSTER", "END_CLUSTER")]
+    best = float('inf')
+    for order in itertools.permutations(middle):
+        for nodes in itertools.product(*order):
+            tour = [start, *nodes, end]
+            best = min(best, sum(cost[a][b] for a, b in zip(tour, tour[1:])))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_prune_dominated_keeps_the_optimum(seed):
+    rng = random.Random(seed)
+    n = 2 + 4 * 3
+    base = [[0.0 if i == j else rng.uniform(1, 50) for j in range(n)] for i in range(n)]
+    clusters = {"START_CLUSTER": [0], "END_CLUSTER": [1]}
+    for c in range(4):
+        clusters[f"cluster_{c}"] = list(range(2 + 3 * c, 5 + 3 * c))
+    # Điểm thứ 2 của mỗi cụm = điểm thứ 1 + phụ phí trên mọi cạnh -> bị trội
+    location = list(range(n))
+    penalty = [0.0] * n
+    for c in range(4):
+        location[3 + 3 * c] = 2 + 3 * c
+        penalty[3 + 3 * c] = rng.uniform(0, 5)
+    cost = [[0.0 if i == j else base[location[i]][location[j]] + penalty[i] + penalty[j] for j in range(n)]
+            for i in range(n)]
+
+    pruned_clusters, pruned = prune_dominated(clusters, cost)
+    for c in range(4):
+        assert 3 + 3 * c in pruned and 3 + 3 * c not in pruned_clusters[f"cluster_{c}"]
+    for v, u in pruned.items():
+        cluster = next(members for members in clusters.values() if v in members)
+        assert u in cluster and v not in sum(pruned_clusters.values(), []) and u not in pruned
+    assert gtsp_optimum(pruned_clusters, cost) == pytest.approx(gtsp_optimum(clusters, cost))
+    # NumPy hay list cho cùng kết quả
+    assert prune_dominated(clusters, np.array(cost)) == (pruned_clusters, pruned)
+
+
+def test_prune_scheduled_only_removes_equivalent_points():
+    rng = random.Random(7)
+    n = 8
+    cost = [[0.0 if i == j else rng.uniform(1, 50) for j in range(n)] for i in range(n)]
+    clusters = {"START_CLUSTER": [0], "END_CLUSTER": [1], "A": [2, 3, 4, 5], "B": [6, 7]}
+    for x in range(n):
+        cost[x][3], cost[3][x] = cost[x][2], cost[2][x]   # 3 tương đương 2 (cùng tọa độ)
+        cost[x][4], cost[4][x] = cost[x][2], cost[2][x]   # 4 cùng cạnh nhưng khác thời gian tham quan
+        cost[x][5], cost[5][x] = cost[x][2] + 1, cost[2][x] + 1  # 5 bị trội nhưng không tương đương
+    for x in (2, 3, 4, 5):
+        for y in (2, 3, 4, 5):
+            cost[x][y] = 0.0 if x == y else 1.0
+    service_times = {2: 30, 3: 30, 4: 45, 5: 30}
+    time_windows = {2: (480, 1020), 3: (480, 1020), 4: (480, 1020), 5: (480, 1020)}
+
+    pruned_clusters, pruned = prune_dominated(clusters, cost, cost, scheduled=True,
+                                              service_times=service_times, time_windows=time_windows)
+    assert pruned == {3: 2}
+    assert pruned_clusters["A"] == [2, 4, 5]
+    # Chế độ tĩnh: 3 và 5 đều bị trội bởi 2 (4 tương đương 2 -> cũng bị bỏ)
+    assert prune_dominated(clusters, cost)[1] == {3: 2, 4: 2, 5: 2}
+
+
+def test_pruned_points_map_back_to_original_ids():
+    """Điểm bị bỏ cùng tọa độ OSRM với điểm giữ lại -> báo kèm theo id gốc; khác tọa độ -> không báo."""
+    point_ids = ["START_POINT", "END_POINT", "cho_tan_dinh", "nha_tho_tan_dinh", "ben_thanh", "gan_ben_thanh"]
+    coords = [(10.70, 106.60), (10.71, 106.61), (10.7887, 106.6903), (10.7887, 106.6903),
+              (10.7725, 106.6980), (10.7730, 106.6990)]
+    _, node_of = collapse_coordinates(coords)
+    assert node_of[2] == node_of[3] and node_of[4] != node_of[5]
+    # Giả sử 3 bị trội bởi 2, 5 bị trội bởi 4; chuỗi trội (v -> u đã bị bỏ) đã được prune_dominated rút gọn
+    pruned = {3: 2, 5: 4}
+    assert co_located_points(pruned, node_of, point_ids) == {2: ["nha_tho_tan_dinh"]}
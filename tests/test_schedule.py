@@ -0,0 +1,130 @@
+# tests/test_schedule.py
+#
+# Đánh giá nước đi O(1) của chế độ có lịch trình (_evaluate_segment / _finish, slack xuôi/ngược)
+# phải cho đúng chi phí của việc mô phỏng lại cả tour (_schedule) - xem giải thích trong gtsp_solver.py.
+import random
+
+import pytest
+
+from benchmark_memory import make_instance
+from gtsp_solver import GTSPGraspSolver
+from time_dependent import TimeDependentDurations, parse_clock
+
+
+def random_moves(tour, rng, count):
+    """(first, segment, last) của các nước đi 2-opt / đổi chỗ 2 cụm / Or-opt / thay điểm trong cụm."""
+    n = len(tour)
+    for _ in range(count):
+        i = rng.randrange(1, n - 2)
+        j = rng.randrange(i + 1, n - 1)
+        kind = rng.randrange(3)
+        if kind == 0:
+            yield i, tour[j:i - 1:-1], j
+        elif kind == 1:
+            window = tour[i:j + 1]
+            window[0], window[-1] = window[-1], window[0]
+            yield i, window, j
+        else:
+            yield i, tour[i + 1:j + 1] + [tour[i]], j
+
+
+def check_moves(solver, tour, rng, count=300):
+    """So sánh đánh giá gia tăng với mô phỏng lại; trả về số nước đi bị loại (inf) để kiểm tra độ phủ."""
+    schedule = solver._schedule(tour)
+    feasible = schedule.lateness[-1] == 0
+    rejected = 0
+    for first, segment, last in random_moves(tour, rng, count):
+        moved = tour[:first] + list(segment) + tour[last + 1:]
+        full = solver._schedule(moved)
+        incremental = solver._evaluate_segment(tour, schedule, first, segment, last)
+        if feasible and full.lateness[-1] > 0:
+            # Tour đang khả thi: nước đi gây trễ giờ mở cửa bị loại ngay
+            assert incremental == float('inf')
+            rejected += 1
+        else:
+            assert incremental == pytest.approx(full.cost, rel=1e-9, abs=1e-6)
+    return rejected
+
+
+def make_solver(optimize_for='time', time_dependent=False, seed=5, tight=True):
+    """
+    Bài toán 12 cụm, xuất phát 08:00; phần lớn các điểm có giờ mở cửa (mở muộn -> phải chờ).
+    tight=False: giờ đóng cửa muộn -> hầu hết tour khả thi và có nhiều lần chờ (slack xuôi/ngược).
+    """
+    distances, durations, clusters = make_instance(40, 12, seed=seed)
+    rng = random.Random(seed)
+    nodes = range(2, len(distances))
+    service_times = {v: rng.choice((10, 20, 30, 45)) for v in nodes}
+    time_windows = {}
+    for v in nodes:
+        if rng.random() < 0.7:
+            opening = rng.randint(8 * 60, 11 * 60 if tight else 14 * 60)
+            time_windows[v] = (opening, opening + (rng.randint(90, 360) if tight else rng.randint(300, 600)))
+    solver = GTSPGraspSolver(distances, durations, clusters, 0, 1, optimize_for=optimize_for,
+                             td_durations=TimeDependentDurations.from_base_matrix(durations)
+                             if time_dependent else None,
+                             departure_time=parse_clock("08:00"),
+                             service_times=service_times, time_windows=time_windows)
+    return solver, nodes
+
+
+@pytest.mark.parametrize("departure", ["06:10", "08:20", "16:00", "20:30"])
+def test_time_slice_slack_matches_resimulation(departure):
+    """(a) Chỉ khung giờ: chặng vượt ranh giới khung giờ không được coi là thời gian đi không đổi."""
+    distances, durations, clusters = make_instance(40, 12, seed=5)
+    solver = GTSPGraspSolver(distances, durations, clusters, 0, 1, optimize_for='time',
+                             td_durations=TimeDependentDurations.from_base_matrix(durations),
+                             departure_time=parse_clock(departure))
+    rng = random.Random(departure)
+    for _ in range(5):
+        check_moves(solver, list(solver.construction_phase(alpha=0.5)), rng)
+
+
+@pytest.mark.parametrize("tight", [True, False])
+@pytest.mark.parametrize("optimize_for", ["time", "distance"])
+def test_time_window_slack_matches_resimulation(optimize_for, tight):
+    """
+    (b) Ma trận tĩnh + giờ mở cửa: kiểm tra khả thi bằng slack ngược và lan truyền độ lệch bằng (P, Q)
+    khi tour khả thi; tour vi phạm (bị phạt LATENESS_PENALTY mỗi phút trễ) thì mô phỏng lại phần đuôi.
+    """
+    solver, _ = make_solver(optimize_for, tight=tight)
+    rng = random.Random(f"{optimize_for}-{tight}")
+    feasible_tours = infeasible_tours = rejected = waiting = 0
+    for _ in range(40):
+        tour = list(solver.construction_phase(alpha=rng.choice((0.0, 0.3, 0.9))))
+        schedule = solver._schedule(tour)
+        waiting += sum(start > arrive for start, arrive in zip(schedule.start, schedule.arrive))
+        if schedule.lateness[-1] == 0:
+            feasible_tours += 1
+        else:
+            infeasible_tours += 1
+        rejected += check_moves(solver, tour, rng, count=100)
+    # Đủ cả các trường hợp: chờ mở cửa, tour khả thi (nước đi bị loại), tour bị phạt trễ giờ (giờ đóng cửa sớm)
+    assert waiting and feasible_tours and rejected
+    assert infeasible_tours or not tight
+
+
+def test_time_window_slack_absorbs_delay_with_waiting():
+    """Đến sớm thì chờ mở cửa: độ trễ nhỏ hơn thời gian chờ không làm giờ đến END đổi."""
+    durations = [[0.0, 10.0, 10.0], [10.0, 0.0, 10.0], [10.0, 10.0, 0.0]]
+    clusters = {"START_CLUSTER": [0], "END_CLUSTER": [1], "A": [2]}
+    solver = GTSPGraspSolver(durations, durations, clusters, 0, 1, optimize_for='time',
+                             departure_time=parse_clock("08:00"),
+                             service_times={2: 30}, time_windows={2: (parse_clock("09:00"), parse_clock("10:00"))})
+    tour = [0, 2, 1]
+    schedule = solver._schedule(tour)
+    assert schedule.arrive[1] == 8 * 60 + 10 and schedule.start[1] == 9 * 60  # Chờ 50 phút
+    assert schedule.cost == 100.0                                           # 08:00 -> 09:40
+    # Đến A muộn hơn 40 phút: vẫn bắt đầu lúc 09:00; muộn hơn 70 phút: lệch 20 phút
+    assert solver._finish(tour, schedule, 1, schedule.arrive[1] + 40) == (schedule.arrive[-1], 0.0)
+    assert solver._finish(tour, schedule, 1, schedule.arrive[1] + 70) == (schedule.arrive[-1] + 20, 0.0)
+    # Bắt đầu sau 09:30 (giờ đóng cửa - thời gian tham quan): tour đang khả thi -> bị loại
+    assert solver._finish(tour, schedule, 1, parse_clock("09:31")) is None
+
+
+def test_time_dependent_time_windows_match_resimulation():
+    """(c) Khung giờ + giờ mở cửa: mô phỏng lại phần đuôi."""
+    solver, _ = make_solver('time', time_dependent=True)
+    rng = random.Random(3)
+    for _ in range(10):
+        check_moves(solver, list(solver.construction_phase(alpha=0.5)), rng, count=100)
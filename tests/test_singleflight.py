@@ -0,0 +1,67 @@
+# tests/test_singleflight.py
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import singleflight
+from osrm_client import OSRMClient
+
+pytestmark = pytest.mark.skipif(singleflight.fcntl is None, reason="Cần fcntl (Linux/macOS)")
+
+COORDS = [(10.7769, 106.7009), (10.7798, 106.6990), (10.7626, 106.6602)]
+
+
+class _Exploit:
+    """Pickle này gọi os.system khi được load."""
+
+    def __reduce__(self):
+        return os.system, ("touch PWNED",)
+
+
+def test_private_dir_refuses_shared_directory(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    assert not singleflight.private_dir(str(shared))
+    assert singleflight.SingleFlight(str(shared)).lock_dir is None
+
+    private = tmp_path / "private"
+    assert singleflight.private_dir(str(private))
+    assert (private.stat().st_mode & 0o777) == 0o700
+
+
+def test_matrix_shared_between_processes_without_pickle(stub_server, tmp_path):
+    base_url, config = stub_server()
+    lock_dir = str(tmp_path / "sf")
+    first = OSRMClient(base_url, singleflight_dir=lock_dir, matrix_cache_size=0)
+    second = OSRMClient(base_url, singleflight_dir=lock_dir, matrix_cache_size=0)  # Như một worker khác
+
+    expected = first.get_distance_matrix(COORDS)
+    shared = second.get_distance_matrix(COORDS)  # Trong SHARE_GRACE_SECONDS -> đọc file của "worker" kia
+    assert second.get_stats()["coalesced_processes"] == 1
+    assert config.counters["requests"] == 1
+    assert np.array_equal(np.asarray(shared['distances']), np.asarray(expected['distances']))
+
+    results = [name for name in os.listdir(lock_dir) if name.endswith('.result')]
+    with open(os.path.join(lock_dir, results[0]), 'rb') as f:
+        assert f.read(2) == b'PK'  # .npz (zip), không phải pickle
+
+
+def test_planted_pickle_is_never_loaded(stub_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base_url, config = stub_server()
+    lock_dir = str(tmp_path / "sf")
+    client = OSRMClient(base_url, singleflight_dir=lock_dir, matrix_cache_size=0)
+
+    key = ('table', 'driving', tuple(tuple(c) for c in COORDS))
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    with open(os.path.join(lock_dir, f"{name}.result"), 'wb') as f:
+        pickle.dump(_Exploit(), f)
+
+    matrix = client.get_distance_matrix(COORDS)
+    assert not (tmp_path / "PWNED").exists()
+    assert config.counters["requests"] == 1  # File hỏng -> tự gọi OSRM
+    assert matrix['distances'][0][1] > 0
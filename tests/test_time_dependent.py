@@ -0,0 +1,50 @@
+# tests/test_time_dependent.py
+import random
+
+import numpy as np
+import pytest
+
+from time_dependent import MINUTES_PER_DAY, TimeDependentDurations, parse_clock
+
+
+def random_durations(n, seed):
+    rng = random.Random(seed)
+    return [[0.0 if i == j else rng.uniform(5.0, 90.0) for j in range(n)] for i in range(n)]
+
+
+def test_travel_time_integrates_speed_across_slices():
+    td = TimeDependentDurations.from_base_matrix([[0.0, 60.0], [60.0, 0.0]])
+    assert td.travel_time(0, 1, parse_clock("09:30")) == pytest.approx(60 * 1.15)  # Gọn trong 1 khung
+    # 08:30: 30 phút ở tốc độ cao điểm (cả chặng 96 phút) rồi phần còn lại với tốc độ khung 09:00 (69 phút)
+    assert td.travel_time(0, 1, parse_clock("08:30")) == pytest.approx(30 + 69 * (1 - 30 / 96))
+    # Qua nửa đêm: 21:00-24:00 (hệ số 0.95) rồi 00:00 (0.85)
+    assert td.travel_time(0, 1, 23 * 60 + 50) == pytest.approx(10 + 51 * (1 - 10 / 57))
+    # 08:59 không còn đến SAU người đi lúc 09:00
+    assert parse_clock("08:59") + td.travel_time(0, 1, parse_clock("08:59")) <= \
+        parse_clock("09:00") + td.travel_time(0, 1, parse_clock("09:00"))
+
+
+def test_arrival_is_fifo_over_the_whole_day():
+    durations = random_durations(6, seed=1)
+    for td in (TimeDependentDurations.from_base_matrix(durations),
+               TimeDependentDurations.from_slice_matrices(
+                   [0, 420, 540, 990], [[[value * factor for value in row] for row in durations]
+                                        for factor in (0.8, 2.5, 1.0, 3.0)])):
+        times = [step / 4 for step in range(2 * MINUTES_PER_DAY * 4)]  # Mỗi 15 giây, 2 ngày
+        for i in range(6):
+            for j in range(6):
+                arrivals = [t + td.travel_time(i, j, t) for t in times]
+                assert all(b >= a - 1e-9 for a, b in zip(arrivals, arrivals[1:]))
+
+
+def test_travel_times_match_scalar_exactly():
+    durations = random_durations(30, seed=2)
+    td = TimeDependentDurations.from_base_matrix(durations)
+    durations[3][7] = float('inf')  # Không có đường đi
+    td_inf = TimeDependentDurations.from_base_matrix(durations)
+    nodes = np.arange(30)
+    for t in (0.0, 355.5, 419.0, 530.25, 985.0, 1430.0, 1439.9, 2000.0):
+        for table in (td, td_inf):
+            vectorized = table.travel_times(3, nodes, t)
+            assert vectorized.tolist() == [table.travel_time(3, j, t) for j in range(30)]
+    assert td_inf.travel_times(3, nodes, 500.0)[7] == float('inf')
@@ -0,0 +1,106 @@
+# tests/test_vrp_split.py
+import itertools
+import random
+
+import pytest
+
+import vrp_split
+from benchmark_memory import make_instance
+from gtsp_solver import GTSPGraspSolver
+from vrp_split import solve_multi_route, split_giant_tour
+
+
+def make_solver(seed, scheduled):
+    """Bài toán 10 cụm; scheduled=True: tối ưu thời gian, có thời gian tham quan và giờ mở cửa (chờ + trễ)."""
+    distances, durations, clusters = make_instance(40, 10, seed=seed)
+    kwargs = dict(distance_matrix=distances, duration_matrix=durations, clusters=clusters,
+                  start_index=0, end_index=1)
+    if scheduled:
+        rng = random.Random(seed)
+        nodes = range(2, len(distances))
+        kwargs.update(optimize_for='time', departure_time=8 * 60,
+                      service_times={v: rng.choice((15, 30, 45)) for v in nodes},
+                      time_windows={v: (rng.randint(8 * 60, 10 * 60), rng.randint(10 * 60, 13 * 60))
+                                    for v in nodes if rng.random() < 0.5})
+    solver = GTSPGraspSolver(**kwargs)
+    # Giant tour: điểm đầu tiên của mỗi cụm, theo thứ tự ngẫu nhiên
+    members = [solver.clusters[cluster_id][0] for cluster_id in clusters
+               if cluster_id not in ("START_CLUSTER", "END_CLUSTER")]
+    random.Random(seed).shuffle(members)
+    return solver, kwargs, [0, *members, 1]
+
+
+def route_value(solver, nodes):
+    """Chi phí và thời lượng của lộ trình START -> nodes -> END, mô phỏng lại cả tour."""
+    tour = [solver.start_index, *nodes, solver.end_index]
+    return solver.calculate_total_cost(tour), solver.tour_schedule(tour)[-1]["arrive"] - solver.departure_time
+
+
+def brute_force_split(solver, sequence, num_routes, max_route_duration):
+    """Thử mọi cách đặt điểm cắt; trả về giá trị tối ưu (tổng chi phí / thời lượng lộ trình dài nhất)."""
+    m = len(sequence)
+    best = float('inf')
+    counts = range(1, num_routes + 1) if max_route_duration is not None else (num_routes,)
+    for k in counts:
+        for cuts in itertools.combinations(range(1, m), k - 1):
+            bounds = (0, *cuts, m)
+            values = [route_value(solver, sequence[a:b]) for a, b in zip(bounds, bounds[1:])]
+            if max_route_duration is None:
+                best = min(best, max(duration for _, duration in values))
+            elif all(duration <= max_route_duration + 1e-9 for _, duration in values):
+                best = min(best, sum(cost for cost, _ in values))
+    return best
+
+
+@pytest.mark.parametrize("scheduled", [False, True])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_split_matches_brute_force(seed, scheduled):
+    solver, _, giant_tour = make_solver(seed, scheduled)
+    sequence = giant_tour[1:-1]
+    whole = route_value(solver, sequence)[1]
+
+    # Chia đều: đúng 3 lộ trình, tối thiểu lộ trình dài nhất
+    routes = split_giant_tour(solver, giant_tour, 3)
+    assert len(routes) == 3 and [node for route in routes for node in route] == sequence
+    longest = max(route_value(solver, route)[1] for route in routes)
+    assert longest == pytest.approx(brute_force_split(solver, sequence, 3, None))
+
+    # Giới hạn thời lượng: tối thiểu tổng chi phí, mọi lộ trình <= giới hạn
+    limit = whole * 0.6
+    routes = split_giant_tour(solver, giant_tour, 3, max_route_duration=limit)
+    assert [node for route in routes for node in route] == sequence
+    values = [route_value(solver, route) for route in routes]
+    assert all(duration <= limit + 1e-9 for _, duration in values)
+    assert sum(cost for cost, _ in values) == pytest.approx(brute_force_split(solver, sequence, 3, limit))
+
+
+def test_split_raises_when_limit_cannot_be_met():
+    solver, _, giant_tour = make_solver(0, scheduled=True)
+    shortest_single = min(route_value(solver, [node])[1] for node in giant_tour[1:-1])
+    with pytest.raises(ValueError):
+        split_giant_tour(solver, giant_tour, 10, max_route_duration=shortest_single - 1)
+    # Đủ lộ trình thì chia được, quá ít lộ trình thì không
+    whole = route_value(solver, giant_tour[1:-1])[1]
+    with pytest.raises(ValueError):
+        split_giant_tour(solver, giant_tour, 1, max_route_duration=whole - 1)
+
+
+def test_resolved_route_over_limit_is_rejected(monkeypatch):
+    solver, kwargs, giant_tour = make_solver(0, scheduled=True)
+    nodes = giant_tour[1:-1][:5]
+    giant_tour = [0, *nodes, 1]
+    cost, limit = route_value(solver, nodes)
+
+    # Thứ tự khác của cùng các điểm: dài hơn giới hạn / không dài hơn
+    orders = sorted(itertools.permutations(nodes), key=lambda order: route_value(solver, order)[1])
+    too_long = [0, *orders[-1], 1]
+    within = [0, *orders[0], 1]
+    assert route_value(solver, orders[-1])[1] > limit + 1e-9
+
+    # Lời giải lại "rẻ hơn" nhưng vượt giới hạn -> giữ lộ trình đã chia
+    monkeypatch.setattr(vrp_split, "_solve_route", lambda *args: (too_long, cost - 1))
+    assert solve_multi_route(solver, giant_tour, 1, limit, solver_kwargs=kwargs) == [(giant_tour, cost)]
+
+    # Rẻ hơn và trong giới hạn -> nhận lời giải mới
+    monkeypatch.setattr(vrp_split, "_solve_route", lambda *args: (within, cost - 1))
+    assert solve_multi_route(solver, giant_tour, 1, limit, solver_kwargs=kwargs) == [(within, cost - 1)]